@@ -1,12 +1,17 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import atexit
 import logging
+import logging.handlers
+import queue
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, create_model
+from typing import Generic, List, Optional, Tuple, TypeVar, Union
 import uuid
 from datetime import datetime, timezone, timedelta
 import hashlib
@@ -14,30 +19,615 @@ import hmac
 import httpx
 from enum import Enum
 import asyncio
+import base64
+import bisect
+import gzip
+import heapq
+import json
+import random
+import secrets
+import socket
+import itertools
+import time
+from collections import OrderedDict, deque
 from urllib.parse import parse_qsl
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, InvalidDocument, OperationFailure
+from pymongo.write_concern import WriteConcern
+
+try:
+    import orjson
+except ImportError:  # optional: responses fall back to the standard json encoder
+    orjson = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 # Telegram Bot config
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '')
 TELEGRAM_DRIVERS_CHAT_ID = os.environ.get('TELEGRAM_DRIVERS_CHAT_ID', '')
+TELEGRAM_API_BASE = os.environ.get('TELEGRAM_API_BASE', 'https://api.telegram.org').rstrip('/')
+TELEGRAM_HTTP2 = os.environ.get('TELEGRAM_HTTP2', '').lower() in ('1', 'true', 'yes')
+TELEGRAM_CONNECT_TIMEOUT = float(os.environ.get('TELEGRAM_CONNECT_TIMEOUT', '5'))
+TELEGRAM_READ_TIMEOUT = float(os.environ.get('TELEGRAM_READ_TIMEOUT', '10'))
+TELEGRAM_MAX_CONNECTIONS = int(os.environ.get('TELEGRAM_MAX_CONNECTIONS', '20'))
+# Flood limits: ~30 msg/s overall, ~20 msg/min per group, ~1 msg/s per private chat
+TELEGRAM_GLOBAL_RATE = float(os.environ.get('TELEGRAM_GLOBAL_RATE', '30'))
+TELEGRAM_GROUP_RATE_PER_MINUTE = float(os.environ.get('TELEGRAM_GROUP_RATE_PER_MINUTE', '20'))
+TELEGRAM_PRIVATE_RATE = float(os.environ.get('TELEGRAM_PRIVATE_RATE', '1'))
+TELEGRAM_MAX_RETRIES = int(os.environ.get('TELEGRAM_MAX_RETRIES', '5'))
+# Webhook: secret token check and fast-ack mode with background workers
+TELEGRAM_WEBHOOK_SECRET = os.environ.get('TELEGRAM_WEBHOOK_SECRET', '')
+TELEGRAM_WEBHOOK_ASYNC = os.environ.get('TELEGRAM_WEBHOOK_ASYNC', '').lower() in ('1', 'true', 'yes')
+TELEGRAM_WEBHOOK_WORKERS = int(os.environ.get('TELEGRAM_WEBHOOK_WORKERS', '8'))
+TELEGRAM_WEBHOOK_QUEUE_SIZE = int(os.environ.get('TELEGRAM_WEBHOOK_QUEUE_SIZE', '1000'))
+# Webhook deduplication by update_id (Telegram retries slow deliveries)
+TELEGRAM_DEDUP_WINDOW = int(os.environ.get('TELEGRAM_DEDUP_WINDOW', '10000'))
+TELEGRAM_DEDUP_TTL_SECONDS = int(os.environ.get('TELEGRAM_DEDUP_TTL_SECONDS', '86400'))
+TELEGRAM_DEDUP_MONGO = os.environ.get('TELEGRAM_DEDUP_MONGO', '').lower() in ('1', 'true', 'yes')
+# Opt-in recording of incoming updates (gzip JSONL, PII hashed) for replay tests
+TELEGRAM_RECORD_PATH = os.environ.get('TELEGRAM_RECORD_PATH', '')
+# Salt for the hashes; set it to keep hashed ids stable across restarts and workers
+TELEGRAM_RECORD_SALT = os.environ.get('TELEGRAM_RECORD_SALT', '')
+
+# Runtime settings shared by all workers (Mongo `settings`); env values seed it
+SETTINGS_REFRESH_SECONDS = float(os.environ.get('SETTINGS_REFRESH_SECONDS', '2'))
+
+# Leader election for singleton background jobs across workers and replicas
+INSTANCE_ID = os.environ.get('INSTANCE_ID') or f"{socket.gethostname()}:{os.getpid()}"
+LEASE_TTL_SECONDS = float(os.environ.get('LEASE_TTL_SECONDS', '15'))
+LEASE_RENEW_SECONDS = float(os.environ.get('LEASE_RENEW_SECONDS', '5'))
+
+# Server-Sent Events for the Mini App
+SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', '15'))
+# How often a worker looks for order changes made by other workers
+SSE_RESYNC_SECONDS = float(os.environ.get('SSE_RESYNC_SECONDS', '3'))
+
+# Driver/client profile cache (per process; bounded staleness across workers)
+PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE', '10000'))
+PROFILE_CACHE_TTL_SECONDS = float(os.environ.get('PROFILE_CACHE_TTL_SECONDS', '30'))
+
+# Write-behind action log
+ACTION_LOG_BATCH_SIZE = int(os.environ.get('ACTION_LOG_BATCH_SIZE', '200'))
+ACTION_LOG_BUFFER_SIZE = int(os.environ.get('ACTION_LOG_BUFFER_SIZE', '10000'))
+ACTION_LOG_FLUSH_INTERVAL = float(os.environ.get('ACTION_LOG_FLUSH_INTERVAL', '1'))
+ACTION_LOG_WRITE_CONCERN = os.environ.get('ACTION_LOG_WRITE_CONCERN', '1')
+# Failed batches stay buffered and are retried with exponential backoff
+ACTION_LOG_RETRY_MAX_SECONDS = float(os.environ.get('ACTION_LOG_RETRY_MAX_SECONDS', '30'))
+# How long shutdown keeps retrying before the remaining entries are dropped
+ACTION_LOG_SHUTDOWN_TIMEOUT = float(os.environ.get('ACTION_LOG_SHUTDOWN_TIMEOUT', '10'))
+
+# Order expiry: exact in-memory deadlines, slow Mongo scan as a safety net
+ORDER_EXPIRY_RECONCILE_SECONDS = float(os.environ.get('ORDER_EXPIRY_RECONCILE_SECONDS', '300'))
+# The expiry leader reloads every pending deadline this often, so orders held
+# only in the memory of a worker that exited still expire on time
+ORDER_EXPIRY_RELOAD_SECONDS = float(os.environ.get('ORDER_EXPIRY_RELOAD_SECONDS', '30'))
+ORDER_EXPIRY_BATCH_SIZE = int(os.environ.get('ORDER_EXPIRY_BATCH_SIZE', '500'))
+ORDER_EXPIRY_NOTIFY_CONCURRENCY = int(os.environ.get('ORDER_EXPIRY_NOTIFY_CONCURRENCY', '20'))
+
+# MongoDB command monitoring: slow-query log and one explain per query shape
+MONGO_SLOW_QUERY_MS = float(os.environ.get('MONGO_SLOW_QUERY_MS', '100'))
+MONGO_EXPLAIN_SLOW_QUERIES = os.environ.get('MONGO_EXPLAIN_SLOW_QUERIES', 'true').lower() in ('1', 'true', 'yes')
+MONGO_MAX_QUERY_SHAPES = int(os.environ.get('MONGO_MAX_QUERY_SHAPES', '500'))
+
+# Sampling profiler for slow requests (can also be switched on at runtime)
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', '').lower() in ('1', 'true', 'yes')
+PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', '0.1'))
+PROFILER_THRESHOLD_MS = float(os.environ.get('PROFILER_THRESHOLD_MS', '500'))
+PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', '5'))
+PROFILER_MAX_PROFILES = int(os.environ.get('PROFILER_MAX_PROFILES', '50'))
+
+# Logging: records are formatted and written by a background thread
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()  # text or json
+LOG_FILE = os.environ.get('LOG_FILE', '')
+LOG_PAYLOAD_MAX_CHARS = int(os.environ.get('LOG_PAYLOAD_MAX_CHARS', '2000'))
+# Per event type: full records up to the burst each second, then one in N
+LOG_EVENT_BURST = int(os.environ.get('LOG_EVENT_BURST', '20'))
+LOG_EVENT_SAMPLE_EVERY = int(os.environ.get('LOG_EVENT_SAMPLE_EVERY', '100'))
+
+# ==================== LOGGING ====================
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+# Attributes every LogRecord has; anything else was passed through `extra`
+STANDARD_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+def truncate_payload(value, limit: int = LOG_PAYLOAD_MAX_CHARS) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= limit else f"{text[:limit]}... ({len(text)} chars)"
+
+class EventSampler(logging.Filter):
+    """Bounds the volume of records that carry an `event` type.
+
+    Up to `burst` records per event type and second pass unchanged, so low
+    traffic is logged in full; beyond that only every `sample_every`-th
+    record passes, marked with the sampling rate. Warnings and errors
+    always pass. Attached to the queue handler, so it runs in whichever
+    thread emits the record, before the record is queued.
+    """
+
+    def __init__(self, burst: int, sample_every: int):
+        super().__init__()
+        self.burst = burst
+        self.sample_every = max(1, sample_every)
+        self._windows: dict = {}  # event -> [second, records seen]
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        if event is None or record.levelno >= logging.WARNING:
+            return True
+        second = int(time.monotonic())
+        window = self._windows.get(event)
+        if window is None or window[0] != second:
+            window = self._windows[event] = [second, 0]
+        window[1] += 1
+        overflow = window[1] - self.burst
+        if overflow <= 0:
+            return True
+        if overflow % self.sample_every == 0:
+            record.sampled = self.sample_every
+            return True
+        self.sampled_out += 1
+        return False
+
+    def get_stats(self) -> dict:
+        return {"burst": self.burst, "sample_every": self.sample_every, "sampled_out": self.sampled_out}
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Queues records without formatting them.
+
+    The stock QueueHandler renders the message on the calling thread; here
+    `%`-args and payloads stay as objects and are only turned into text
+    by the listener thread, and only if the record survived the filters.
+    Callers must not mutate what they pass after logging it.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class TextLogFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        payload = getattr(record, "payload", None)
+        if payload is not None:
+            text = f"{text} {truncate_payload(payload)}"
+        sampled = getattr(record, "sampled", None)
+        return f"{text} [sampled 1/{sampled}]" if sampled else text
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line; fields passed via `extra` are kept as keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_RECORD_FIELDS:
+                entry[key] = truncate_payload(value) if key == "payload" else value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def configure_logging() -> logging.handlers.QueueListener:
+    """Route all records through a queue to stdout (and LOG_FILE) handlers"""
+    handlers = [logging.StreamHandler()]
+    if LOG_FILE:
+        handlers.append(logging.FileHandler(LOG_FILE, encoding="utf-8"))
+    if LOG_FORMAT == "json":
+        formatter = JsonLogFormatter()
+    else:
+        formatter = TextLogFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(event_sampler)
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL if LOG_LEVEL in LOG_LEVELS else "INFO")
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(listener.stop)
+    return listener
+
+event_sampler = EventSampler(LOG_EVENT_BURST, LOG_EVENT_SAMPLE_EVERY)
+log_listener = configure_logging()
+logger = logging.getLogger(__name__)
+
+def get_log_levels() -> dict:
+    """Effective level of the root logger and of every logger with its own level"""
+    levels = {"root": logging.getLevelName(logging.getLogger().level)}
+    for name in sorted(logging.root.manager.loggerDict):
+        item = logging.root.manager.loggerDict[name]
+        if isinstance(item, logging.Logger) and item.level != logging.NOTSET:
+            levels[name] = logging.getLevelName(item.level)
+    levels.setdefault(logger.name, logging.getLevelName(logger.getEffectiveLevel()))
+    return levels
+
+# The event loop keeps only weak references to tasks: fire-and-forget tasks are
+# held here until they finish, so they cannot be collected mid-flight
+background_tasks: set = set()
+
+def _background_task_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background task {task.get_name()} failed: {task.exception()!r}")
+
+def run_in_background(coro) -> asyncio.Task:
+    """Start a task nobody awaits; keeps a reference and logs its exception"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(_background_task_done)
+    return task
+
+# ==================== JSON RESPONSES ====================
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed"""
+
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+
+def json_response(content, status_code: int = 200) -> FastJSONResponse:
+    """Send data that is already JSON-ready (documents read with a `_id: 0` projection).
+
+    FastAPI passes Response objects through untouched, so this skips both
+    jsonable_encoder and response_model validation. Endpoints returning it
+    document their shape with `responses=` instead of `response_model=`.
+    """
+    return FastJSONResponse(content, status_code=status_code)
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 api_router = APIRouter(prefix="/api")
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# ==================== METRICS ====================
+
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    """Base for in-process Prometheus metrics.
+
+    All updates happen on the event loop thread, so series are plain dicts
+    and lists without locks; an update is a dict lookup and an addition.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._series: dict = {}
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class CounterMetric(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, value: float = 1):
+        self._series[labels] = self._series.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        return super().render() + [
+            f"{self.name}{format_labels(self.label_names, labels)} {value}"
+            for labels, value in self._series.items()
+        ]
+
+class GaugeMetric(CounterMetric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        self._series[labels] = value
+
+class HistogramMetric(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), buckets: tuple = METRIC_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            # Per-bucket counts (the last one is +Inf), sum, count
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = format_labels(self.label_names, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, labels)} {count}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def counter(self, name: str, documentation: str, label_names: tuple = ()) -> CounterMetric:
+        return self._register(CounterMetric(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: tuple = ()) -> GaugeMetric:
+        return self._register(GaugeMetric(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: tuple = (), buckets: tuple = METRIC_BUCKETS) -> HistogramMetric:
+        return self._register(HistogramMetric(name, documentation, label_names, buckets))
+
+    def _register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+http_requests_total = metrics.counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_request_seconds = metrics.histogram("http_request_duration_seconds", "Time until response headers by route", ("method", "route"))
+telegram_update_seconds = metrics.histogram("telegram_update_duration_seconds", "Webhook update processing time by update type", ("type",))
+telegram_update_errors_total = metrics.counter("telegram_update_errors_total", "Webhook updates that raised by update type", ("type",))
+telegram_api_seconds = metrics.histogram("telegram_api_request_duration_seconds", "Bot API call latency by method", ("method",))
+telegram_api_errors_total = metrics.counter("telegram_api_errors_total", "Failed Bot API calls by method", ("method",))
+telegram_api_flood_total = metrics.counter("telegram_api_429_total", "Bot API calls answered with 429 by method", ("method",))
+mongo_command_seconds = metrics.histogram("mongodb_command_duration_seconds", "MongoDB command latency", ("collection", "command"))
+mongo_command_failures_total = metrics.counter("mongodb_command_failures_total", "Failed MongoDB commands", ("collection", "command"))
+order_expiry_lag_seconds = metrics.histogram("order_expiry_lag_seconds", "Delay between an order deadline and its expiry firing")
+order_expiry_reconciled_total = metrics.counter("order_expiry_reconciled_total", "Overdue orders found by the reconciliation scan")
+order_expiry_pending = metrics.gauge("order_expiry_pending", "Orders waiting in the expiry scheduler")
+active_orders_gauge = metrics.gauge("taxi_active_orders", "Orders in NEW, BROADCAST or ASSIGNED status")
+busy_drivers_gauge = metrics.gauge("taxi_busy_drivers", "Drivers with an active order")
+
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+EXPLAIN_DROP_KEYS = {"lsid", "txnNumber", "readConcern", "writeConcern", "readPreference", "autocommit", "startTransaction"}
+
+def query_shape(value):
+    """Replace literal values with placeholders, keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, dict) for item in value):
+        return [query_shape(item) for item in value]
+    return "?"
+
+def command_shape(command_name: str, command: dict) -> Optional[str]:
+    """Normalized shape of a query command, or None for other commands"""
+    if command_name == "find":
+        shape = {"filter": query_shape(command.get("filter", {})), "sort": command.get("sort")}
+    elif command_name in ("count", "distinct"):
+        shape = {"query": query_shape(command.get("query", {}))}
+    elif command_name == "findAndModify":
+        shape = {"query": query_shape(command.get("query", {})), "sort": command.get("sort")}
+    elif command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        shape = {"q": query_shape(statements[0].get("q", {}))}
+    elif command_name == "aggregate":
+        shape = [
+            {stage: query_shape(body) if stage == "$match" else body if stage == "$sort" else "…"}
+            for step in command.get("pipeline", []) for stage, body in step.items()
+        ]
+    else:
+        return None
+    return json.dumps(shape, ensure_ascii=False, default=str)
+
+def summarize_explain(explain: dict) -> dict:
+    """Winning plan stages and execution counters from explain output"""
+    stages, indexes, execution = [], [], {}
+    
+    def walk(node):
+        if isinstance(node, dict):
+            if "stage" in node and isinstance(node["stage"], str):
+                stages.append(node["stage"])
+                if node.get("indexName"):
+                    indexes.append(node["indexName"])
+            if "executionStats" in node and not execution:
+                execution.update(node["executionStats"])
+            for key, item in node.items():
+                if key not in ("rejectedPlans", "allPlansExecution"):
+                    walk(item)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+    
+    walk(explain)
+    return {
+        "stages": list(dict.fromkeys(stages)),
+        "indexes": list(dict.fromkeys(indexes)),
+        "collscan": "COLLSCAN" in stages,
+        "returned": execution.get("nReturned"),
+        "keys_examined": execution.get("totalKeysExamined"),
+        "docs_examined": execution.get("totalDocsExamined"),
+        "execution_ms": execution.get("executionTimeMillis")
+    }
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every MongoDB command and keeps per-query-shape statistics.
+
+    PyMongo calls listeners on Motor's worker threads, so events are only
+    appended to a deque (thread-safe) and folded into the histograms and
+    shape statistics by drain() on the event loop. Commands slower than
+    MONGO_SLOW_QUERY_MS are logged, and the first slow command of every
+    shape is explained once with executionStats.
+    """
+
+    def __init__(self, slow_ms: float, explain: bool, max_shapes: int, max_events: int = 100000):
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.max_shapes = max_shapes
+        self._pending: dict = {}
+        self.events = deque(maxlen=max_events)
+        self.shapes: dict = {}
+        self.slow_commands = 0
+        self.explains = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def started(self, event):
+        command = event.command
+        target = command.get(event.command_name)
+        if not isinstance(target, str):
+            target = command.get("collection", "-")  # getMore
+        try:
+            shape = command_shape(event.command_name, command)
+        except Exception:
+            shape = None
+        self._pending[(event.connection_id, event.request_id)] = (target, shape, event.database_name, command)
+
+    def _finished(self, event, ok: bool):
+        collection, shape, database, command = self._pending.pop(
+            (event.connection_id, event.request_id), ("-", None, None, None))
+        seconds = event.duration_micros / 1e6
+        # The command itself is kept only when it may need an explain
+        slow_command = command if seconds * 1000 >= self.slow_ms and event.command_name in EXPLAINABLE_COMMANDS else None
+        self.events.append((collection, event.command_name, seconds, ok, shape, database, slow_command))
+
+    def succeeded(self, event):
+        self._finished(event, True)
+
+    def failed(self, event):
+        self._finished(event, False)
+
+    def drain(self):
+        while True:
+            try:
+                collection, command_name, seconds, ok, shape, database, slow_command = self.events.popleft()
+            except IndexError:
+                return
+            mongo_command_seconds.observe(seconds, collection, command_name)
+            if not ok:
+                mongo_command_failures_total.inc(collection, command_name)
+            if shape is not None:
+                self._record_shape(collection, command_name, shape, seconds, database, slow_command)
+
+    def _record_shape(self, collection: str, command_name: str, shape: str, seconds: float,
+                      database: Optional[str], slow_command: Optional[dict]):
+        key = (collection, command_name, shape)
+        stats = self.shapes.get(key)
+        if stats is None:
+            if len(self.shapes) >= self.max_shapes:
+                return
+            stats = self.shapes[key] = {
+                "collection": collection, "command": command_name, "shape": shape,
+                "count": 0, "total_ms": 0.0, "max_ms": 0.0, "slow": 0, "plan": None
+            }
+        elapsed_ms = seconds * 1000
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        if elapsed_ms < self.slow_ms:
+            return
+        
+        stats["slow"] += 1
+        self.slow_commands += 1
+        logger.warning(f"Slow MongoDB {command_name} on {collection}: {elapsed_ms:.1f} ms, shape {shape}")
+        if self.explain and slow_command is not None and stats["plan"] is None:
+            stats["plan"] = {"pending": True}
+            run_in_background(self._capture_explain(stats, database, slow_command))
+
+    async def _capture_explain(self, stats: dict, database: str, command: dict):
+        explained = {key: value for key, value in command.items()
+                     if not key.startswith("$") and key not in EXPLAIN_DROP_KEYS}
+        try:
+            result = await client[database].command({"explain": explained, "verbosity": "executionStats"})
+            stats["plan"] = summarize_explain(result)
+            self.explains += 1
+            if stats["plan"]["collscan"]:
+                logger.warning(f"COLLSCAN in {stats['command']} on {stats['collection']}: {stats['shape']}")
+        except Exception as e:
+            stats["plan"] = {"error": str(e)}
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(1)
+            self.drain()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_summary(self, limit: int) -> dict:
+        self.drain()
+        ranked = sorted(self.shapes.values(), key=lambda stats: stats["total_ms"], reverse=True)[:limit]
+        return {
+            "slow_query_ms": self.slow_ms,
+            "slow_commands": self.slow_commands,
+            "explains": self.explains,
+            "shapes": [{
+                **stats,
+                "total_ms": round(stats["total_ms"], 2),
+                "avg_ms": round(stats["total_ms"] / stats["count"], 2),
+                "max_ms": round(stats["max_ms"], 2)
+            } for stats in ranked]
+        }
+
+mongo_command_listener = MongoCommandListener(MONGO_SLOW_QUERY_MS, MONGO_EXPLAIN_SLOW_QUERIES, MONGO_MAX_QUERY_SHAPES)
+
+class MetricsMiddleware:
+    """ASGI middleware counting /api requests by route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api"):
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        status = 500
+        
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                route = scope.get("route")
+                route_path = getattr(route, "path", "unmatched")
+                http_request_seconds.observe(time.perf_counter() - started, scope["method"], route_path)
+                http_requests_total.inc(scope["method"], route_path, status)
+            await send(message)
+        
+        await self.app(scope, receive, send_with_metrics)
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_command_listener])
+db = client[os.environ['DB_NAME']]
 
 # ==================== ENUMS ====================
 
@@ -52,6 +642,16 @@ class DriverStatus(str, Enum):
     ACTIVE = "ACTIVE"
     BLOCKED = "BLOCKED"
 
+class ClaimFailure(str, Enum):
+    DRIVER_UNAVAILABLE = "driver_unavailable"
+    ORDER_TAKEN = "order_taken"
+
+class MessagePriority(int, Enum):
+    ASSIGNMENT = 0   # "Водитель назначен" для клиента
+    INTERACTIVE = 1  # Ответы на действия пользователя (регистрация, /start, ЛС водителю)
+    BROADCAST = 2    # Рассылка заказов в группу водителей и её очистка
+    BACKGROUND = 3   # Сообщения от администратора и фоновых задач
+
 class ActionType(str, Enum):
     ORDER_CREATED = "ORDER_CREATED"
     ORDER_BROADCAST = "ORDER_BROADCAST"
@@ -115,6 +715,7 @@ class OrderModel(BaseModel):
     assigned_at: Optional[str] = None
     completed_at: Optional[str] = None
     cancelled_at: Optional[str] = None
+    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class ActionLogModel(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -126,6 +727,7 @@ class ActionLogModel(BaseModel):
     admin_id: Optional[str] = None
     details: Optional[str] = None
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    written_at: Optional[str] = None  # Время записи в базу (для дельта-синхронизации)
 
 class AdminModel(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -138,6 +740,74 @@ class AdminModel(BaseModel):
 
 # ==================== REQUEST/RESPONSE SCHEMAS ====================
 
+# Lean list views: the fields the admin tables render. The field names also
+# serve as the Mongo projection, so the rest of the document is never read.
+class OrderSummary(BaseModel):
+    id: str
+    status: OrderStatus
+    client_phone: Optional[str] = None
+    client_price: int = 0
+    address_from: str
+    address_to: str
+    comment: Optional[str] = None
+    driver_id: Optional[str] = None
+    driver_name: Optional[str] = None
+    driver_phone: Optional[str] = None
+    created_at: str
+    assigned_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+class DriverSummary(BaseModel):
+    id: str
+    telegram_id: str
+    username: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    phone: Optional[str] = None
+    car_brand: Optional[str] = None
+    car_model: Optional[str] = None
+    car_color: Optional[str] = None
+    car_plate: Optional[str] = None
+    is_registered: bool = False
+    status: DriverStatus = DriverStatus.ACTIVE
+    is_busy: bool = False
+    created_at: str
+
+class OrderHistoryItem(BaseModel):
+    id: str
+    status: OrderStatus
+    client_price: int = 0
+    address_from: str
+    address_to: str
+    comment: Optional[str] = None
+    driver_name: Optional[str] = None
+    driver_car: Optional[str] = None
+    created_at: str
+    completed_at: Optional[str] = None
+    cancelled_at: Optional[str] = None
+
+ItemT = TypeVar("ItemT")
+
+class Page(BaseModel, Generic[ItemT]):
+    items: List[ItemT]
+    next_cursor: Optional[str] = None
+    high_water_mark: Optional[str] = None
+    has_more: Optional[bool] = None
+
+def summary_projection(model) -> dict:
+    return {"_id": 0, **{name: 1 for name in model.model_fields}}
+
+def projected_model(model, name: str):
+    """Schema of a `fields=` response: any subset of the model's fields"""
+    return create_model(name, **{
+        field: (Optional[info.annotation], None) for field, info in model.model_fields.items()
+    })
+
+OrderFields = projected_model(OrderModel, "OrderFields")
+DriverFields = projected_model(DriverModel, "DriverFields")
+ClientFields = projected_model(ClientModel, "ClientFields")
+ActionLogFields = projected_model(ActionLogModel, "ActionLogFields")
+
 class CreateOrderRequest(BaseModel):
     address_from: str
     address_to: str
@@ -173,6 +843,140 @@ class AssignDriverRequest(BaseModel):
 class SetDriversChatRequest(BaseModel):
     chat_id: str
 
+class LogLevelRequest(BaseModel):
+    logger: str = "root"
+    level: str
+
+class ProfilerSettingsRequest(BaseModel):
+    enabled: bool
+    sample_rate: Optional[float] = Field(None, ge=0, le=1)
+    threshold_ms: Optional[float] = Field(None, ge=0)
+    interval_ms: Optional[float] = Field(None, ge=1)
+
+# ==================== DATABASE INDEXES ====================
+
+# Declarative index registry: every hot query filters on non-_id fields
+MONGO_INDEXES = {
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("client_telegram_id", ASCENDING), ("status", ASCENDING)], name="client_status"),
+        IndexModel([("client_telegram_id", ASCENDING), ("created_at", DESCENDING)], name="client_created_at"),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="status_created_at_id"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("updated_at", ASCENDING), ("id", ASCENDING)], name="updated_at_id"),
+    ],
+    "drivers": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("telegram_id", ASCENDING)], name="telegram_id"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        # Free-driver lists for manual assignment; its status prefix serves the dashboard counter
+        IndexModel([("status", ASCENDING), ("is_busy", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+                   name="status_is_busy_created_at_id"),
+        IndexModel([("is_busy", ASCENDING)], name="is_busy"),
+    ],
+    "clients": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # One client per Telegram user: concurrent first requests upsert into the same document
+        IndexModel([("telegram_id", ASCENDING)], name="telegram_id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+    ],
+    "admins": [
+        IndexModel([("telegram_id", ASCENDING)], name="telegram_id"),
+    ],
+    "action_logs": [
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("written_at", ASCENDING), ("id", ASCENDING)], name="written_at_id"),
+    ],
+    "telegram_updates": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=TELEGRAM_DEDUP_TTL_SECONDS),
+    ],
+    "leases": [
+        # Cleanup only: a lease is free once expires_at passes, the document may linger
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=60),
+    ],
+}
+
+# Index options that make two indexes with the same keys behave differently
+INDEX_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+def describe_index_drift(declared: dict, existing: dict) -> list:
+    """Compare a declared index document with index_information() output"""
+    problems = []
+    existing_key = [(field, int(direction)) if isinstance(direction, (int, float)) else (field, direction)
+                    for field, direction in existing.get("key", [])]
+    if existing_key != list(declared["key"].items()):
+        problems.append(f"key {existing_key} != {list(declared['key'].items())}")
+    for option in INDEX_OPTIONS:
+        if existing.get(option) != declared.get(option):
+            problems.append(f"{option} {existing.get(option)!r} != {declared.get(option)!r}")
+    return problems
+
+async def ensure_indexes() -> dict:
+    """Create missing indexes and warn about drift; safe to run on every startup"""
+    report = {}
+    for collection_name, indexes in MONGO_INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        created, drifted = [], []
+        missing = []
+        
+        for index in indexes:
+            declared = index.document
+            name = declared["name"]
+            if name not in existing:
+                missing.append(index)
+                continue
+            problems = describe_index_drift(declared, existing[name])
+            if problems:
+                drifted.append(name)
+                logger.warning(f"Index drift on {collection_name}.{name}: {'; '.join(problems)}")
+        
+        for index in missing:
+            try:
+                await collection.create_indexes([index])
+                created.append(index.document["name"])
+            except OperationFailure as e:
+                drifted.append(index.document["name"])
+                logger.warning(f"Cannot create index {collection_name}.{index.document['name']}: {e}")
+        
+        declared_names = {index.document["name"] for index in indexes}
+        undeclared = [name for name in existing if name != "_id_" and name not in declared_names]
+        if undeclared:
+            logger.warning(f"Undeclared indexes on {collection_name}: {', '.join(undeclared)}")
+        
+        if created:
+            logger.info(f"Created indexes on {collection_name}: {', '.join(created)}")
+        report[collection_name] = {"created": created, "drifted": drifted, "undeclared": undeclared}
+    return report
+
+async def get_index_usage() -> dict:
+    """Collect $indexStats for every registered collection"""
+    usage = {}
+    for collection_name, indexes in MONGO_INDEXES.items():
+        declared_names = {index.document["name"] for index in indexes}
+        try:
+            stats = await db[collection_name].aggregate([{"$indexStats": {}}]).to_list(None)
+        except OperationFailure as e:
+            usage[collection_name] = {"error": str(e)}
+            continue
+        
+        found = set()
+        entries = []
+        for entry in sorted(stats, key=lambda item: item["name"]):
+            found.add(entry["name"])
+            entries.append({
+                "name": entry["name"],
+                "key": dict(entry["key"]),
+                "ops": entry["accesses"]["ops"],
+                "since": entry["accesses"]["since"].isoformat(),
+                "declared": entry["name"] in declared_names or entry["name"] == "_id_"
+            })
+        usage[collection_name] = {
+            "indexes": entries,
+            "missing": sorted(declared_names - found)
+        }
+    return usage
+
 # ==================== HELPER FUNCTIONS ====================
 
 def verify_telegram_auth(auth_data: dict) -> bool:
@@ -192,25 +996,820 @@ def verify_telegram_auth(auth_data: dict) -> bool:
     
     return hmac_hash == check_hash
 
+MAX_PAGE_SIZE = 200
+
+# `fields=` on list and detail endpoints becomes the Mongo projection. Only
+# model fields can be requested; list views default to their summary. The
+# projected shape is documented by the *Fields models (every field optional).
+PROJECTABLE_FIELDS = {
+    "orders": frozenset(OrderModel.model_fields),
+    "drivers": frozenset(DriverModel.model_fields),
+    "clients": frozenset(ClientModel.model_fields),
+    "action_logs": frozenset(ActionLogModel.model_fields),
+}
+# Cursors page on (created_at, id); delta sync reads orders' updated_at and logs' written_at
+ALWAYS_PROJECTED = {
+    "orders": ("id", "created_at", "updated_at"),
+    "drivers": ("id", "created_at"),
+    "clients": ("id", "created_at"),
+    "action_logs": ("id", "created_at", "written_at"),
+}
+
+FULL_PROJECTION = {"_id": 0}
+ORDER_SUMMARY_PROJECTION = summary_projection(OrderSummary)
+ORDER_HISTORY_PROJECTION = summary_projection(OrderHistoryItem)
+DRIVER_SUMMARY_PROJECTION = summary_projection(DriverSummary)
+CLIENT_SUMMARY_PROJECTION = summary_projection(ClientModel)
+ACTION_LOG_PROJECTION = summary_projection(ActionLogModel)
+
+def parse_fields(collection: str, fields: Optional[str], default: dict) -> dict:
+    """Projection for a comma-separated `fields` parameter; `all` selects every field"""
+    if not fields:
+        return default
+    allowed = PROJECTABLE_FIELDS[collection]
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if requested == {"all"}:
+        requested = set(allowed)
+    unknown = requested - allowed
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Недопустимые поля: {', '.join(sorted(unknown))}")
+    return {"_id": 0, **{name: 1 for name in sorted(requested.union(ALWAYS_PROJECTED[collection]))}}
+
+
+def encode_cursor(doc: dict, field: str = "created_at") -> str:
+    """Build an opaque cursor pointing after the given document"""
+    raw = json.dumps([doc[field], doc["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, doc_id = json.loads(raw)
+        if not isinstance(created_at, str) or not isinstance(doc_id, str):
+            raise ValueError(cursor)
+        return created_at, doc_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+async def paginate(collection, query: dict, limit: int, cursor: Optional[str] = None,
+                   projection: Optional[dict] = None) -> dict:
+    """Keyset pagination over (created_at, id), newest first.
+
+    Every page is an indexed range scan, so deep pages cost the same as the first.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        after_cursor = {"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": doc_id}}
+        ]}
+        query = {"$and": [query, after_cursor]} if query else after_cursor
+    
+    docs = await collection.find(query, projection or {"_id": 0}) \
+        .sort([("created_at", -1), ("id", -1)]) \
+        .limit(limit + 1) \
+        .to_list(limit + 1)
+    
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return {"items": docs[:limit], "next_cursor": next_cursor}
+
+# Writes are stamped before they commit, so a document can become visible with a
+# timestamp slightly behind ones already returned; the high-water mark trails
+# "now" by this much and callers merge the overlap by id.
+DELTA_SYNC_OVERLAP_SECONDS = float(os.environ.get('DELTA_SYNC_OVERLAP_SECONDS', '5'))
+
+def parse_since(since: str) -> str:
+    try:
+        since_dt = datetime.fromisoformat(since.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный параметр since")
+    if since_dt.tzinfo is None:
+        since_dt = since_dt.replace(tzinfo=timezone.utc)
+    return since_dt.astimezone(timezone.utc).isoformat()
+
+def delta_sync_horizon() -> str:
+    """Newest high-water mark that is safe to hand out right now"""
+    return (datetime.now(timezone.utc) - timedelta(seconds=DELTA_SYNC_OVERLAP_SECONDS)).isoformat()
+
+async def fetch_changes(collection, field: str, since: str, limit: int, projection: Optional[dict] = None,
+                        cursor: Optional[str] = None) -> dict:
+    """Documents whose `field` is newer than `since`, oldest change first.
+
+    Pages are ordered by (field, id): many documents can share one timestamp
+    (a bulk expiry stamps hundreds), so while `has_more` is set the caller
+    follows `next_cursor` with the same `since`, and the high-water mark only
+    advances on the last page. Delivery is at-least-once: recent changes may
+    be returned again on the next call, so callers upsert items by id.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    since = parse_since(since)
+    query = {field: {"$gt": since}}
+    if cursor:
+        value, doc_id = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {field: {"$gt": value}},
+            {field: value, "id": {"$gt": doc_id}}
+        ]}]}
+    docs = await collection.find(query, projection or {"_id": 0}) \
+        .sort([(field, 1), ("id", 1)]) \
+        .limit(limit + 1) \
+        .to_list(limit + 1)
+    
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if has_more:
+        return {"items": docs, "high_water_mark": since, "has_more": True,
+                "next_cursor": encode_cursor(docs[-1], field)}
+    high_water_mark = since
+    if docs:
+        high_water_mark = max(since, min(docs[-1][field], delta_sync_horizon()))
+    return {"items": docs, "high_water_mark": high_water_mark, "has_more": False, "next_cursor": None}
+
 def parse_telegram_init_data(init_data: str) -> dict:
     """Parse Telegram Mini App init data"""
     data = dict(parse_qsl(init_data))
     return data
 
+class ActionLogWriter:
+    """Write-behind buffer for action logs.
+
+    Entries are appended without a Mongo round-trip and flushed with
+    insert_many(ordered=False) when a batch fills up or the flush interval
+    passes. When the buffer is full, writers wait for the next flush.
+    
+    A batch leaves the buffer only once Mongo has taken it: when the insert
+    fails it stays at the front and is retried with exponential backoff, so
+    an outage turns into backpressure instead of lost entries. Retries are
+    safe because insert_many assigns `_id` to the documents in place, and a
+    re-sent entry that already landed comes back as a duplicate key. Entries
+    are dropped only when shutdown runs out of time, and that is logged.
+    
+    Every insert attempt stamps `written_at`, which log delta sync reads:
+    an entry held back by retries keeps its `created_at` but becomes
+    visible to pollers when it actually lands.
+    """
+
+    RETRY_INITIAL_SECONDS = 0.5
+
+    def __init__(self, batch_size: int, buffer_size: int, flush_interval: float, write_concern: str,
+                 retry_max_seconds: float = 30.0, shutdown_timeout: float = 10.0):
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.retry_max_seconds = retry_max_seconds
+        self.shutdown_timeout = shutdown_timeout
+        w = int(write_concern) if write_concern.isdigit() else write_concern
+        self.write_concern = WriteConcern(w=w)
+        self._buffer: list = []
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self.dropped = 0
+        self.batches = 0
+        self.backpressure_waits = 0
+        self.last_batch_size = 0
+        self.total_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    async def _wait_for_space(self):
+        while len(self._buffer) >= self.buffer_size:
+            self.backpressure_waits += 1
+            self._space.clear()
+            self._wakeup.set()
+            await self._space.wait()
+
+    @staticmethod
+    def _stamp(docs: list):
+        written_at = datetime.now(timezone.utc).isoformat()
+        for doc in docs:
+            doc["written_at"] = written_at
+
+    async def write(self, doc: dict):
+        if self._task is None:
+            # Writer not running (scripts, shutdown) - write directly
+            self._stamp([doc])
+            await db.action_logs.insert_one(doc)
+            return
+        
+        await self._wait_for_space()
+        self._buffer.append(doc)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def write_many(self, docs: list):
+        if not docs:
+            return
+        if self._task is None:
+            self._stamp(docs)
+            await db.action_logs.insert_many(docs, ordered=False)
+            return
+        
+        # In slices that fit, so a large batch cannot overrun the bound
+        docs = list(docs)
+        while docs:
+            await self._wait_for_space()
+            room = self.buffer_size - len(self._buffer)
+            self._buffer.extend(docs[:room])
+            del docs[:room]
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.set()
+
+    async def _write_batch(self, batch: list) -> bool:
+        """Insert one batch; False means a transient failure worth retrying"""
+        started = time.perf_counter()
+        self._stamp(batch)
+        try:
+            collection = db.action_logs.with_options(write_concern=self.write_concern)
+            await collection.insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except BulkWriteError as e:
+            # Duplicate keys are entries that landed before a retried failure
+            errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != 11000]
+            self.written += len(batch) - len(errors)
+            self.failed += len(errors)
+            if errors:
+                logger.error(f"Action log batch partially failed: {len(errors)} of {len(batch)} entries")
+        except InvalidDocument as e:
+            # Rejected before reaching Mongo; retrying would never succeed
+            self.failed += len(batch)
+            logger.error(f"Action log batch of {len(batch)} entries rejected: {e}")
+        except Exception as e:
+            self.retries += 1
+            logger.warning(f"Action log batch of {len(batch)} entries failed, will retry: {e}")
+            return False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        self.total_flush_ms += elapsed_ms
+        if elapsed_ms > self.max_flush_ms:
+            self.max_flush_ms = elapsed_ms
+        return True
+
+    async def _flush(self):
+        delay = self.RETRY_INITIAL_SECONDS
+        while self._buffer:
+            batch = self._buffer[:self.batch_size]
+            if not await self._write_batch(batch):
+                # Keep the batch at the front and back off; new entries
+                # queue behind it until the buffer bound stops writers
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.retry_max_seconds)
+                continue
+            
+            delay = self.RETRY_INITIAL_SECONDS
+            # Only _flush removes from the front, writers append at the end
+            del self._buffer[:len(batch)]
+            self._space.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher after it has written everything still buffered.
+
+        Gives up after `shutdown_timeout`; whatever is still buffered then
+        is dropped and logged as critical.
+        """
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        deadline = time.monotonic() + self.shutdown_timeout
+        try:
+            await asyncio.wait_for(self._task, timeout=self.shutdown_timeout)
+            # Entries added while the last flush was in progress
+            await asyncio.wait_for(self._flush(), timeout=max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            pass
+        self._task = None
+        
+        if self._buffer:
+            self.dropped += len(self._buffer)
+            logger.critical(
+                f"Action log: DROPPING {len(self._buffer)} entries not written within the "
+                f"{self.shutdown_timeout:g}s shutdown timeout"
+            )
+            self._buffer.clear()
+            self._space.set()
+
+    def get_stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "failed": self.failed,
+            "retries": self.retries,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_size": round(self.written / self.batches, 1) if self.batches else 0.0,
+            "avg_flush_ms": round(self.total_flush_ms / self.batches, 2) if self.batches else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "backpressure_waits": self.backpressure_waits
+        }
+
+action_log_writer = ActionLogWriter(
+    ACTION_LOG_BATCH_SIZE, ACTION_LOG_BUFFER_SIZE, ACTION_LOG_FLUSH_INTERVAL, ACTION_LOG_WRITE_CONCERN,
+    ACTION_LOG_RETRY_MAX_SECONDS, ACTION_LOG_SHUTDOWN_TIMEOUT
+)
+
 async def log_action(action_type: ActionType, **kwargs):
     """Log action to database"""
     log_entry = ActionLogModel(action_type=action_type, **kwargs)
     doc = log_entry.model_dump()
-    await db.action_logs.insert_one(doc)
+    await action_log_writer.write(doc)
     return log_entry
 
-async def send_telegram_message(chat_id: str, text: str, reply_markup: dict = None):
+async def log_actions(entries: List[ActionLogModel]):
+    """Log several actions at once"""
+    await action_log_writer.write_many([entry.model_dump() for entry in entries])
+
+# ==================== SETTINGS STORE ====================
+
+class SettingsStore:
+    """Runtime settings shared by every worker and replica.
+
+    A single document in `settings` holds the values and a version that
+    every write increments. Each process reads from its in-memory copy;
+    a background task polls only the version (a point read on `_id`) and
+    reloads the document when it changed, so a change made through one
+    worker reaches the others within `refresh_seconds`. On first start the
+    document is seeded from the environment.
+    """
+
+    DOC_ID = "app"
+
+    def __init__(self, defaults: dict, refresh_seconds: float):
+        self.defaults = defaults
+        self.refresh_seconds = refresh_seconds
+        self._values = dict(defaults)
+        self._task: Optional[asyncio.Task] = None
+        self.version = 0
+        self.checks = 0
+        self.reloads = 0
+        self.failed_checks = 0
+
+    @property
+    def drivers_chat_id(self) -> str:
+        return self._values.get("drivers_chat_id") or ""
+
+    def _apply(self, doc: Optional[dict]):
+        if doc is None:
+            return
+        self._values = {key: doc.get(key, default) for key, default in self.defaults.items()}
+        self.version = doc.get("version", 0)
+
+    async def load(self):
+        try:
+            await db.settings.update_one(
+                {"_id": self.DOC_ID},
+                {"$setOnInsert": {**self.defaults, "version": 1}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            pass  # another worker seeded it at the same moment
+        self._apply(await db.settings.find_one({"_id": self.DOC_ID}))
+        self.reloads += 1
+
+    async def refresh(self):
+        self.checks += 1
+        doc = await db.settings.find_one({"_id": self.DOC_ID}, {"version": 1})
+        if doc is not None and doc.get("version", 0) != self.version:
+            await self.load()
+
+    async def update(self, **values):
+        doc = await db.settings.find_one_and_update(
+            {"_id": self.DOC_ID},
+            {"$set": values, "$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._apply(doc)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.failed_checks += 1
+                logger.error(f"Settings refresh failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_stats(self) -> dict:
+        return {
+            "version": self.version,
+            "checks": self.checks,
+            "reloads": self.reloads,
+            "failed_checks": self.failed_checks
+        }
+
+settings_store = SettingsStore({"drivers_chat_id": TELEGRAM_DRIVERS_CHAT_ID}, SETTINGS_REFRESH_SECONDS)
+
+# ==================== TELEGRAM BOT API CLIENT ====================
+
+class TelegramMethodStats:
+    """Latency counters for a single Bot API method"""
+    __slots__ = ("calls", "errors", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float, ok: bool):
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 2)
+        }
+
+class TelegramBotClient:
+    """Long-lived Bot API client with keep-alive pooling shared by all helpers"""
+
+    def __init__(self, token: str, base_url: str = TELEGRAM_API_BASE):
+        self.token = token
+        self.base_url = base_url
+        self.stats: dict = {}
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def _create_http_client(self) -> httpx.AsyncClient:
+        http2 = TELEGRAM_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("TELEGRAM_HTTP2 is set but the 'h2' package is not installed, using HTTP/1.1")
+                http2 = False
+        return httpx.AsyncClient(
+            base_url=f"{self.base_url}/bot{self.token}",
+            http2=http2,
+            timeout=httpx.Timeout(
+                connect=TELEGRAM_CONNECT_TIMEOUT,
+                read=TELEGRAM_READ_TIMEOUT,
+                write=TELEGRAM_READ_TIMEOUT,
+                pool=TELEGRAM_CONNECT_TIMEOUT
+            ),
+            limits=httpx.Limits(
+                max_connections=TELEGRAM_MAX_CONNECTIONS,
+                max_keepalive_connections=TELEGRAM_MAX_CONNECTIONS,
+                keepalive_expiry=60
+            )
+        )
+
+    async def start(self):
+        if self._http is None:
+            self._http = self._create_http_client()
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def call(self, method: str, payload: dict) -> Optional[dict]:
+        """Call a Bot API method and return the decoded JSON response"""
+        if self._http is None:
+            # Helpers may be used before startup (e.g. from scripts)
+            await self.start()
+
+        stats = self.stats.get(method)
+        if stats is None:
+            stats = self.stats[method] = TelegramMethodStats()
+
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = await self._http.post(f"/{method}", json=payload)
+            result = response.json()
+            ok = bool(result.get("ok"))
+            if not ok:
+                logger.warning(f"Telegram {method} failed: {result.get('error_code')} {result.get('description')}")
+                if result.get("error_code") == 429:
+                    telegram_api_flood_total.inc(method)
+            return result
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"Telegram {method} request error: {e!r}")
+            return None
+        finally:
+            elapsed = time.perf_counter() - started
+            stats.observe(elapsed * 1000, ok)
+            telegram_api_seconds.observe(elapsed, method)
+            if not ok:
+                telegram_api_errors_total.inc(method)
+
+    def get_stats(self) -> dict:
+        return {method: stats.as_dict() for method, stats in self.stats.items()}
+
+telegram_api = TelegramBotClient(TELEGRAM_BOT_TOKEN)
+
+# ==================== TELEGRAM OUTBOUND SCHEDULER ====================
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second"""
+    __slots__ = ("rate", "capacity", "tokens", "updated_at", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, now: float, seconds: float):
+        """Honour retry_after: no tokens until the penalty expires"""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0
+        self.updated_at = max(now, self.blocked_until)
+
+class OutboundMessage:
+    __slots__ = ("priority", "seq", "method", "payload", "chat_id", "future", "attempts")
+
+    def __init__(self, priority: int, seq: int, method: str, payload: dict, chat_id: str, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.method = method
+        self.payload = payload
+        self.chat_id = chat_id
+        self.future = future
+        self.attempts = 0
+
+    def __lt__(self, other: "OutboundMessage") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+# Per-chat flood limits count new messages only; edits and deletes share just the global budget
+CHAT_RATE_LIMITED_METHODS = frozenset({"sendMessage"})
+
+class TelegramOutbox:
+    """Prioritized outbound queue that keeps Bot API traffic within flood limits.
+
+    Messages wait in priority heaps keyed by chat and by whether the method
+    spends chat tokens. Queues whose head message may go out are kept in a
+    `_ready` heap ordered by that message's priority; throttled queues sit in
+    a `_waiting` heap ordered by the time their bucket allows the next call,
+    so a dispatch costs O(log queues) however many messages are held back.
+    A message answered with 429 goes back to the head of its queue.
+    
+    Only new messages spend chat tokens, so deleting or editing a broadcast
+    does not take a slot from the next one; a retry_after penalty still
+    holds back every call to the chat.
+    """
+
+    def __init__(self, api: TelegramBotClient):
+        self.api = api
+        self._queues: dict = {}  # (chat_id, spends chat tokens) -> heap of OutboundMessage
+        self._ready: list = []  # (priority, seq, token, key) of each queue's head
+        self._waiting: list = []  # (eligible_at, token, key)
+        # Latest heap entry per queue; older entries for the queue are stale
+        self._entries: dict = {}
+        self._tokens = itertools.count()
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._global = TokenBucket(TELEGRAM_GLOBAL_RATE, TELEGRAM_GLOBAL_RATE)
+        self._chats: dict = {}
+        self._inflight = asyncio.Semaphore(TELEGRAM_MAX_CONNECTIONS)
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.rate_limited = 0
+        self.failed = 0
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= 10000:
+                self._prune_idle_chats()
+            if chat_id.startswith(("-", "@")):
+                rate = TELEGRAM_GROUP_RATE_PER_MINUTE / 60
+                bucket = TokenBucket(rate, max(1.0, min(3.0, TELEGRAM_GROUP_RATE_PER_MINUTE / 6)))
+            else:
+                bucket = TokenBucket(TELEGRAM_PRIVATE_RATE, max(1.0, TELEGRAM_PRIVATE_RATE * 3))
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _prune_idle_chats(self):
+        """Forget buckets that have been idle long enough to be full again"""
+        now = time.monotonic()
+        for chat_id in [chat_id for chat_id, bucket in self._chats.items()
+                        if now - bucket.updated_at > 60 and now > bucket.blocked_until]:
+            del self._chats[chat_id]
+
+    async def submit(self, method: str, payload: dict, priority: MessagePriority = MessagePriority.INTERACTIVE) -> Optional[dict]:
+        """Queue a chat-bound Bot API call and wait for its result"""
+        if self._task is None:
+            # Scheduler not running (scripts, shutdown) - call directly
+            return await self.api.call(method, payload)
+
+        future = asyncio.get_running_loop().create_future()
+        message = OutboundMessage(int(priority), next(self._seq), method, payload, str(payload["chat_id"]), future)
+        self._enqueue(message)
+        return await future
+
+    def _enqueue(self, message: OutboundMessage):
+        key = (message.chat_id, message.method in CHAT_RATE_LIMITED_METHODS)
+        chat_queue = self._queues.setdefault(key, [])
+        heapq.heappush(chat_queue, message)
+        if chat_queue[0] is message:
+            self._schedule(key)
+        self._wakeup.set()
+
+    def _schedule(self, key: tuple):
+        """Put a queue in the ready heap under its current head message"""
+        chat_queue = self._queues.get(key)
+        if not chat_queue:
+            self._queues.pop(key, None)
+            self._entries.pop(key, None)
+            return
+        token = next(self._tokens)
+        self._entries[key] = token
+        heapq.heappush(self._ready, (chat_queue[0].priority, chat_queue[0].seq, token, key))
+
+    def _park(self, key: tuple, eligible_at: float):
+        token = next(self._tokens)
+        self._entries[key] = token
+        heapq.heappush(self._waiting, (eligible_at, token, key))
+
+    def depth(self) -> int:
+        return sum(len(chat_queue) for chat_queue in self._queues.values())
+
+    def _chat_delay(self, message: OutboundMessage, now: float) -> float:
+        bucket = self._chat_bucket(message.chat_id)
+        if message.method in CHAT_RATE_LIMITED_METHODS:
+            return bucket.delay(now)
+        return max(0.0, bucket.blocked_until - now)
+
+    def _pop_ready(self, now: float):
+        """Pop the most important message that may be sent now and charge its tokens.
+
+        Returns (message, 0) or (None, seconds until something may be ready).
+        """
+        while self._waiting and self._waiting[0][0] <= now:
+            _, token, key = heapq.heappop(self._waiting)
+            if self._entries.get(key) == token:
+                self._schedule(key)
+        
+        global_delay = self._global.delay(now)
+        if global_delay > 0:
+            return None, global_delay
+        while self._ready:
+            _, _, token, key = heapq.heappop(self._ready)
+            if self._entries.get(key) != token:
+                continue
+            chat_queue = self._queues[key]
+            chat_delay = self._chat_delay(chat_queue[0], now)
+            if chat_delay > 0:
+                self._park(key, now + chat_delay)
+                continue
+            message = heapq.heappop(chat_queue)
+            self._schedule(key)
+            self._global.consume(now)
+            if message.method in CHAT_RATE_LIMITED_METHODS:
+                self._chat_bucket(message.chat_id).consume(now)
+            return message, 0
+        return None, (self._waiting[0][0] - now if self._waiting else None)
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            message, wait = self._pop_ready(now)
+            if message is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._inflight.acquire()
+            run_in_background(self._deliver(message))
+
+    async def _deliver(self, message: OutboundMessage):
+        try:
+            message.attempts += 1
+            result = await self.api.call(message.method, message.payload)
+            if result and result.get("error_code") == 429 and message.attempts <= TELEGRAM_MAX_RETRIES:
+                retry_after = float(result.get("parameters", {}).get("retry_after", 1))
+                self.rate_limited += 1
+                logger.warning(f"Telegram flood limit for chat {message.chat_id}, retry after {retry_after}s")
+                self._chat_bucket(message.chat_id).block(time.monotonic(), retry_after)
+                # Keep the original sequence number so the message stays ahead of newer ones
+                self._enqueue(message)
+                return
+
+            if result and result.get("ok"):
+                self.sent += 1
+            else:
+                self.failed += 1
+            if not message.future.done():
+                message.future.set_result(result)
+        except Exception as e:
+            self.failed += 1
+            if not message.future.done():
+                message.future.set_exception(e)
+        finally:
+            self._inflight.release()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        """Give queued messages a chance to go out, then stop the dispatcher"""
+        if self._task is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self._queues and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self._task.cancel()
+        self._task = None
+        for chat_queue in self._queues.values():
+            for message in chat_queue:
+                if not message.future.done():
+                    message.future.set_result(None)
+                self.failed += 1
+        self._queues.clear()
+        self._entries.clear()
+        self._ready.clear()
+        self._waiting.clear()
+
+    def get_stats(self) -> dict:
+        queued = {priority.name: 0 for priority in MessagePriority}
+        for chat_queue in self._queues.values():
+            for message in chat_queue:
+                queued[MessagePriority(message.priority).name] += 1
+        return {
+            "queued": queued,
+            "throttled_queues": sum(1 for _, token, key in self._waiting if self._entries.get(key) == token),
+            "sent": self.sent,
+            "rate_limited": self.rate_limited,
+            "failed": self.failed,
+            "tracked_chats": len(self._chats)
+        }
+
+telegram_outbox = TelegramOutbox(telegram_api)
+
+async def send_telegram_message(chat_id: str, text: str, reply_markup: dict = None,
+                                priority: MessagePriority = MessagePriority.INTERACTIVE):
     """Send message via Telegram Bot API"""
     if not TELEGRAM_BOT_TOKEN:
         logger.warning("Telegram bot token not configured")
         return None
     
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = {
         "chat_id": chat_id,
         "text": text,
@@ -219,16 +1818,14 @@ async def send_telegram_message(chat_id: str, text: str, reply_markup: dict = No
     if reply_markup:
         payload["reply_markup"] = reply_markup
     
-    async with httpx.AsyncClient() as http_client:
-        response = await http_client.post(url, json=payload)
-        return response.json()
+    return await telegram_outbox.submit("sendMessage", payload, priority)
 
-async def edit_telegram_message(chat_id: str, message_id: int, text: str, reply_markup: dict = None):
+async def edit_telegram_message(chat_id: str, message_id: int, text: str, reply_markup: dict = None,
+                                priority: MessagePriority = MessagePriority.INTERACTIVE):
     """Edit message via Telegram Bot API"""
     if not TELEGRAM_BOT_TOKEN:
         return None
     
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/editMessageText"
     payload = {
         "chat_id": chat_id,
         "message_id": message_id,
@@ -238,31 +1835,43 @@ async def edit_telegram_message(chat_id: str, message_id: int, text: str, reply_
     if reply_markup:
         payload["reply_markup"] = reply_markup
     
-    async with httpx.AsyncClient() as http_client:
-        response = await http_client.post(url, json=payload)
-        return response.json()
+    return await telegram_outbox.submit("editMessageText", payload, priority)
 
-async def delete_telegram_message(chat_id: str, message_id: int):
+async def delete_telegram_message(chat_id: str, message_id: int,
+                                  priority: MessagePriority = MessagePriority.BROADCAST):
     """Delete message via Telegram Bot API"""
     if not TELEGRAM_BOT_TOKEN or not message_id:
         return None
     
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/deleteMessage"
     payload = {
         "chat_id": chat_id,
         "message_id": message_id
     }
     
-    async with httpx.AsyncClient() as http_client:
-        response = await http_client.post(url, json=payload)
-        return response.json()
+    return await telegram_outbox.submit("deleteMessage", payload, priority)
+
+TELEGRAM_DELETE_BATCH_LIMIT = 100  # deleteMessages принимает до 100 сообщений
+
+async def delete_telegram_messages(chat_id: str, message_ids: List[int],
+                                   priority: MessagePriority = MessagePriority.BROADCAST):
+    """Delete several messages via the deleteMessages batch method"""
+    message_ids = sorted({message_id for message_id in message_ids if message_id})
+    if not TELEGRAM_BOT_TOKEN or not message_ids:
+        return []
+    
+    return await asyncio.gather(*(
+        telegram_outbox.submit("deleteMessages", {
+            "chat_id": chat_id,
+            "message_ids": message_ids[start:start + TELEGRAM_DELETE_BATCH_LIMIT]
+        }, priority)
+        for start in range(0, len(message_ids), TELEGRAM_DELETE_BATCH_LIMIT)
+    ))
 
 async def answer_callback_query(callback_query_id: str, text: str = None, show_alert: bool = False):
     """Answer callback query"""
     if not TELEGRAM_BOT_TOKEN:
         return None
     
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/answerCallbackQuery"
     payload = {
         "callback_query_id": callback_query_id,
         "show_alert": show_alert
@@ -270,15 +1879,12 @@ async def answer_callback_query(callback_query_id: str, text: str = None, show_a
     if text:
         payload["text"] = text
     
-    async with httpx.AsyncClient() as http_client:
-        response = await http_client.post(url, json=payload)
-        return response.json()
+    return await telegram_api.call("answerCallbackQuery", payload)
 
 async def broadcast_order_to_drivers(order: OrderModel):
     """Send order to drivers chat"""
-    global TELEGRAM_DRIVERS_CHAT_ID
-    
-    if not TELEGRAM_DRIVERS_CHAT_ID:
+    drivers_chat_id = settings_store.drivers_chat_id
+    if not drivers_chat_id:
         logger.warning("Drivers chat ID not configured")
         return None
     
@@ -299,22 +1905,360 @@ async def broadcast_order_to_drivers(order: OrderModel):
         ]]
     }
     
-    result = await send_telegram_message(TELEGRAM_DRIVERS_CHAT_ID, text, reply_markup)
+    result = await send_telegram_message(drivers_chat_id, text, reply_markup, MessagePriority.BROADCAST)
     
     if result and result.get("ok"):
         message_id = result["result"]["message_id"]
         await db.orders.update_one(
             {"id": order.id},
-            {"$set": {"telegram_message_id": message_id, "status": OrderStatus.BROADCAST}}
+            {"$set": {
+                "telegram_message_id": message_id,
+                "status": OrderStatus.BROADCAST,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }}
         )
+        await publish_order_change(order.client_telegram_id)
         await log_action(ActionType.ORDER_BROADCAST, order_id=order.id)
         return message_id
     
     return None
 
-async def notify_client(client_telegram_id: str, message: str):
+async def notify_client(client_telegram_id: str, message: str,
+                        priority: MessagePriority = MessagePriority.INTERACTIVE):
     """Send notification to client"""
-    await send_telegram_message(client_telegram_id, message)
+    await send_telegram_message(client_telegram_id, message, priority=priority)
+
+# ==================== PROFILE CACHE ====================
+
+_MISSING = object()
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+        # Bumped on every invalidation so reads that raced a write are not cached
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, epoch: int):
+        if epoch != self.epoch:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self.epoch += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self.epoch += 1
+        self._entries.clear()
+
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0
+        }
+
+driver_cache = TTLCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL_SECONDS)
+client_cache = TTLCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL_SECONDS)
+
+async def cached_find_by_telegram_id(cache: TTLCache, collection, telegram_id: str, fresh: bool = False) -> Optional[dict]:
+    """Read-through lookup.
+
+    Only found profiles are cached: a miss always goes to Mongo, so a
+    profile another worker has just created is seen at once. `fresh`
+    skips the cached copy for decisions that must not act on stale fields.
+    """
+    doc = _MISSING if fresh else cache.get(telegram_id)
+    if doc is _MISSING:
+        epoch = cache.epoch
+        doc = await collection.find_one({"telegram_id": telegram_id}, {"_id": 0})
+        if doc is None:
+            return None
+        cache.set(telegram_id, doc, epoch)
+    # Callers may modify the result
+    return dict(doc)
+
+async def get_driver_by_telegram_id(telegram_id: str, fresh: bool = False) -> Optional[dict]:
+    return await cached_find_by_telegram_id(driver_cache, db.drivers, telegram_id, fresh)
+
+async def get_client_by_telegram_id(telegram_id: str, fresh: bool = False) -> Optional[dict]:
+    return await cached_find_by_telegram_id(client_cache, db.clients, telegram_id, fresh)
+
+async def upsert_client(telegram_id: str, on_insert: dict, updates: Optional[dict] = None) -> dict:
+    """Create the client unless it already exists, apply `updates`, return the stored document.
+
+    An upsert on the unique telegram_id index, so two workers handling a
+    user's first requests end up with one client instead of two.
+    """
+    updates = updates or {}
+    new_client = ClientModel(telegram_id=telegram_id, **on_insert).model_dump()
+    update = {"$setOnInsert": {key: value for key, value in new_client.items() if key not in updates}}
+    if updates:
+        update["$set"] = updates
+    try:
+        doc = await db.clients.find_one_and_update(
+            {"telegram_id": telegram_id}, update, projection={"_id": 0},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # A concurrent upsert inserted first; this one now matches its document
+        doc = await db.clients.find_one_and_update(
+            {"telegram_id": telegram_id}, update, projection={"_id": 0},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+    invalidate_client(telegram_id)
+    return doc
+
+def invalidate_driver(telegram_id: Optional[str]):
+    if telegram_id:
+        driver_cache.invalidate(telegram_id)
+
+def invalidate_client(telegram_id: Optional[str]):
+    if telegram_id:
+        client_cache.invalidate(telegram_id)
+
+async def advance_registration(telegram_id: str, step: str, fields: dict) -> bool:
+    """Save a registration answer if the driver is still at `step`.
+
+    Returns False when the step was already answered - a duplicate delivery
+    or a worker with a stale view - so the next prompt is not sent twice.
+    """
+    result = await db.drivers.update_one(
+        {"telegram_id": telegram_id, "registration_step": step},
+        {"$set": fields}
+    )
+    invalidate_driver(telegram_id)
+    return result.matched_count == 1
+
+# ==================== ORDER EVENTS ====================
+
+ACTIVE_ORDER_STATUSES = [OrderStatus.NEW, OrderStatus.BROADCAST, OrderStatus.ASSIGNED]
+
+async def find_active_order(telegram_id: str) -> Optional[dict]:
+    return await db.orders.find_one({
+        "client_telegram_id": telegram_id,
+        "status": {"$in": ACTIVE_ORDER_STATUSES}
+    }, {"_id": 0})
+
+class OrderEventHub:
+    """In-process pub/sub of active-order changes keyed by client telegram_id.
+
+    Every stream, including one resuming with a Last-Event-ID, starts with
+    a snapshot read from Mongo: the order may have been changed by another
+    worker while the client was away, which this process never saw.
+
+    Changes made by this process are published directly. Changes made by
+    other workers or replicas are picked up by a resync task: every
+    `resync_seconds` one query lists the subscribed clients whose orders
+    were updated recently, and their current state is published. Streams
+    drop events that repeat the state they last sent.
+    """
+
+    def __init__(self, resync_seconds: float):
+        self.boot_id = uuid.uuid4().hex[:8]
+        self.resync_seconds = resync_seconds
+        self._seq = itertools.count(1)
+        self._subscribers: dict = {}
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.resynced = 0
+
+    def subscribe(self, telegram_id: str) -> asyncio.Queue:
+        subscriber_queue = asyncio.Queue(maxsize=8)
+        self._subscribers.setdefault(telegram_id, set()).add(subscriber_queue)
+        return subscriber_queue
+
+    def unsubscribe(self, telegram_id: str, subscriber_queue: asyncio.Queue):
+        queues = self._subscribers.get(telegram_id)
+        if queues is not None:
+            queues.discard(subscriber_queue)
+            if not queues:
+                del self._subscribers[telegram_id]
+
+    def next_event_id(self) -> str:
+        return f"{self.boot_id}-{next(self._seq)}"
+
+    def publish(self, telegram_id: str, order: Optional[dict]):
+        event = (self.next_event_id(), order)
+        for subscriber_queue in self._subscribers.get(telegram_id, ()):
+            if subscriber_queue.full():
+                # Only the latest state matters
+                subscriber_queue.get_nowait()
+            subscriber_queue.put_nowait(event)
+        self.published += 1
+
+    def has_subscribers(self, telegram_id: str) -> bool:
+        return telegram_id in self._subscribers
+
+    async def resync(self):
+        """Publish recent order changes of subscribed clients, whichever worker made them"""
+        if not self._subscribers:
+            return
+        # Writes are stamped before they commit, so look back a little further
+        since = (datetime.now(timezone.utc) - timedelta(
+            seconds=self.resync_seconds + DELTA_SYNC_OVERLAP_SECONDS)).isoformat()
+        changed = await db.orders.distinct("client_telegram_id", {
+            "updated_at": {"$gt": since},
+            "client_telegram_id": {"$in": list(self._subscribers)}
+        })
+        for telegram_id in changed:
+            if telegram_id in self._subscribers:
+                self.publish(telegram_id, await find_active_order(telegram_id))
+                self.resynced += 1
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.resync_seconds)
+            try:
+                await self.resync()
+            except Exception as e:
+                logger.error(f"Order stream resync failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_stats(self) -> dict:
+        return {
+            "clients": len(self._subscribers),
+            "streams": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "resynced": self.resynced
+        }
+
+order_events = OrderEventHub(SSE_RESYNC_SECONDS)
+
+async def publish_order_change(client_telegram_id: str):
+    """Push the client's current active order to open streams"""
+    if not order_events.has_subscribers(client_telegram_id):
+        return
+    order_events.publish(client_telegram_id, await find_active_order(client_telegram_id))
+
+def order_state(order: Optional[dict]) -> Optional[tuple]:
+    """What a client can see change: which order, its status and last update"""
+    return (order["id"], order.get("status"), order.get("updated_at")) if order else None
+
+def format_sse(event_id: str, event: str, data) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# ==================== ORDER ASSIGNMENT ====================
+
+async def release_driver_claim(driver: dict, order_id: str):
+    """Free a driver only if they are still holding the given order"""
+    await db.drivers.update_one(
+        {"id": driver["id"], "current_order_id": order_id},
+        {"$set": {"is_busy": False, "current_order_id": None}}
+    )
+    invalidate_driver(driver["telegram_id"])
+
+async def claim_order(order_id: str, driver: dict, assignment: dict) -> Tuple[Optional[dict], Optional[ClaimFailure]]:
+    """Atomically assign an order to a driver.
+
+    The driver is claimed first with a conditional update (active, not busy),
+    then the order (still NEW/BROADCAST without a driver). If the order claim
+    fails, the driver claim is rolled back. A driver can never win two orders
+    and an order can never get two drivers.
+    """
+    driver_claim = await db.drivers.update_one(
+        {"id": driver["id"], "status": DriverStatus.ACTIVE, "is_busy": {"$ne": True}},
+        {"$set": {"is_busy": True, "current_order_id": order_id}}
+    )
+    invalidate_driver(driver["telegram_id"])
+    if not driver_claim.modified_count:
+        return None, ClaimFailure.DRIVER_UNAVAILABLE
+    
+    try:
+        order = await db.orders.find_one_and_update(
+            {
+                "id": order_id,
+                "status": {"$in": [OrderStatus.NEW, OrderStatus.BROADCAST]},
+                "driver_id": None
+            },
+            {"$set": {
+                "status": OrderStatus.ASSIGNED,
+                "driver_id": driver["id"],
+                "driver_telegram_id": driver["telegram_id"],
+                **assignment
+            }},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+    except Exception:
+        await release_driver_claim(driver, order_id)
+        raise
+    
+    if not order:
+        await release_driver_claim(driver, order_id)
+        return None, ClaimFailure.ORDER_TAKEN
+    
+    order_expiry.discard(order_id)
+    return order, None
+
+class StageTimings:
+    """Latency of named stages, measured from the start of a flow"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: dict = {}
+        self._counts: dict = {}
+
+    def observe(self, stage: str, started: float):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if stage not in self._samples:
+            self._samples[stage] = deque(maxlen=self.window)
+            self._counts[stage] = 0
+        self._samples[stage].append(elapsed_ms)
+        self._counts[stage] += 1
+
+    def get_stats(self) -> dict:
+        stats = {}
+        for stage, samples in self._samples.items():
+            ordered = sorted(samples)
+            stats[stage] = {
+                "count": self._counts[stage],
+                "p50_ms": round(ordered[len(ordered) // 2], 2),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+                "max_ms": round(ordered[-1], 2)
+            }
+        return stats
+
+accept_timings = StageTimings()
+
+async def run_side_effects(label: str, *aws):
+    """Run independent side effects concurrently; a failure does not stop the others"""
+    for outcome in await asyncio.gather(*aws, return_exceptions=True):
+        if isinstance(outcome, Exception):
+            logger.error(f"{label}: side effect failed: {outcome!r}")
 
 # ==================== CLIENT API (Mini App) ====================
 
@@ -322,10 +2266,9 @@ async def notify_client(client_telegram_id: str, message: str):
 async def client_auth(data: TelegramInitData):
     """Authenticate client from Mini App"""
     parsed = parse_telegram_init_data(data.init_data)
-    logger.info(f"Client auth parsed data: {parsed}")
+    logger.debug("Client auth init data", extra={"event": "client_auth", "payload": parsed})
     
     # Extract user data from init_data
-    import json
     try:
         user_data = json.loads(parsed.get("user", "{}"))
     except:
@@ -340,11 +2283,11 @@ async def client_auth(data: TelegramInitData):
         raise HTTPException(status_code=400, detail="Invalid init data")
     
     # Check if user is a registered driver - sync their data
-    driver = await db.drivers.find_one({"telegram_id": telegram_id}, {"_id": 0})
+    driver = await get_driver_by_telegram_id(telegram_id)
     
     if driver and driver.get("is_registered"):
         # Driver is registered - create/update client with driver's phone
-        existing_client = await db.clients.find_one({"telegram_id": telegram_id}, {"_id": 0})
+        existing_client = await get_client_by_telegram_id(telegram_id)
         
         if existing_client:
             # Update client with driver's phone if not set
@@ -353,38 +2296,35 @@ async def client_auth(data: TelegramInitData):
                     {"telegram_id": telegram_id},
                     {"$set": {"phone": driver.get("phone")}}
                 )
+                invalidate_client(telegram_id)
                 existing_client["phone"] = driver.get("phone")
             logger.info(f"Driver-client found: {telegram_id}")
             return existing_client
         else:
             # Create new client with driver's data
-            new_client = ClientModel(
-                telegram_id=telegram_id,
-                username=driver.get("username") or user_data.get("username"),
-                first_name=driver.get("first_name") or user_data.get("first_name"),
-                last_name=driver.get("last_name") or user_data.get("last_name"),
-                phone=driver.get("phone")  # Use driver's phone
-            )
-            await db.clients.insert_one(new_client.model_dump())
+            new_client = await upsert_client(telegram_id, {
+                "username": driver.get("username") or user_data.get("username"),
+                "first_name": driver.get("first_name") or user_data.get("first_name"),
+                "last_name": driver.get("last_name") or user_data.get("last_name"),
+                "phone": driver.get("phone")  # Use driver's phone
+            })
             logger.info(f"New client created from driver: {telegram_id}")
-            return new_client.model_dump()
+            return new_client
     
     # Regular client flow
-    existing = await db.clients.find_one({"telegram_id": telegram_id}, {"_id": 0})
+    existing = await get_client_by_telegram_id(telegram_id)
     
     if existing:
         logger.info(f"Client found: {telegram_id}")
         return existing
     
-    new_client = ClientModel(
-        telegram_id=telegram_id,
-        username=user_data.get("username"),
-        first_name=user_data.get("first_name"),
-        last_name=user_data.get("last_name")
-    )
-    await db.clients.insert_one(new_client.model_dump())
+    new_client = await upsert_client(telegram_id, {
+        "username": user_data.get("username"),
+        "first_name": user_data.get("first_name"),
+        "last_name": user_data.get("last_name")
+    })
     logger.info(f"New client created: {telegram_id}")
-    return new_client.model_dump()
+    return new_client
 
 @api_router.post("/client/update-phone")
 async def update_client_phone(data: UpdateClientPhoneRequest):
@@ -397,56 +2337,38 @@ async def update_client_phone(data: UpdateClientPhoneRequest):
     if not phone.startswith("+"):
         phone = "+" + phone
     
-    # Find or create client
-    client_doc = await db.clients.find_one({"telegram_id": telegram_id}, {"_id": 0})
-    
-    if client_doc:
-        # Update existing client
-        await db.clients.update_one(
-            {"telegram_id": telegram_id},
-            {"$set": {"phone": phone}}
-        )
-        client_doc["phone"] = phone
-        logger.info(f"Client phone updated: {telegram_id} -> {phone}")
-        return client_doc
-    else:
-        # Create new client with phone
-        new_client = ClientModel(
-            telegram_id=telegram_id,
-            phone=phone
-        )
-        await db.clients.insert_one(new_client.model_dump())
-        logger.info(f"New client created with phone: {telegram_id} -> {phone}")
-        return new_client.model_dump()
+    # Update the client, creating it if needed
+    client_doc = await upsert_client(telegram_id, {}, {"phone": phone})
+    logger.info(f"Client phone set: {telegram_id} -> {phone}")
+    return client_doc
 
 @api_router.get("/client/check-phone")
 async def check_client_phone(telegram_id: str = Query(...)):
     """Check if client has phone number"""
     # First check if user is a registered driver
-    driver = await db.drivers.find_one({"telegram_id": telegram_id}, {"_id": 0})
+    driver = await get_driver_by_telegram_id(telegram_id)
     
     if driver and driver.get("is_registered") and driver.get("phone"):
         # Driver has phone - create/update client
-        client_doc = await db.clients.find_one({"telegram_id": telegram_id}, {"_id": 0})
+        client_doc = await get_client_by_telegram_id(telegram_id)
         if not client_doc:
-            new_client = ClientModel(
-                telegram_id=telegram_id,
-                phone=driver.get("phone"),
-                first_name=driver.get("first_name"),
-                last_name=driver.get("last_name"),
-                username=driver.get("username")
-            )
-            await db.clients.insert_one(new_client.model_dump())
+            await upsert_client(telegram_id, {
+                "phone": driver.get("phone"),
+                "first_name": driver.get("first_name"),
+                "last_name": driver.get("last_name"),
+                "username": driver.get("username")
+            })
         elif not client_doc.get("phone"):
             await db.clients.update_one(
                 {"telegram_id": telegram_id},
                 {"$set": {"phone": driver.get("phone")}}
             )
+            invalidate_client(telegram_id)
         
         return {"has_phone": True, "phone": driver.get("phone")}
     
-    # Check client's phone
-    client_doc = await db.clients.find_one({"telegram_id": telegram_id}, {"_id": 0})
+    # Check client's phone; a cached copy may predate the phone being set elsewhere
+    client_doc = await get_client_by_telegram_id(telegram_id, fresh=True)
     
     if client_doc and client_doc.get("phone"):
         return {"has_phone": True, "phone": client_doc.get("phone")}
@@ -458,8 +2380,8 @@ async def create_order(order_data: CreateOrderRequest, telegram_id: str = Query(
     """Create new order"""
     logger.info(f"Create order request from telegram_id: {telegram_id}")
     
-    # Get client - must exist with phone
-    client_doc = await db.clients.find_one({"telegram_id": telegram_id}, {"_id": 0})
+    # Get client - must exist with phone (read past the cache: it may have just been created elsewhere)
+    client_doc = await get_client_by_telegram_id(telegram_id, fresh=True)
     if not client_doc:
         raise HTTPException(status_code=404, detail="Клиент не найден. Пожалуйста, предоставьте номер телефона.")
     
@@ -467,10 +2389,7 @@ async def create_order(order_data: CreateOrderRequest, telegram_id: str = Query(
         raise HTTPException(status_code=400, detail="Для заказа необходимо предоставить номер телефона")
     
     # Check if client has active order
-    active_order = await db.orders.find_one({
-        "client_telegram_id": telegram_id,
-        "status": {"$in": [OrderStatus.NEW, OrderStatus.BROADCAST, OrderStatus.ASSIGNED]}
-    }, {"_id": 0})
+    active_order = await find_active_order(telegram_id)
     
     if active_order:
         raise HTTPException(status_code=400, detail="У вас уже есть активный заказ")
@@ -487,10 +2406,12 @@ async def create_order(order_data: CreateOrderRequest, telegram_id: str = Query(
     )
     
     await db.orders.insert_one(order.model_dump())
+    order_expiry.schedule(order.id, order.created_at)
     await log_action(ActionType.ORDER_CREATED, order_id=order.id, client_id=client_doc["id"])
+    await publish_order_change(telegram_id)
     
     # Broadcast to drivers
-    asyncio.create_task(broadcast_order_to_drivers(order))
+    run_in_background(broadcast_order_to_drivers(order))
     
     logger.info(f"Order created: {order.id}")
     return order.model_dump()
@@ -498,12 +2419,39 @@ async def create_order(order_data: CreateOrderRequest, telegram_id: str = Query(
 @api_router.get("/client/order/active")
 async def get_active_order(telegram_id: str = Query(...)):
     """Get client's active order"""
-    order = await db.orders.find_one({
-        "client_telegram_id": telegram_id,
-        "status": {"$in": [OrderStatus.NEW, OrderStatus.BROADCAST, OrderStatus.ASSIGNED]}
-    }, {"_id": 0})
+    return await find_active_order(telegram_id)
+
+@api_router.get("/client/order/active/stream")
+async def stream_active_order(telegram_id: str = Query(...)):
+    """Stream client's active order as Server-Sent Events"""
+    subscriber_queue = order_events.subscribe(telegram_id)
     
-    return order
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            # Always start with a snapshot, also when resuming: changes made by
+            # other workers while the client was away never reached this process
+            order = await find_active_order(telegram_id)
+            sent = order_state(order)
+            yield format_sse(order_events.next_event_id(), "order", order)
+            
+            while True:
+                try:
+                    event_id, order = await asyncio.wait_for(subscriber_queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if order_state(order) == sent:
+                    continue  # a resync repeating what this stream already sent
+                sent = order_state(order)
+                yield format_sse(event_id, "order", order)
+        finally:
+            order_events.unsubscribe(telegram_id, subscriber_queue)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
 
 @api_router.post("/client/order/{order_id}/cancel")
 async def cancel_order(order_id: str, telegram_id: str = Query(...)):
@@ -519,46 +2467,372 @@ async def cancel_order(order_id: str, telegram_id: str = Query(...)):
     if order["status"] not in [OrderStatus.NEW, OrderStatus.BROADCAST]:
         raise HTTPException(status_code=400, detail="Невозможно отменить заказ в текущем статусе")
     
+    now = datetime.now(timezone.utc).isoformat()
     await db.orders.update_one(
         {"id": order_id},
         {"$set": {
             "status": OrderStatus.CANCELLED,
-            "cancelled_at": datetime.now(timezone.utc).isoformat()
+            "cancelled_at": now,
+            "updated_at": now
         }}
     )
+    order_expiry.discard(order_id)
     
     await log_action(ActionType.ORDER_CANCELLED, order_id=order_id, client_id=order["client_id"])
+    await publish_order_change(telegram_id)
+    
+    # Delete message from drivers chat if exists
+    if order.get("telegram_message_id") and settings_store.drivers_chat_id:
+        await delete_telegram_message(settings_store.drivers_chat_id, order["telegram_message_id"])
+    
+    return {"success": True, "message": "Заказ отменён"}
+
+@api_router.get("/client/orders/history", responses={200: {"model": List[Union[OrderHistoryItem, OrderFields]]}})
+async def get_order_history(telegram_id: str = Query(...), fields: Optional[str] = None):
+    """Get client's order history"""
+    orders = await db.orders.find(
+        {"client_telegram_id": telegram_id},
+        parse_fields("orders", fields, ORDER_HISTORY_PROJECTION)
+    ).sort("created_at", -1).to_list(50)
+    
+    return json_response(orders)
+
+# ==================== TELEGRAM UPDATE DEDUPLICATION ====================
+
+class UpdateDeduplicator:
+    """Remembers processed update_ids so retried deliveries become no-ops.
+
+    A bounded in-memory TTL/LRU window answers most retries; the optional
+    Mongo record (unique _id + TTL index) covers restarts and other workers.
+    """
+
+    def __init__(self, window: int, ttl_seconds: int, use_mongo: bool):
+        self.window = window
+        self.ttl_seconds = ttl_seconds
+        self.use_mongo = use_mongo
+        self._seen: OrderedDict = OrderedDict()
+        self.duplicates = 0
+        self.accepted = 0
+
+    def _remember(self, update_id: int, now: float):
+        self._seen[update_id] = now + self.ttl_seconds
+        self._seen.move_to_end(update_id)
+        while len(self._seen) > self.window:
+            self._seen.popitem(last=False)
+
+    async def is_duplicate(self, update_id: int) -> bool:
+        """Record update_id and report whether it was already seen"""
+        now = time.monotonic()
+        expires_at = self._seen.get(update_id)
+        if expires_at is not None and expires_at > now:
+            self.duplicates += 1
+            return True
+
+        if self.use_mongo:
+            try:
+                await db.telegram_updates.insert_one({
+                    "_id": update_id,
+                    "created_at": datetime.now(timezone.utc)
+                })
+            except DuplicateKeyError:
+                self._remember(update_id, now)
+                self.duplicates += 1
+                return True
+
+        self._remember(update_id, now)
+        self.accepted += 1
+        return False
+
+    async def forget(self, update_id: int):
+        """Allow a failed update to be processed again on Telegram's retry"""
+        self._seen.pop(update_id, None)
+        if self.use_mongo:
+            await db.telegram_updates.delete_one({"_id": update_id})
+
+    def get_stats(self) -> dict:
+        return {
+            "mongo": self.use_mongo,
+            "window_size": len(self._seen),
+            "accepted": self.accepted,
+            "duplicates": self.duplicates
+        }
+
+update_deduplicator = UpdateDeduplicator(TELEGRAM_DEDUP_WINDOW, TELEGRAM_DEDUP_TTL_SECONDS, TELEGRAM_DEDUP_MONGO)
+
+# ==================== TELEGRAM UPDATE DISPATCHER ====================
+
+def get_update_sender_id(data: dict) -> Optional[str]:
+    """Return the id of the user who produced an update"""
+    for key in ("message", "edited_message", "callback_query", "my_chat_member", "chat_member"):
+        sender = data.get(key, {}).get("from")
+        if sender and "id" in sender:
+            return str(sender["id"])
+    return None
+
+class TelegramUpdateDispatcher:
+    """Processes webhook updates on a pool of workers.
+
+    Updates are sharded by sender id, so updates from the same user (e.g. the
+    registration steps) are handled in order by the same worker while
+    different users are processed in parallel.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queues: list = []
+        self._tasks: list = []
+        self._handler = None
+        self.processed = 0
+        self.failed = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def start(self, handler):
+        if self._tasks:
+            return
+        self._handler = handler
+        per_worker = max(1, self.queue_size // self.workers)
+        self._queues = [asyncio.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(worker_queue)) for worker_queue in self._queues]
+
+    async def submit(self, data: dict):
+        """Queue an update; waits only if the worker's queue is full"""
+        shard_key = get_update_sender_id(data) or str(data.get("update_id", 0))
+        worker_queue = self._queues[hash(shard_key) % self.workers]
+        await worker_queue.put((time.monotonic(), data))
+
+    async def _worker(self, worker_queue: asyncio.Queue):
+        while True:
+            enqueued_at, data = await worker_queue.get()
+            lag_ms = (time.monotonic() - enqueued_at) * 1000
+            self.last_lag_ms = lag_ms
+            if lag_ms > self.max_lag_ms:
+                self.max_lag_ms = lag_ms
+            try:
+                await self._handler(data)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.exception(f"Error processing update {data.get('update_id')}: {e}")
+            finally:
+                worker_queue.task_done()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def stop(self, timeout: float = 10.0):
+        """Drain queued updates, then stop the workers"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(worker_queue.join() for worker_queue in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping update workers with {self.depth()} updates still queued")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def depth(self) -> int:
+        return sum(worker_queue.qsize() for worker_queue in self._queues)
+
+    def get_stats(self) -> dict:
+        return {
+            "mode": "async" if self.running else "inline",
+            "workers": len(self._tasks),
+            "queue_depth": self.depth(),
+            "processed": self.processed,
+            "failed": self.failed,
+            "last_lag_ms": round(self.last_lag_ms, 2),
+            "max_lag_ms": round(self.max_lag_ms, 2)
+        }
+
+update_dispatcher = TelegramUpdateDispatcher(TELEGRAM_WEBHOOK_WORKERS, TELEGRAM_WEBHOOK_QUEUE_SIZE)
+
+# ==================== TELEGRAM UPDATE RECORDER ====================
+
+RECORD_USER_KEYS = {"from", "chat", "user", "new_chat_members", "left_chat_member", "forward_from", "sender_chat"}
+RECORD_NAME_KEYS = {"first_name", "last_name", "username", "title"}
+
+def anonymize_update(value, salt: str, parent: str = ""):
+    """Replace user ids, names, phones and free text with stable hashes"""
+    def digest(raw) -> str:
+        return hashlib.sha256(f"{salt}:{raw}".encode()).hexdigest()
     
-    # Delete message from drivers chat if exists
-    if order.get("telegram_message_id") and TELEGRAM_DRIVERS_CHAT_ID:
-        await delete_telegram_message(TELEGRAM_DRIVERS_CHAT_ID, order["telegram_message_id"])
+    if isinstance(value, list):
+        return [anonymize_update(item, salt, parent) for item in value]
+    if not isinstance(value, dict):
+        return value
     
-    return {"success": True, "message": "Заказ отменён"}
+    result = {}
+    for key, item in value.items():
+        if key in ("id", "user_id") and isinstance(item, int) and (parent in RECORD_USER_KEYS or key == "user_id"):
+            # Числовой id сохраняет знак (группы отрицательные) и одинаков во всей записи
+            hashed = int(digest(abs(item))[:12], 16) or 1
+            result[key] = -hashed if item < 0 else hashed
+        elif key in RECORD_NAME_KEYS and isinstance(item, str):
+            result[key] = f"{key}_{digest(item)[:8]}"
+        elif key == "phone_number" and isinstance(item, str):
+            result[key] = "+7" + str(int(digest(item)[:10], 16))[:10]
+        elif key == "text" and isinstance(item, str) and not item.startswith("/"):
+            result[key] = f"text_{digest(item)[:8]}"
+        else:
+            result[key] = anonymize_update(item, salt, key)
+    return result
 
-@api_router.get("/client/orders/history")
-async def get_order_history(telegram_id: str = Query(...)):
-    """Get client's order history"""
-    orders = await db.orders.find(
-        {"client_telegram_id": telegram_id},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(50)
-    
-    return orders
+class WebhookRecorder:
+    """Appends incoming updates with PII hashed to a gzip JSONL file.
+
+    Lines are buffered in memory and written from a worker thread once a
+    second, so recording adds no file I/O to the webhook request. Without
+    a configured salt a random one is generated per process, so the hashes
+    cannot be reversed but do not match across restarts or workers.
+    """
+
+    def __init__(self, path: str, salt: str):
+        self.path = path
+        self.salt = salt or secrets.token_hex(16)
+        self.random_salt = not salt
+        self._buffer: list = []
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.recorded = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def record(self, data: dict):
+        if self._task is None:
+            return
+        self._buffer.append(json.dumps({
+            "t": round(time.time(), 3),
+            "update": anonymize_update(data, self.salt)
+        }, ensure_ascii=False))
+
+    def _write(self, lines: list):
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    async def _flush(self):
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, lines)
+            self.recorded += len(lines)
+        except Exception as e:
+            self.failed += len(lines)
+            logger.error(f"Failed to record {len(lines)} updates to {self.path}: {e}")
+
+    async def _run(self):
+        while not self._stopping:
+            await asyncio.sleep(1)
+            await self._flush()
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Recording Telegram updates to {self.path}")
+            if self.random_salt:
+                logger.warning(
+                    "TELEGRAM_RECORD_SALT is not set: hashing with a random salt, "
+                    "ids in the recording will not be stable across restarts or workers"
+                )
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        await self._task
+        self._task = None
+        await self._flush()
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self._task is not None,
+            "random_salt": self.random_salt,
+            "buffered": len(self._buffer),
+            "recorded": self.recorded,
+            "failed": self.failed
+        }
+
+webhook_recorder = WebhookRecorder(TELEGRAM_RECORD_PATH, TELEGRAM_RECORD_SALT)
 
 # ==================== TELEGRAM BOT WEBHOOK ====================
 
 @api_router.post("/telegram/webhook")
 async def telegram_webhook(request: Request):
     """Handle Telegram bot updates"""
+    if TELEGRAM_WEBHOOK_SECRET:
+        secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(secret, TELEGRAM_WEBHOOK_SECRET):
+            raise HTTPException(status_code=403, detail="Invalid secret token")
+    
     data = await request.json()
-    logger.info(f"Telegram webhook: {data}")
+    webhook_recorder.record(data)
+    
+    update_id = data.get("update_id")
+    if update_id is not None and await update_deduplicator.is_duplicate(update_id):
+        logger.info(f"Duplicate Telegram update ignored: {update_id}")
+        return {"ok": True}
+    
+    logger.info("Telegram update %s", update_id, extra={
+        "event": f"telegram_update:{get_update_type(data)}", "payload": data
+    })
+    
+    if update_dispatcher.running:
+        # Fast-ack: Telegram delivers the next update as soon as we answer
+        await update_dispatcher.submit(data)
+        return {"ok": True}
     
+    try:
+        return await process_telegram_update(data)
+    except Exception:
+        # Let Telegram's retry reprocess the update
+        if update_id is not None:
+            await update_deduplicator.forget(update_id)
+        raise
+
+def get_update_type(data: dict) -> str:
+    """Coarse update type used as a metrics label"""
+    if "callback_query" in data:
+        action = data["callback_query"].get("data", "").split(":")[0]
+        return f"callback_query:{action}" if action in ("accept_order", "complete_order") else "callback_query:other"
+    message = data.get("message")
+    if message is None:
+        return next((key for key in data if key != "update_id"), "empty")
+    if "new_chat_members" in message:
+        return "message:new_chat_members"
+    if "contact" in message:
+        return "message:contact"
+    if message.get("text", "").startswith("/"):
+        return "message:command"
+    return "message:text" if "text" in message else "message:other"
+
+async def process_telegram_update(data: dict):
+    """Process a single Telegram update and record its latency"""
+    update_type = get_update_type(data)
+    started = time.perf_counter()
+    try:
+        return await handle_telegram_update(data)
+    except Exception:
+        telegram_update_errors_total.inc(update_type)
+        raise
+    finally:
+        telegram_update_seconds.observe(time.perf_counter() - started, update_type)
+
+async def handle_telegram_update(data: dict):
+    """Handle a single Telegram update"""
     # Handle new member in drivers chat
     if "message" in data and "new_chat_members" in data["message"]:
         chat_id = data["message"]["chat"]["id"]
         
         # Check if this is the drivers chat
-        if str(chat_id) == TELEGRAM_DRIVERS_CHAT_ID:
+        if str(chat_id) == settings_store.drivers_chat_id:
             for new_member in data["message"]["new_chat_members"]:
                 if new_member.get("is_bot"):
                     continue  # Skip bots
@@ -566,7 +2840,7 @@ async def telegram_webhook(request: Request):
                 telegram_id = str(new_member["id"])
                 
                 # Check if driver already exists
-                existing_driver = await db.drivers.find_one({"telegram_id": telegram_id}, {"_id": 0})
+                existing_driver = await get_driver_by_telegram_id(telegram_id)
                 
                 if not existing_driver:
                     # Create new driver
@@ -579,6 +2853,7 @@ async def telegram_webhook(request: Request):
                         registration_step="car_brand"
                     )
                     await db.drivers.insert_one(driver.model_dump())
+                    invalidate_driver(telegram_id)
                     
                     # Send welcome message to driver in private
                     first_name = new_member.get("first_name", "")
@@ -593,9 +2868,10 @@ async def telegram_webhook(request: Request):
                     # Driver exists but not registered - remind them
                     if not existing_driver.get("registration_step"):
                         await db.drivers.update_one(
-                            {"telegram_id": telegram_id},
+                            {"telegram_id": telegram_id, "registration_step": None},
                             {"$set": {"registration_step": "car_brand"}}
                         )
+                        invalidate_driver(telegram_id)
                     
                     await send_telegram_message(
                         telegram_id,
@@ -632,45 +2908,36 @@ async def telegram_webhook(request: Request):
         user = data["message"]["from"]
         telegram_id = str(user["id"])
         
-        # Check if driver is in registration process
+        # Check if driver is in registration process. The step is read past
+        # the per-process cache: another worker may already have advanced it
         driver = await db.drivers.find_one({"telegram_id": telegram_id}, {"_id": 0})
         
         if driver and driver.get("registration_step"):
             step = driver["registration_step"]
             
             if step == "car_brand":
-                await db.drivers.update_one(
-                    {"telegram_id": telegram_id},
-                    {"$set": {"car_brand": text, "registration_step": "car_model"}}
-                )
-                await send_telegram_message(telegram_id, "🚗 Введите модель автомобиля:")
+                if await advance_registration(telegram_id, step, {"car_brand": text, "registration_step": "car_model"}):
+                    await send_telegram_message(telegram_id, "🚗 Введите модель автомобиля:")
                 return {"ok": True}
             
             elif step == "car_model":
-                await db.drivers.update_one(
-                    {"telegram_id": telegram_id},
-                    {"$set": {"car_model": text, "registration_step": "car_color"}}
-                )
-                await send_telegram_message(telegram_id, "🎨 Введите цвет автомобиля:")
+                if await advance_registration(telegram_id, step, {"car_model": text, "registration_step": "car_color"}):
+                    await send_telegram_message(telegram_id, "🎨 Введите цвет автомобиля:")
                 return {"ok": True}
             
             elif step == "car_color":
-                await db.drivers.update_one(
-                    {"telegram_id": telegram_id},
-                    {"$set": {"car_color": text, "registration_step": "car_plate"}}
-                )
-                await send_telegram_message(telegram_id, "🔢 Введите гос. номер автомобиля:")
+                if await advance_registration(telegram_id, step, {"car_color": text, "registration_step": "car_plate"}):
+                    await send_telegram_message(telegram_id, "🔢 Введите гос. номер автомобиля:")
                 return {"ok": True}
             
             elif step == "car_plate":
-                await db.drivers.update_one(
-                    {"telegram_id": telegram_id},
-                    {"$set": {
-                        "car_plate": text.upper(),
-                        "registration_step": None,
-                        "is_registered": True
-                    }}
-                )
+                completed = await advance_registration(telegram_id, step, {
+                    "car_plate": text.upper(),
+                    "registration_step": None,
+                    "is_registered": True
+                })
+                if not completed:
+                    return {"ok": True}
                 
                 # Get updated driver info
                 updated_driver = await db.drivers.find_one({"telegram_id": telegram_id}, {"_id": 0})
@@ -697,10 +2964,12 @@ async def telegram_webhook(request: Request):
         telegram_id = str(user["id"])
         
         if callback_data.startswith("accept_order:"):
+            started = time.perf_counter()
             order_id = callback_data.split(":")[1]
             
-            # Check if driver exists
-            driver = await db.drivers.find_one({"telegram_id": telegram_id}, {"_id": 0})
+            # Check if driver exists. Read past the cache: the busy/blocked/registered
+            # checks below must not reject on a copy that predates a change made elsewhere
+            driver = await get_driver_by_telegram_id(telegram_id, fresh=True)
             
             if not driver:
                 # Create new driver and start registration
@@ -713,6 +2982,7 @@ async def telegram_webhook(request: Request):
                     registration_step="car_brand"
                 )
                 await db.drivers.insert_one(driver.model_dump())
+                invalidate_driver(telegram_id)
                 
                 await answer_callback_query(callback_id, "Сначала нужно зарегистрироваться!", True)
                 await send_telegram_message(
@@ -727,9 +2997,10 @@ async def telegram_webhook(request: Request):
                 # Driver exists but not fully registered
                 if not driver.get("registration_step"):
                     await db.drivers.update_one(
-                        {"telegram_id": telegram_id},
+                        {"telegram_id": telegram_id, "registration_step": None},
                         {"$set": {"registration_step": "car_brand"}}
                     )
+                    invalidate_driver(telegram_id)
                     await send_telegram_message(
                         telegram_id,
                         "🚗 Продолжите регистрацию. Введите марку автомобиля:"
@@ -746,46 +3017,32 @@ async def telegram_webhook(request: Request):
                 await answer_callback_query(callback_id, "У вас уже есть активный заказ", True)
                 return {"ok": True}
             
-            # Try to assign order (with lock)
+            # Try to assign order (atomic claim of driver and order)
             driver_name = f"{driver.get('first_name', '')} {driver.get('last_name', '')}".strip() or driver.get("username", "Водитель")
             car_info = f"{driver.get('car_brand', '')} {driver.get('car_model', '')} {driver.get('car_color', '')} ({driver.get('car_plate', '')})".strip()
             
-            result = await db.orders.find_one_and_update(
-                {
-                    "id": order_id,
-                    "status": {"$in": [OrderStatus.NEW, OrderStatus.BROADCAST]},
-                    "driver_id": None
-                },
-                {"$set": {
-                    "status": OrderStatus.ASSIGNED,
-                    "driver_id": driver["id"],
-                    "driver_telegram_id": telegram_id,
-                    "driver_name": driver_name,
-                    "driver_phone": driver.get("phone"),
-                    "driver_car": car_info,
-                    "assigned_at": datetime.now(timezone.utc).isoformat()
-                }},
-                return_document=True
-            )
+            now = datetime.now(timezone.utc).isoformat()
+            order, failure = await claim_order(order_id, driver, {
+                "driver_name": driver_name,
+                "driver_phone": driver.get("phone"),
+                "driver_car": car_info,
+                "assigned_at": now,
+                "updated_at": now
+            })
             
-            if not result:
-                await answer_callback_query(callback_id, "Заказ уже принят другим водителем", True)
+            if failure == ClaimFailure.DRIVER_UNAVAILABLE:
+                await answer_callback_query(callback_id, "У вас уже есть активный заказ", True)
                 return {"ok": True}
             
-            # Mark driver as busy
-            await db.drivers.update_one(
-                {"id": driver["id"]},
-                {"$set": {"is_busy": True, "current_order_id": order_id}}
-            )
-            
-            await log_action(ActionType.ORDER_ASSIGNED, order_id=order_id, driver_id=driver["id"])
+            if failure == ClaimFailure.ORDER_TAKEN:
+                await answer_callback_query(callback_id, "Заказ уже принят другим водителем", True)
+                return {"ok": True}
             
-            # Delete message from drivers chat
-            order = result
-            if order.get("telegram_message_id"):
-                await delete_telegram_message(TELEGRAM_DRIVERS_CHAT_ID, order["telegram_message_id"])
+            accept_timings.observe("claim", started)
             
-            car_info = f"{driver.get('car_brand', '')} {driver.get('car_model', '')} {driver.get('car_color', '')} ({driver.get('car_plate', '')})".strip()
+            # Сразу отвечаем на нажатие, остальное - параллельно
+            await answer_callback_query(callback_id, "✅ Вы приняли заказ!")
+            accept_timings.observe("answer", started)
             
             # Notify client with car info
             client_message = f"""🚖 <b>Водитель назначен!</b>
@@ -795,9 +3052,9 @@ async def telegram_webhook(request: Request):
             if driver.get("phone"):
                 client_message += f"\n📞 <b>Телефон:</b> {driver['phone']}"
             
-            await notify_client(order["client_telegram_id"], client_message)
-            
-            await answer_callback_query(callback_id, "✅ Вы приняли заказ!")
+            async def notify_assigned_client():
+                await notify_client(order["client_telegram_id"], client_message, MessagePriority.ASSIGNMENT)
+                accept_timings.observe("client_notification", started)
             
             # Send order details to driver in private with client phone
             client_phone = order.get("client_phone", "")
@@ -813,11 +3070,22 @@ async def telegram_webhook(request: Request):
             driver_message += f"\n\n📞 <b>Телефон клиента:</b> {client_phone if client_phone else 'не указан'}"
             driver_message += f"\n🆔 Заказ: <code>{order_id[:8]}</code>"
             
-            await send_telegram_message(telegram_id, driver_message, {
-                "inline_keyboard": [[
-                    {"text": "✅ Завершить заказ", "callback_data": f"complete_order:{order_id}"}
-                ]]
-            })
+            side_effects = [
+                log_action(ActionType.ORDER_ASSIGNED, order_id=order_id, driver_id=driver["id"]),
+                publish_order_change(order["client_telegram_id"]),
+                notify_assigned_client(),
+                send_telegram_message(telegram_id, driver_message, {
+                    "inline_keyboard": [[
+                        {"text": "✅ Завершить заказ", "callback_data": f"complete_order:{order_id}"}
+                    ]]
+                })
+            ]
+            # Delete message from drivers chat
+            if order.get("telegram_message_id"):
+                side_effects.append(delete_telegram_message(settings_store.drivers_chat_id, order["telegram_message_id"], MessagePriority.INTERACTIVE))
+            
+            await run_side_effects(f"Accept of order {order_id}", *side_effects)
+            accept_timings.observe("total", started)
         
         elif callback_data.startswith("complete_order:"):
             order_id = callback_data.split(":")[1]
@@ -833,21 +3101,21 @@ async def telegram_webhook(request: Request):
                 return {"ok": True}
             
             # Complete order
+            now = datetime.now(timezone.utc).isoformat()
             await db.orders.update_one(
                 {"id": order_id},
                 {"$set": {
                     "status": OrderStatus.COMPLETED,
-                    "completed_at": datetime.now(timezone.utc).isoformat()
+                    "completed_at": now,
+                    "updated_at": now
                 }}
             )
             
             # Free up driver
-            await db.drivers.update_one(
-                {"telegram_id": telegram_id},
-                {"$set": {"is_busy": False, "current_order_id": None}}
-            )
+            await release_driver_claim({"id": order["driver_id"], "telegram_id": telegram_id}, order_id)
             
             await log_action(ActionType.ORDER_COMPLETED, order_id=order_id, driver_id=order.get("driver_id"))
+            await publish_order_change(order["client_telegram_id"])
             
             # Notify client
             await notify_client(order["client_telegram_id"], "✅ <b>Поездка завершена!</b>\n\nСпасибо за использование нашего сервиса!")
@@ -885,23 +3153,32 @@ async def admin_auth(data: AdminLoginRequest):
     await db.admins.insert_one(new_admin.model_dump())
     return {"admin": new_admin.model_dump(), "token": f"admin_{telegram_id}"}
 
-@api_router.get("/admin/orders")
-async def get_all_orders(status: Optional[OrderStatus] = None, limit: int = 100):
-    """Get all orders with optional status filter"""
+@api_router.get("/admin/orders", responses={200: {"model": Page[Union[OrderSummary, OrderFields]]}})
+async def get_all_orders(status: Optional[OrderStatus] = None, limit: int = 100,
+                         cursor: Optional[str] = None, since: Optional[str] = None,
+                         fields: Optional[str] = None):
+    """Get a page of orders with optional status filter, or orders changed since a high-water mark"""
+    projection = parse_fields("orders", fields, ORDER_SUMMARY_PROJECTION)
+    if since:
+        # Status is not filtered here: callers must also see orders leaving their filter
+        return json_response(await fetch_changes(db.orders, "updated_at", since, limit, projection, cursor))
+    
     query = {}
     if status:
         query["status"] = status
     
-    orders = await db.orders.find(query, {"_id": 0}).sort("created_at", -1).to_list(limit)
-    return orders
+    high_water_mark = delta_sync_horizon()
+    page = await paginate(db.orders, query, limit, cursor, projection)
+    page["high_water_mark"] = high_water_mark
+    return json_response(page)
 
-@api_router.get("/admin/orders/{order_id}")
-async def get_order_details(order_id: str):
+@api_router.get("/admin/orders/{order_id}", responses={200: {"model": Union[OrderModel, OrderFields]}})
+async def get_order_details(order_id: str, fields: Optional[str] = None):
     """Get order details"""
-    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+    order = await db.orders.find_one({"id": order_id}, parse_fields("orders", fields, FULL_PROJECTION))
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
-    return order
+    return json_response(order)
 
 @api_router.post("/admin/orders/{order_id}/assign")
 async def admin_assign_driver(order_id: str, data: AssignDriverRequest):
@@ -926,25 +3203,22 @@ async def admin_assign_driver(order_id: str, data: AssignDriverRequest):
     # Assign driver
     driver_name = f"{driver.get('first_name', '')} {driver.get('last_name', '')}".strip() or driver.get("username", "Водитель")
     
-    await db.orders.update_one(
-        {"id": order_id},
-        {"$set": {
-            "status": OrderStatus.ASSIGNED,
-            "driver_id": driver["id"],
-            "driver_telegram_id": driver["telegram_id"],
-            "driver_name": driver_name,
-            "driver_phone": driver.get("phone"),
-            "assigned_at": datetime.now(timezone.utc).isoformat()
-        }}
-    )
+    now = datetime.now(timezone.utc).isoformat()
+    _, failure = await claim_order(order_id, driver, {
+        "driver_name": driver_name,
+        "driver_phone": driver.get("phone"),
+        "assigned_at": now,
+        "updated_at": now
+    })
     
-    # Mark driver as busy
-    await db.drivers.update_one(
-        {"id": driver["id"]},
-        {"$set": {"is_busy": True, "current_order_id": order_id}}
-    )
+    if failure == ClaimFailure.DRIVER_UNAVAILABLE:
+        raise HTTPException(status_code=400, detail="Водитель занят другим заказом")
+    
+    if failure == ClaimFailure.ORDER_TAKEN:
+        raise HTTPException(status_code=400, detail="Невозможно назначить водителя на этот заказ")
     
     await log_action(ActionType.ORDER_ASSIGNED, order_id=order_id, driver_id=driver["id"], details="Назначено администратором")
+    await publish_order_change(order["client_telegram_id"])
     
     # Notify client
     client_message = f"""🚖 <b>Водитель назначен!</b>
@@ -953,7 +3227,7 @@ async def admin_assign_driver(order_id: str, data: AssignDriverRequest):
     if driver.get("phone"):
         client_message += f"\n📞 <b>Телефон:</b> {driver['phone']}"
     
-    await notify_client(order["client_telegram_id"], client_message)
+    await notify_client(order["client_telegram_id"], client_message, MessagePriority.BACKGROUND)
     
     # Notify driver
     driver_message = f"""🚖 <b>Вам назначен заказ!</b>
@@ -967,7 +3241,7 @@ async def admin_assign_driver(order_id: str, data: AssignDriverRequest):
         "inline_keyboard": [[
             {"text": "✅ Завершить заказ", "callback_data": f"complete_order:{order_id}"}
         ]]
-    })
+    }, MessagePriority.BACKGROUND)
     
     return {"success": True, "message": "Водитель назначен"}
 
@@ -983,27 +3257,28 @@ async def admin_cancel_order(order_id: str):
     
     # Free up driver if assigned
     if order.get("driver_id"):
-        await db.drivers.update_one(
-            {"id": order["driver_id"]},
-            {"$set": {"is_busy": False, "current_order_id": None}}
-        )
+        await release_driver_claim({"id": order["driver_id"], "telegram_id": order.get("driver_telegram_id")}, order_id)
     
+    now = datetime.now(timezone.utc).isoformat()
     await db.orders.update_one(
         {"id": order_id},
         {"$set": {
             "status": OrderStatus.CANCELLED,
-            "cancelled_at": datetime.now(timezone.utc).isoformat()
+            "cancelled_at": now,
+            "updated_at": now
         }}
     )
+    order_expiry.discard(order_id)
     
     await log_action(ActionType.ORDER_CANCELLED, order_id=order_id, details="Отменено администратором")
+    await publish_order_change(order["client_telegram_id"])
     
     # Notify client
-    await notify_client(order["client_telegram_id"], "❌ <b>Ваш заказ отменён администратором</b>")
+    await notify_client(order["client_telegram_id"], "❌ <b>Ваш заказ отменён администратором</b>", MessagePriority.BACKGROUND)
     
     # Delete message from drivers chat
-    if order.get("telegram_message_id") and TELEGRAM_DRIVERS_CHAT_ID:
-        await delete_telegram_message(TELEGRAM_DRIVERS_CHAT_ID, order["telegram_message_id"])
+    if order.get("telegram_message_id") and settings_store.drivers_chat_id:
+        await delete_telegram_message(settings_store.drivers_chat_id, order["telegram_message_id"], MessagePriority.BACKGROUND)
     
     return {"success": True, "message": "Заказ отменён"}
 
@@ -1019,41 +3294,47 @@ async def admin_complete_order(order_id: str):
     
     # Free up driver
     if order.get("driver_id"):
-        await db.drivers.update_one(
-            {"id": order["driver_id"]},
-            {"$set": {"is_busy": False, "current_order_id": None}}
-        )
+        await release_driver_claim({"id": order["driver_id"], "telegram_id": order.get("driver_telegram_id")}, order_id)
     
+    now = datetime.now(timezone.utc).isoformat()
     await db.orders.update_one(
         {"id": order_id},
         {"$set": {
             "status": OrderStatus.COMPLETED,
-            "completed_at": datetime.now(timezone.utc).isoformat()
+            "completed_at": now,
+            "updated_at": now
         }}
     )
     
     await log_action(ActionType.ORDER_COMPLETED, order_id=order_id, details="Завершено администратором")
+    await publish_order_change(order["client_telegram_id"])
     
     # Notify client
-    await notify_client(order["client_telegram_id"], "✅ <b>Поездка завершена!</b>\n\nСпасибо за использование нашего сервиса!")
+    await notify_client(order["client_telegram_id"], "✅ <b>Поездка завершена!</b>\n\nСпасибо за использование нашего сервиса!", MessagePriority.BACKGROUND)
     
     return {"success": True, "message": "Заказ завершён"}
 
 # ==================== DRIVERS API ====================
 
-@api_router.get("/admin/drivers")
-async def get_all_drivers():
-    """Get all drivers"""
-    drivers = await db.drivers.find({}, {"_id": 0}).to_list(500)
-    return drivers
+@api_router.get("/admin/drivers", responses={200: {"model": Page[Union[DriverSummary, DriverFields]]}})
+async def get_all_drivers(status: Optional[DriverStatus] = None, is_busy: Optional[bool] = None,
+                          limit: int = 100, cursor: Optional[str] = None, fields: Optional[str] = None):
+    """Get a page of drivers with optional status and busy filters"""
+    projection = parse_fields("drivers", fields, DRIVER_SUMMARY_PROJECTION)
+    query = {}
+    if status:
+        query["status"] = status
+    if is_busy is not None:
+        query["is_busy"] = is_busy
+    return json_response(await paginate(db.drivers, query, limit, cursor, projection))
 
-@api_router.get("/admin/drivers/{driver_id}")
-async def get_driver_details(driver_id: str):
+@api_router.get("/admin/drivers/{driver_id}", responses={200: {"model": Union[DriverModel, DriverFields]}})
+async def get_driver_details(driver_id: str, fields: Optional[str] = None):
     """Get driver details"""
-    driver = await db.drivers.find_one({"id": driver_id}, {"_id": 0})
+    driver = await db.drivers.find_one({"id": driver_id}, parse_fields("drivers", fields, FULL_PROJECTION))
     if not driver:
         raise HTTPException(status_code=404, detail="Водитель не найден")
-    return driver
+    return json_response(driver)
 
 @api_router.patch("/admin/drivers/{driver_id}")
 async def update_driver(driver_id: str, data: UpdateDriverRequest):
@@ -1089,6 +3370,7 @@ async def update_driver(driver_id: str, data: UpdateDriverRequest):
     # Check if all car fields are filled - mark as registered
     if update_dict:
         await db.drivers.update_one({"id": driver_id}, {"$set": update_dict})
+        invalidate_driver(driver["telegram_id"])
         
         # Check if driver is now fully registered
         updated_driver = await db.drivers.find_one({"id": driver_id}, {"_id": 0})
@@ -1098,6 +3380,7 @@ async def update_driver(driver_id: str, data: UpdateDriverRequest):
                 {"id": driver_id}, 
                 {"$set": {"is_registered": True, "registration_step": None}}
             )
+            invalidate_driver(driver["telegram_id"])
             if not driver.get("is_registered"):
                 await log_action(ActionType.DRIVER_REGISTERED, driver_id=driver_id, details="Зарегистрирован администратором")
     
@@ -1106,19 +3389,27 @@ async def update_driver(driver_id: str, data: UpdateDriverRequest):
 
 # ==================== CLIENTS API ====================
 
-@api_router.get("/admin/clients")
-async def get_all_clients():
-    """Get all clients"""
-    clients = await db.clients.find({}, {"_id": 0}).to_list(500)
-    return clients
+@api_router.get("/admin/clients", responses={200: {"model": Page[Union[ClientModel, ClientFields]]}})
+async def get_all_clients(limit: int = 100, cursor: Optional[str] = None, fields: Optional[str] = None):
+    """Get a page of clients"""
+    projection = parse_fields("clients", fields, CLIENT_SUMMARY_PROJECTION)
+    return json_response(await paginate(db.clients, {}, limit, cursor, projection))
 
 # ==================== LOGS API ====================
 
-@api_router.get("/admin/logs")
-async def get_action_logs(limit: int = 100):
-    """Get action logs"""
-    logs = await db.action_logs.find({}, {"_id": 0}).sort("created_at", -1).to_list(limit)
-    return logs
+@api_router.get("/admin/logs", responses={200: {"model": Page[Union[ActionLogModel, ActionLogFields]]}})
+async def get_action_logs(limit: int = 100, cursor: Optional[str] = None, since: Optional[str] = None,
+                          fields: Optional[str] = None):
+    """Get a page of action logs, or logs written since a high-water mark"""
+    projection = parse_fields("action_logs", fields, ACTION_LOG_PROJECTION)
+    if since:
+        # By write time: entries delayed by flush retries still arrive after their created_at
+        return json_response(await fetch_changes(db.action_logs, "written_at", since, limit, projection, cursor))
+    
+    high_water_mark = delta_sync_horizon()
+    page = await paginate(db.action_logs, {}, limit, cursor, projection)
+    page["high_water_mark"] = high_water_mark
+    return json_response(page)
 
 # ==================== SETTINGS API ====================
 
@@ -1126,68 +3417,340 @@ async def get_action_logs(limit: int = 100):
 async def get_settings():
     """Get current settings"""
     return {
-        "drivers_chat_id": TELEGRAM_DRIVERS_CHAT_ID,
+        "drivers_chat_id": settings_store.drivers_chat_id,
         "bot_configured": bool(TELEGRAM_BOT_TOKEN)
     }
 
 @api_router.post("/admin/settings/drivers-chat")
 async def set_drivers_chat(data: SetDriversChatRequest):
     """Set drivers chat ID"""
-    global TELEGRAM_DRIVERS_CHAT_ID
-    TELEGRAM_DRIVERS_CHAT_ID = data.chat_id
-    
-    # Also update .env file
-    env_path = ROOT_DIR / '.env'
-    with open(env_path, 'r') as f:
-        content = f.read()
-    
-    if 'TELEGRAM_DRIVERS_CHAT_ID=' in content:
-        lines = content.split('\n')
-        for i, line in enumerate(lines):
-            if line.startswith('TELEGRAM_DRIVERS_CHAT_ID='):
-                lines[i] = f'TELEGRAM_DRIVERS_CHAT_ID="{data.chat_id}"'
-        content = '\n'.join(lines)
-    else:
-        content += f'\nTELEGRAM_DRIVERS_CHAT_ID="{data.chat_id}"'
-    
-    with open(env_path, 'w') as f:
-        f.write(content)
-    
+    # Other workers pick the new value up on their next version check
+    await settings_store.update(drivers_chat_id=data.chat_id.strip())
+    logger.info(f"Drivers chat set to {settings_store.drivers_chat_id} (settings v{settings_store.version})")
     return {"success": True, "message": "Chat ID сохранён"}
 
 # ==================== STATS API ====================
 
-@api_router.get("/admin/stats")
-async def get_stats():
-    """Get dashboard statistics"""
-    total_orders = await db.orders.count_documents({})
-    active_orders = await db.orders.count_documents({"status": {"$in": [OrderStatus.NEW, OrderStatus.BROADCAST, OrderStatus.ASSIGNED]}})
-    completed_orders = await db.orders.count_documents({"status": OrderStatus.COMPLETED})
-    cancelled_orders = await db.orders.count_documents({"status": OrderStatus.CANCELLED})
-    
-    total_drivers = await db.drivers.count_documents({})
-    active_drivers = await db.drivers.count_documents({"status": DriverStatus.ACTIVE})
-    busy_drivers = await db.drivers.count_documents({"is_busy": True})
-    
-    total_clients = await db.clients.count_documents({})
+STATS_CACHE_TTL_SECONDS = float(os.environ.get('STATS_CACHE_TTL_SECONDS', '5'))
+
+class CachedSnapshot:
+    """Short-TTL cached value; concurrent callers share a single computation"""
+
+    def __init__(self, ttl_seconds: float, compute):
+        self.ttl_seconds = ttl_seconds
+        self._compute = compute
+        self._value = None
+        self._expires_at = 0.0
+        self._pending: Optional[asyncio.Future] = None
+        self.hits = 0
+        self.shared = 0
+        self.refreshes = 0
+
+    async def get(self):
+        if self._value is not None and time.monotonic() < self._expires_at:
+            self.hits += 1
+            return self._value
+        
+        if self._pending is None:
+            self.refreshes += 1
+            self._pending = asyncio.ensure_future(self._refresh())
+        else:
+            self.shared += 1
+        # Shield so a disconnecting caller does not cancel the shared computation
+        return await asyncio.shield(self._pending)
+
+    async def _refresh(self):
+        try:
+            value = await self._compute()
+            self._value = value
+            self._expires_at = time.monotonic() + self.ttl_seconds
+            return value
+        finally:
+            self._pending = None
+
+    def invalidate(self):
+        self._expires_at = 0.0
+
+    def get_stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "shared": self.shared,
+            "refreshes": self.refreshes,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+async def compute_stats() -> dict:
+    """Compute dashboard statistics from collection metadata and index-only counts.
+
+    Totals come from estimated_document_count (collection metadata, no scan);
+    every status counter is a count_documents on an indexed field, so Mongo
+    walks index keys instead of fetching documents.
+    """
+    active_statuses = [OrderStatus.NEW.value, OrderStatus.BROADCAST.value, OrderStatus.ASSIGNED.value]
     
+    (orders_total, orders_active, orders_completed, orders_cancelled,
+     drivers_total, drivers_active, drivers_busy, clients_total) = await asyncio.gather(
+        db.orders.estimated_document_count(),
+        db.orders.count_documents({"status": {"$in": active_statuses}}),
+        db.orders.count_documents({"status": OrderStatus.COMPLETED.value}),
+        db.orders.count_documents({"status": OrderStatus.CANCELLED.value}),
+        db.drivers.estimated_document_count(),
+        db.drivers.count_documents({"status": DriverStatus.ACTIVE.value}),
+        db.drivers.count_documents({"is_busy": True}),
+        db.clients.estimated_document_count()
+    )
     return {
         "orders": {
-            "total": total_orders,
-            "active": active_orders,
-            "completed": completed_orders,
-            "cancelled": cancelled_orders
+            "total": orders_total,
+            "active": orders_active,
+            "completed": orders_completed,
+            "cancelled": orders_cancelled
         },
         "drivers": {
-            "total": total_drivers,
-            "active": active_drivers,
-            "busy": busy_drivers
+            "total": drivers_total,
+            "active": drivers_active,
+            "busy": drivers_busy
         },
         "clients": {
-            "total": total_clients
+            "total": clients_total
+        }
+    }
+
+stats_snapshot = CachedSnapshot(STATS_CACHE_TTL_SECONDS, compute_stats)
+
+@api_router.get("/admin/stats")
+async def get_stats():
+    """Get dashboard statistics"""
+    return await stats_snapshot.get()
+
+# ==================== REQUEST PROFILER ====================
+
+PROFILED_PREFIXES = ("/api/telegram/webhook", "/api/client/", "/api/admin/")
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+def coroutine_stack(task: asyncio.Task) -> List[str]:
+    """Frames of a suspended task, following the chain of awaited coroutines.
+
+    Task.get_stack() only returns the outermost frame of a suspended
+    coroutine; the await chain shows where it is actually waiting.
+    """
+    labels = []
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            # Future, Task or gather - the end of this task's own stack
+            labels.append(f"<{type(awaitable).__name__}>")
+            break
+        labels.append(frame_label(frame))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    return labels
+
+class RequestProfiler:
+    """Samples the coroutine stack of a fraction of requests.
+
+    A sampler coroutine records where the request's task is suspended every
+    `interval_ms`, weighted by the wall time since the previous sample, so
+    slow awaits (Mongo, Bot API, queues) show up as wide frames. Only
+    requests slower than `threshold_ms` are kept, as folded stacks in a
+    bounded ring buffer. When disabled the cost is one attribute check.
+    In fast-ack webhook mode only the acknowledgement is profiled.
+    """
+
+    def __init__(self, enabled: bool, sample_rate: float, threshold_ms: float, interval_ms: float, max_profiles: int):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.threshold_ms = threshold_ms
+        self.interval_ms = interval_ms
+        self.profiles = deque(maxlen=max_profiles)
+        self._ids = itertools.count(1)
+        self.sampled = 0
+        self.kept = 0
+
+    def should_profile(self, path: str) -> bool:
+        if not self.enabled or not path.startswith(PROFILED_PREFIXES):
+            return False
+        if path.endswith("/stream") or path.startswith("/api/admin/system/profiler"):
+            return False
+        return random.random() < self.sample_rate
+
+    async def _sample(self, task: asyncio.Task, stacks: dict):
+        interval = self.interval_ms / 1000
+        last = time.perf_counter()
+        while not task.done():
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            key = ";".join(coroutine_stack(task)) or "<running>"
+            stacks[key] = stacks.get(key, 0.0) + (now - last) * 1000
+            last = now
+
+    def begin(self) -> tuple:
+        self.sampled += 1
+        stacks: dict = {}
+        sampler = asyncio.create_task(self._sample(asyncio.current_task(), stacks))
+        return time.perf_counter(), stacks, sampler
+
+    async def finish(self, session: tuple, label: str):
+        started, stacks, sampler = session
+        sampler.cancel()
+        try:
+            await sampler
+        except asyncio.CancelledError:
+            pass
+        
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms < self.threshold_ms:
+            return
+        self.kept += 1
+        self.profiles.append({
+            "id": next(self._ids),
+            "request": label,
+            "at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(duration_ms, 1),
+            "stacks": stacks
+        })
+
+    def configure(self, settings: "ProfilerSettingsRequest"):
+        self.enabled = settings.enabled
+        for field in ("sample_rate", "threshold_ms", "interval_ms"):
+            value = getattr(settings, field)
+            if value is not None:
+                setattr(self, field, value)
+
+    def folded(self, profile_id: Optional[int] = None) -> str:
+        """Profiles in collapsed-stack format for flamegraph.pl / speedscope"""
+        lines = []
+        for profile in self.profiles:
+            if profile_id is not None and profile["id"] != profile_id:
+                continue
+            root = f"{profile['request']} #{profile['id']}".replace(";", ",")
+            for stack, weight_ms in profile["stacks"].items():
+                lines.append(f"{root};{stack} {max(1, round(weight_ms))}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "threshold_ms": self.threshold_ms,
+            "interval_ms": self.interval_ms,
+            "sampled": self.sampled,
+            "kept": self.kept,
+            "profiles": [
+                {key: profile[key] for key in ("id", "request", "at", "duration_ms")}
+                for profile in self.profiles
+            ]
         }
+
+request_profiler = RequestProfiler(PROFILER_ENABLED, PROFILER_SAMPLE_RATE, PROFILER_THRESHOLD_MS,
+                                   PROFILER_INTERVAL_MS, PROFILER_MAX_PROFILES)
+
+class ProfilerMiddleware:
+    """ASGI middleware running the request profiler on sampled requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not request_profiler.should_profile(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        
+        session = request_profiler.begin()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = getattr(scope.get("route"), "path", scope["path"])
+            await request_profiler.finish(session, f"{scope['method']} {route}")
+
+# ==================== SYSTEM API ====================
+
+@api_router.get("/admin/system")
+async def get_system_stats():
+    """Get runtime performance counters"""
+    try:
+        lease_holders = await lease_manager.holders()
+    except Exception as e:
+        logger.error(f"Failed to read lease holders: {e}")
+        lease_holders = None
+    return {
+        "telegram": telegram_api.get_stats(),
+        "telegram_outbox": telegram_outbox.get_stats(),
+        "webhook": update_dispatcher.get_stats(),
+        "webhook_dedup": update_deduplicator.get_stats(),
+        "webhook_recorder": webhook_recorder.get_stats(),
+        "stats_cache": stats_snapshot.get_stats(),
+        "order_streams": order_events.get_stats(),
+        "driver_cache": driver_cache.get_stats(),
+        "client_cache": client_cache.get_stats(),
+        "action_log": action_log_writer.get_stats(),
+        "order_expiry": order_expiry.get_stats(),
+        "accept_path": accept_timings.get_stats(),
+        "settings": settings_store.get_stats(),
+        "leases": {**lease_manager.get_stats(), "holders": lease_holders},
+        "profiler": request_profiler.get_stats()
     }
 
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics in text exposition format"""
+    mongo_command_listener.drain()
+    order_expiry_pending.set(order_expiry.pending)
+    try:
+        stats = await stats_snapshot.get()
+        active_orders_gauge.set(stats["orders"]["active"])
+        busy_drivers_gauge.set(stats["drivers"]["busy"])
+    except Exception as e:
+        logger.error(f"Failed to refresh metric gauges: {e}")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@api_router.get("/admin/system/queries")
+async def get_system_queries(limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE)):
+    """Get MongoDB query shapes ranked by total time"""
+    return mongo_command_listener.get_summary(limit)
+
+@api_router.get("/admin/system/logging")
+async def get_logging():
+    """Get logger levels and payload sampling counters"""
+    return {"levels": get_log_levels(), "format": LOG_FORMAT, "sampling": event_sampler.get_stats()}
+
+@api_router.post("/admin/system/logging")
+async def set_log_level(data: LogLevelRequest):
+    """Change the level of one logger at runtime"""
+    level = data.level.upper()
+    if level not in LOG_LEVELS:
+        raise HTTPException(status_code=400, detail=f"Уровень должен быть одним из: {', '.join(LOG_LEVELS)}")
+    logging.getLogger(None if data.logger == "root" else data.logger).setLevel(level)
+    logger.warning(f"Log level of {data.logger} set to {level}")
+    return {"levels": get_log_levels(), "format": LOG_FORMAT, "sampling": event_sampler.get_stats()}
+
+@api_router.get("/admin/system/profiler")
+async def get_profiler():
+    """Get profiler settings and captured slow requests"""
+    return request_profiler.get_stats()
+
+@api_router.post("/admin/system/profiler")
+async def configure_profiler(data: ProfilerSettingsRequest):
+    """Switch the request profiler on or off and tune it"""
+    request_profiler.configure(data)
+    logger.info(f"Request profiler {'enabled' if data.enabled else 'disabled'}")
+    return request_profiler.get_stats()
+
+@api_router.get("/admin/system/profiler/download", response_class=PlainTextResponse)
+async def download_profiles(profile_id: Optional[int] = Query(None)):
+    """Download captured profiles as folded stacks"""
+    return PlainTextResponse(request_profiler.folded(profile_id), headers={
+        "Content-Disposition": 'attachment; filename="profiles.folded"'
+    })
+
+@api_router.get("/admin/system/indexes")
+async def get_system_indexes():
+    """Get index usage statistics for registered collections"""
+    return await get_index_usage()
+
 # ==================== ROOT ====================
 
 @api_router.get("/")
@@ -1197,6 +3760,8 @@ async def root():
 # Include router
 app.include_router(api_router)
 
+app.add_middleware(ProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -1205,66 +3770,451 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ==================== LEADER ELECTION ====================
+
+class LeaseManager:
+    """Lease-based leadership for jobs that must run in one process only.
+
+    Each lease is a document in `leases` ({_id: name, holder, expires_at}).
+    Taking or renewing it is one conditional upsert that matches only when
+    the lease is ours or has expired; if another live holder owns it, the
+    upsert collides on _id and fails. The leader renews every
+    `renew_seconds` and followers retry on the same beat, so a crashed
+    leader is replaced within `ttl_seconds + renew_seconds`; a clean
+    shutdown releases its leases at once.
+
+    Expiry is compared against each process's clock, so the TTL must stay
+    well above clock skew between hosts. A leader that cannot reach Mongo
+    stops acting as leader when its own copy of the expiry passes.
+    """
+
+    def __init__(self, instance_id: str, ttl_seconds: float, renew_seconds: float):
+        self.instance_id = instance_id
+        self.ttl_seconds = ttl_seconds
+        self.renew_seconds = renew_seconds
+        self._leases: dict = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, on_acquired=None):
+        """Compete for `name`; `on_acquired` is awaited each time this process takes it over"""
+        self._leases[name] = {"on_acquired": on_acquired, "valid_until": 0.0, "acquired": 0, "lost": 0}
+
+    def is_leader(self, name: str) -> bool:
+        lease = self._leases.get(name)
+        return lease is not None and time.monotonic() < lease["valid_until"]
+
+    async def _renew(self, name: str, lease: dict):
+        was_leader = self.is_leader(name)
+        started = time.monotonic()
+        now = datetime.now(timezone.utc)
+        try:
+            await db.leases.update_one(
+                {"_id": name, "$or": [{"holder": self.instance_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {
+                    "holder": self.instance_id,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                    "renewed_at": now
+                }},
+                upsert=True
+            )
+            lease["valid_until"] = started + self.ttl_seconds
+        except DuplicateKeyError:
+            lease["valid_until"] = 0.0
+        
+        if self.is_leader(name) and not was_leader:
+            lease["acquired"] += 1
+            await db.leases.update_one({"_id": name, "holder": self.instance_id}, {"$set": {"acquired_at": now}})
+            logger.info(f"Lease {name} acquired by {self.instance_id}")
+            if lease["on_acquired"] is not None:
+                await lease["on_acquired"]()
+        elif was_leader and not self.is_leader(name):
+            lease["lost"] += 1
+            logger.warning(f"Lease {name} lost by {self.instance_id}")
+
+    async def tick(self):
+        for name, lease in self._leases.items():
+            try:
+                await self._renew(name, lease)
+            except Exception as e:
+                logger.error(f"Lease {name} renewal failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.renew_seconds)
+            await self.tick()
+
+    async def start(self):
+        # The first round runs inline so a lone instance leads right after startup
+        await self.tick()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for name, lease in self._leases.items():
+            if self.is_leader(name):
+                lease["valid_until"] = 0.0
+                try:
+                    await db.leases.delete_one({"_id": name, "holder": self.instance_id})
+                except Exception as e:
+                    logger.error(f"Lease {name} release failed: {e}")
+
+    async def holders(self) -> List[dict]:
+        """Current lease documents, as seen by every instance"""
+        def isoformat(value: Optional[datetime]) -> Optional[str]:
+            # Mongo hands dates back as naive UTC
+            return value.replace(tzinfo=timezone.utc).isoformat() if value else None
+        
+        docs = await db.leases.find({}).sort("_id", 1).to_list(100)
+        return [{
+            "name": doc["_id"],
+            "holder": doc.get("holder"),
+            "acquired_at": isoformat(doc.get("acquired_at")),
+            "expires_at": isoformat(doc.get("expires_at"))
+        } for doc in docs]
+
+    def get_stats(self) -> dict:
+        return {
+            "instance_id": self.instance_id,
+            "leases": {name: {
+                "leader": self.is_leader(name),
+                "acquired": lease["acquired"],
+                "lost": lease["lost"]
+            } for name, lease in self._leases.items()}
+        }
+
+lease_manager = LeaseManager(INSTANCE_ID, LEASE_TTL_SECONDS, LEASE_RENEW_SECONDS)
+
 # ==================== BACKGROUND TASKS ====================
 
 ORDER_TIMEOUT_MINUTES = 15  # Время ожидания заказа в минутах
 
-async def cancel_expired_orders():
-    """Background task to cancel orders that have been waiting too long"""
-    while True:
-        try:
-            # Находим заказы старше 15 минут со статусом NEW или BROADCAST
-            cutoff_time = datetime.now(timezone.utc) - timedelta(minutes=ORDER_TIMEOUT_MINUTES)
-            cutoff_time_str = cutoff_time.isoformat()
-            
-            expired_orders = await db.orders.find({
-                "status": {"$in": [OrderStatus.NEW, OrderStatus.BROADCAST]},
-                "created_at": {"$lt": cutoff_time_str}
-            }, {"_id": 0}).to_list(100)
+def order_deadline(created_at: str) -> float:
+    """Expiry deadline of an order as a UNIX timestamp"""
+    created = datetime.fromisoformat(created_at)
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return (created + timedelta(minutes=ORDER_TIMEOUT_MINUTES)).timestamp()
+
+async def expire_order_batch(order_ids: List[str]) -> int:
+    """Cancel a batch of orders that are still waiting for a driver"""
+    now = datetime.now(timezone.utc).isoformat()
+    # Одно условное обновление: принятые или отменённые параллельно заказы не затрагиваются
+    result = await db.orders.update_many(
+        {"id": {"$in": order_ids}, "status": {"$in": [OrderStatus.NEW, OrderStatus.BROADCAST]}},
+        {"$set": {
+            "status": OrderStatus.CANCELLED,
+            "cancelled_at": now,
+            "updated_at": now
+        }}
+    )
+    if not result.modified_count:
+        return 0
+    
+    # Заказы, отменённые именно этим обновлением
+    orders = await db.orders.find({
+        "id": {"$in": order_ids},
+        "status": OrderStatus.CANCELLED,
+        "cancelled_at": now
+    }, {"_id": 0}).to_list(None)
+    logger.info(f"Auto-cancelling {len(orders)} expired orders")
+    
+    await log_actions([
+        ActionLogModel(
+            action_type=ActionType.ORDER_CANCELLED,
+            order_id=order["id"],
+            details=f"Автоматическая отмена: истекло время ожидания ({ORDER_TIMEOUT_MINUTES} минут)"
+        )
+        for order in orders
+    ])
+    
+    semaphore = asyncio.Semaphore(ORDER_EXPIRY_NOTIFY_CONCURRENCY)
+    
+    async def notify(order: dict):
+        async with semaphore:
+            await publish_order_change(order["client_telegram_id"])
+            await notify_client(
+                order["client_telegram_id"],
+                "😔 <b>Извините, автомобиль не найден.</b>\n\nПопробуйте предложить выше цену.",
+                MessagePriority.BACKGROUND
+            )
+    
+    tasks = [notify(order) for order in orders]
+    # Удаляем сообщения из группы водителей пачками
+    if settings_store.drivers_chat_id:
+        tasks.append(delete_telegram_messages(
+            settings_store.drivers_chat_id,
+            [order.get("telegram_message_id") for order in orders]
+        ))
+    
+    for outcome in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(outcome, Exception):
+            logger.error(f"Error while expiring orders: {outcome}")
+    return len(orders)
+
+async def expire_orders(order_ids: List[str]) -> int:
+    """Expire the given orders if they are still waiting for a driver"""
+    expired = 0
+    for start in range(0, len(order_ids), ORDER_EXPIRY_BATCH_SIZE):
+        expired += await expire_order_batch(order_ids[start:start + ORDER_EXPIRY_BATCH_SIZE])
+    
+    if expired:
+        logger.info(f"Auto-cancelled {expired} expired orders")
+    return expired
+
+class OrderExpiryScheduler:
+    """Fires order expiry at the exact deadline.
+
+    Deadlines are kept in a min-heap fed by create_order. Accepted or
+    cancelled orders are dropped lazily: their heap entries no longer match
+    the deadline map and are skipped. The expiry leader merges in every
+    pending order from Mongo on takeover and then periodically; the slow
+    reconciliation scan catches anything missed here.
+    """
+
+    def __init__(self, expire):
+        self._expire = expire
+        self._heap: list = []
+        self._deadlines: dict = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.scheduled = 0
+        self.dropped = 0
+        self.fired = 0
+        self.expired = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def schedule(self, order_id: str, created_at: str):
+        deadline = order_deadline(created_at)
+        self._deadlines[order_id] = deadline
+        heapq.heappush(self._heap, (deadline, order_id))
+        self.scheduled += 1
+        if self._heap[0][1] == order_id:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._deadlines)
+
+    def discard(self, order_id: str):
+        """Forget an order that was accepted or cancelled"""
+        if self._deadlines.pop(order_id, None) is not None:
+            self.dropped += 1
+
+    async def rebuild(self) -> int:
+        """Load deadlines of all orders still waiting for a driver"""
+        known = set(self._deadlines)
+        deadlines = {}
+        async for order in db.orders.find(
+            {"status": {"$in": [OrderStatus.NEW, OrderStatus.BROADCAST]}},
+            {"_id": 0, "id": 1, "created_at": 1}
+        ):
+            deadlines[order["id"]] = order_deadline(order["created_at"])
+        
+        # Merge: orders scheduled while the scan was running must not be dropped,
+        # orders known before it and no longer pending were taken or cancelled elsewhere
+        for order_id in known.difference(deadlines):
+            self._deadlines.pop(order_id, None)
+        self._deadlines.update(deadlines)
+        self._heap = [(deadline, order_id) for order_id, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+        return len(deadlines)
+
+    def _next_deadline(self) -> Optional[float]:
+        # Stale entries at the top would cause needless wakeups
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def _pop_due(self, now: float) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, order_id = heapq.heappop(self._heap)
+            if self._deadlines.get(order_id) == deadline:
+                del self._deadlines[order_id]
+                due.append((deadline, order_id))
+        return due
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            deadline = self._next_deadline()
+            timeout = None if deadline is None else deadline - time.time()
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
             
-            for order in expired_orders:
-                logger.info(f"Auto-cancelling expired order: {order['id']}")
-                
-                # Отменяем заказ
-                await db.orders.update_one(
-                    {"id": order["id"]},
-                    {"$set": {
-                        "status": OrderStatus.CANCELLED,
-                        "cancelled_at": datetime.now(timezone.utc).isoformat()
-                    }}
-                )
-                
-                # Удаляем сообщение из группы водителей
-                if order.get("telegram_message_id") and TELEGRAM_DRIVERS_CHAT_ID:
-                    await delete_telegram_message(TELEGRAM_DRIVERS_CHAT_ID, order["telegram_message_id"])
-                
-                # Отправляем уведомление клиенту
-                await notify_client(
-                    order["client_telegram_id"],
-                    "😔 <b>Извините, автомобиль не найден.</b>\n\nПопробуйте предложить выше цену."
-                )
-                
-                await log_action(
-                    ActionType.ORDER_CANCELLED, 
-                    order_id=order["id"], 
-                    details="Автоматическая отмена: истекло время ожидания (15 минут)"
-                )
+            now = time.time()
+            due = self._pop_due(now)
+            if not due:
+                continue
             
-            if expired_orders:
-                logger.info(f"Auto-cancelled {len(expired_orders)} expired orders")
-                
-        except Exception as e:
-            logger.error(f"Error in cancel_expired_orders task: {e}")
+            # The heap is ordered, so the first entry is the most overdue
+            self.last_lag_ms = (now - due[0][0]) * 1000
+            self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+            order_expiry_lag_seconds.observe(self.last_lag_ms / 1000)
+            self.fired += len(due)
+            try:
+                self.expired += await self._expire([order_id for _, order_id in due])
+            except Exception as e:
+                logger.error(f"Error expiring {len(due)} orders: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_stats(self) -> dict:
+        deadline = self._next_deadline()
+        return {
+            "pending": self.pending,
+            "heap_size": len(self._heap),
+            "next_in_seconds": round(deadline - time.time(), 1) if deadline is not None else None,
+            "scheduled": self.scheduled,
+            "dropped": self.dropped,
+            "fired": self.fired,
+            "expired": self.expired,
+            "last_lag_ms": round(self.last_lag_ms, 2),
+            "max_lag_ms": round(self.max_lag_ms, 2)
+        }
+
+order_expiry = OrderExpiryScheduler(expire_orders)
+
+async def reconcile_expired_orders():
+    """Reconciliation scan for expired orders the deadline scheduler missed"""
+    try:
+        cutoff_time = datetime.now(timezone.utc) - timedelta(minutes=ORDER_TIMEOUT_MINUTES)
+        cutoff_time_str = cutoff_time.isoformat()
+        
+        expired_orders = await db.orders.find({
+            "status": {"$in": [OrderStatus.NEW, OrderStatus.BROADCAST]},
+            "created_at": {"$lt": cutoff_time_str}
+        }, {"_id": 0, "id": 1}).to_list(None)
         
-        # Проверяем каждую минуту
-        await asyncio.sleep(60)
+        if expired_orders:
+            order_ids = [order["id"] for order in expired_orders]
+            for order_id in order_ids:
+                order_expiry.discard(order_id)
+            order_expiry_reconciled_total.inc(value=len(order_ids))
+            expired = await expire_orders(order_ids)
+            logger.warning(f"Expiry reconciliation found {len(order_ids)} overdue orders, expired {expired}")
+            
+    except Exception as e:
+        logger.error(f"Error in expiry reconciliation: {e}")
+
+async def cancel_expired_orders():
+    """Leader loop: reload every pending deadline, now and then run the reconciliation scan"""
+    last_reconcile = time.monotonic()
+    while True:
+        # Точные дедлайны обрабатывает order_expiry; лидер регулярно подгружает
+        # дедлайны всех воркеров и изредка делает страховочную проверку
+        await asyncio.sleep(ORDER_EXPIRY_RELOAD_SECONDS)
+        if not lease_manager.is_leader(ORDER_EXPIRY_LEASE):
+            continue
+        await load_order_deadlines()
+        if time.monotonic() - last_reconcile >= ORDER_EXPIRY_RECONCILE_SECONDS:
+            last_reconcile = time.monotonic()
+            await reconcile_expired_orders()
+
+ORDER_EXPIRY_LEASE = "order-expiry"
+
+async def load_order_deadlines() -> int:
+    """Merge deadlines of all pending orders, including other workers' ones"""
+    try:
+        return await order_expiry.rebuild()
+    except Exception as e:
+        logger.error(f"Order expiry rebuild failed: {e}")
+        return 0
+
+async def take_over_order_expiry():
+    """On becoming leader: load every deadline and expire what is already overdue"""
+    pending = await load_order_deadlines()
+    logger.info(f"Order expiry scheduler loaded {pending} pending orders")
+    await reconcile_expired_orders()
+
+lease_manager.register(ORDER_EXPIRY_LEASE, take_over_order_expiry)
 
 @app.on_event("startup")
 async def startup_event():
     """Start background tasks on app startup"""
-    asyncio.create_task(cancel_expired_orders())
+    await telegram_api.start()
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        logger.error(f"Index bootstrap failed: {e}")
+    try:
+        await settings_store.load()
+    except Exception as e:
+        logger.error(f"Settings load failed, using environment values: {e}")
+    settings_store.start()
+    telegram_outbox.start()
+    action_log_writer.start()
+    webhook_recorder.start()
+    mongo_command_listener.start()
+    order_events.start()
+    if TELEGRAM_WEBHOOK_ASYNC:
+        if not TELEGRAM_WEBHOOK_SECRET:
+            logger.warning("TELEGRAM_WEBHOOK_ASYNC is enabled without TELEGRAM_WEBHOOK_SECRET")
+        update_dispatcher.start(process_telegram_update)
+        logger.info(f"Webhook fast-ack mode enabled with {TELEGRAM_WEBHOOK_WORKERS} workers")
+    # Every worker expires the orders it created. The lease holder also loads
+    # all pending deadlines on takeover and every ORDER_EXPIRY_RELOAD_SECONDS,
+    # so orders of a worker that exited still expire on time, and runs the
+    # reconciliation scan on takeover and every ORDER_EXPIRY_RECONCILE_SECONDS
+    order_expiry.start()
+    await lease_manager.start()
+    run_in_background(cancel_expired_orders())
     logger.info("Background task for auto-cancelling expired orders started")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await lease_manager.stop()
+    await update_dispatcher.stop()
+    await order_expiry.stop()
+    await settings_store.stop()
+    await order_events.stop()
+    await telegram_outbox.stop()
+    await telegram_api.close()
+    await action_log_writer.stop()
+    await webhook_recorder.stop()
+    await mongo_command_listener.stop()
     client.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Taxi Service maintenance commands")
+    parser.add_argument("command", choices=["ensure-indexes", "index-stats"])
+    args = parser.parse_args()
+
+    async def run_command():
+        try:
+            if args.command == "ensure-indexes":
+                result = await ensure_indexes()
+            else:
+                result = await get_index_usage()
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        finally:
+            client.close()
+
+    asyncio.run(run_command())
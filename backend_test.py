@@ -187,8 +187,8 @@ class TaxiAPITester:
         """Test getting all orders (admin)"""
         success, data, status = self.make_request('GET', '/admin/orders')
         
-        if success and isinstance(data, list):
-            self.log_test("Admin Orders", True, f"Found {len(data)} orders")
+        if success and isinstance(data.get('items'), list):
+            self.log_test("Admin Orders", True, f"Found {len(data['items'])} orders")
         else:
             self.log_test("Admin Orders", False, f"Status: {status}, Response: {data}")
 
@@ -196,10 +196,10 @@ class TaxiAPITester:
         """Test getting all drivers"""
         success, data, status = self.make_request('GET', '/admin/drivers')
         
-        if success and isinstance(data, list):
-            self.log_test("Admin Drivers", True, f"Found {len(data)} drivers")
-            if data:
-                self.test_driver_id = data[0].get('id')
+        if success and isinstance(data.get('items'), list):
+            self.log_test("Admin Drivers", True, f"Found {len(data['items'])} drivers")
+            if data['items']:
+                self.test_driver_id = data['items'][0].get('id')
         else:
             self.log_test("Admin Drivers", False, f"Status: {status}, Response: {data}")
 
@@ -207,8 +207,8 @@ class TaxiAPITester:
         """Test getting all clients"""
         success, data, status = self.make_request('GET', '/admin/clients')
         
-        if success and isinstance(data, list):
-            self.log_test("Admin Clients", True, f"Found {len(data)} clients")
+        if success and isinstance(data.get('items'), list):
+            self.log_test("Admin Clients", True, f"Found {len(data['items'])} clients")
         else:
             self.log_test("Admin Clients", False, f"Status: {status}, Response: {data}")
 
@@ -216,8 +216,8 @@ class TaxiAPITester:
         """Test getting action logs"""
         success, data, status = self.make_request('GET', '/admin/logs')
         
-        if success and isinstance(data, list):
-            self.log_test("Admin Logs", True, f"Found {len(data)} log entries")
+        if success and isinstance(data.get('items'), list):
+            self.log_test("Admin Logs", True, f"Found {len(data['items'])} log entries")
         else:
             self.log_test("Admin Logs", False, f"Status: {status}, Response: {data}")
 
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Order acceptance stress benchmark
+
+Fires hundreds of concurrent "accept_order" button presses through the
+webhook handler and checks the assignment invariants afterwards:
+
+  same-order  every driver taps the same order at once - exactly one wins
+  double-tap  every driver taps two different orders at once - nobody
+              holds more than one order, no order has two drivers
+
+Needs a MongoDB instance; data is written to a scratch database that is
+dropped at the end. Telegram calls are disabled (empty bot token):
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/claim_benchmark.py
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "taxi_benchmark")
+os.environ["TELEGRAM_BOT_TOKEN"] = ""
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from server import OrderStatus, DriverStatus  # noqa: E402
+
+async def seed(drivers: int, orders: int) -> tuple:
+    await server.db.drivers.delete_many({})
+    await server.db.orders.delete_many({})
+    server.driver_cache.clear()
+    now = datetime.now(timezone.utc).isoformat()
+    driver_ids = [str(700000 + i) for i in range(drivers)]
+    await server.db.drivers.insert_many([{
+        "id": str(uuid.uuid4()),
+        "telegram_id": telegram_id,
+        "first_name": "Водитель",
+        "car_brand": "Kia",
+        "car_plate": "A000AA",
+        "status": DriverStatus.ACTIVE.value,
+        "is_registered": True,
+        "is_busy": False,
+        "current_order_id": None,
+        "created_at": now
+    } for telegram_id in driver_ids])
+    order_ids = [str(uuid.uuid4()) for _ in range(orders)]
+    await server.db.orders.insert_many([{
+        "id": order_id,
+        "client_id": f"client-{i}",
+        "client_telegram_id": str(100000 + i),
+        "client_phone": "+70000000000",
+        "client_price": 300,
+        "address_from": "ул. Ленина, 1",
+        "address_to": "ул. Мира, 2",
+        "comment": None,
+        "status": OrderStatus.BROADCAST.value,
+        "driver_id": None,
+        "created_at": now,
+        "updated_at": now
+    } for i, order_id in enumerate(order_ids)])
+    return driver_ids, order_ids
+
+def accept_update(telegram_id: str, order_id: str) -> dict:
+    return {"callback_query": {
+        "id": str(uuid.uuid4()),
+        "from": {"id": int(telegram_id), "first_name": "Водитель"},
+        "data": f"accept_order:{order_id}"
+    }}
+
+async def fire(updates: list) -> list:
+    async def timed(update):
+        started = time.perf_counter()
+        await server.process_telegram_update(update)
+        return (time.perf_counter() - started) * 1000
+    return await asyncio.gather(*(timed(update) for update in updates))
+
+async def check_invariants() -> dict:
+    """Return assignment counts; raise AssertionError on any double assignment"""
+    assigned = await server.db.orders.find(
+        {"status": OrderStatus.ASSIGNED}, {"_id": 0, "id": 1, "driver_id": 1}
+    ).to_list(None)
+    busy = await server.db.drivers.find(
+        {"is_busy": True}, {"_id": 0, "id": 1, "current_order_id": 1}
+    ).to_list(None)
+
+    per_driver = Counter(order["driver_id"] for order in assigned)
+    assert all(count == 1 for count in per_driver.values()), "driver holds several orders"
+    holder = {order["id"]: order["driver_id"] for order in assigned}
+    assert len(busy) == len(assigned), f"{len(busy)} busy drivers for {len(assigned)} assigned orders"
+    for driver in busy:
+        assert holder.get(driver["current_order_id"]) == driver["id"], "busy driver without a matching order"
+    return {"assigned_orders": len(assigned), "busy_drivers": len(busy)}
+
+def summarize(samples: list) -> dict:
+    samples = sorted(samples)
+    def percentile(p):
+        return round(samples[min(len(samples) - 1, int(len(samples) * p))], 2)
+    return {
+        "requests": len(samples),
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(samples[-1], 2)
+    }
+
+async def same_order(drivers: int) -> dict:
+    driver_ids, order_ids = await seed(drivers, 1)
+    samples = await fire([accept_update(telegram_id, order_ids[0]) for telegram_id in driver_ids])
+    counts = await check_invariants()
+    assert counts["assigned_orders"] == 1, "the order was not assigned exactly once"
+    return {"scenario": "same-order", **counts, **summarize(samples)}
+
+async def double_tap(drivers: int) -> dict:
+    driver_ids, order_ids = await seed(drivers, drivers)
+    updates = []
+    for i, telegram_id in enumerate(driver_ids):
+        updates.append(accept_update(telegram_id, order_ids[i]))
+        updates.append(accept_update(telegram_id, order_ids[(i + 1) % drivers]))
+    samples = await fire(updates)
+    counts = await check_invariants()
+    return {"scenario": "double-tap", **counts, **summarize(samples)}
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drivers", type=int, default=300, help="Concurrent drivers per scenario")
+    parser.add_argument("--rounds", type=int, default=5, help="Repetitions of each scenario")
+    parser.add_argument("--max-p99-ms", type=float, default=1000, help="Fail if p99 latency exceeds this")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--keep", action="store_true", help="Do not drop the benchmark database")
+    args = parser.parse_args()
+
+    await server.client.drop_database(os.environ["DB_NAME"])
+    await server.ensure_indexes()
+
+    results = []
+    try:
+        for _ in range(args.rounds):
+            for scenario in (same_order, double_tap):
+                row = await scenario(args.drivers)
+                results.append(row)
+                print(f"{row['scenario']:>10} | {row['requests']:>5} taps | assigned {row['assigned_orders']:>4}"
+                      f" | p50 {row['p50_ms']:>8} ms  p95 {row['p95_ms']:>8} ms  p99 {row['p99_ms']:>8} ms")
+    finally:
+        if not args.keep:
+            await server.client.drop_database(os.environ["DB_NAME"])
+        server.client.close()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    worst = max(row["p99_ms"] for row in results)
+    if worst > args.max_p99_ms:
+        sys.exit(f"p99 latency {worst} ms exceeds {args.max_p99_ms} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
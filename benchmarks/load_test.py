@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end load test
+
+Runs the backend in-process under uvicorn together with a stub Telegram
+Bot API (configurable latency and 429 injection) and drives it with
+scripted users:
+
+  clients   Mini App users creating orders, polling the active order and
+            cancelling when nobody accepts in time
+  drivers   receive broadcasts from the stub, tap "accept" via webhook
+            callback updates and complete the ride afterwards
+  admins    dashboards polling stats and the order/driver lists
+
+Reports requests/s and p50/p95/p99 latency per endpoint and can save the
+result as a JSON baseline and compare a run against it.
+
+Needs a MongoDB instance (a scratch database is dropped at the end), or
+--in-memory to start a throwaway mongod through pymongo_inmemory:
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/load_test.py \\
+        --clients 200 --drivers 50 --admins 3 --duration 60 --output baseline.json
+    python benchmarks/load_test.py --in-memory --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import statistics
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+BOT_TOKEN = "123456:LOADTEST"
+DRIVERS_CHAT_ID = "-1000000000001"
+WEBHOOK_SECRET = "load-test-secret"
+
+server = None  # backend module, imported once the environment is configured
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# ==================== STUB BOT API ====================
+
+class StubBotAPI:
+    """Fake Bot API: answers every method after a random delay.
+
+    Broadcasts to the drivers chat are forwarded to the simulated drivers,
+    "complete_order" buttons sent to a driver's private chat tell that
+    driver they won the order.
+    """
+
+    def __init__(self, latency_ms: float, jitter_ms: float, rate_429: float):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.calls = defaultdict(int)
+        self.injected_429 = 0
+        self.driver_feeds: dict = {}
+        self.assignments: dict = {}
+        self._message_id = 0
+        self.app = FastAPI()
+        self.app.post("/bot{token}/{method}")(self.handle)
+
+    async def handle(self, token: str, method: str, request: Request):
+        payload = await request.json()
+        delay = max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        self.calls[method] += 1
+
+        if random.random() < self.rate_429:
+            self.injected_429 += 1
+            return {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1}}
+
+        if method != "sendMessage":
+            return {"ok": True, "result": True}
+
+        self._message_id += 1
+        buttons = [button["callback_data"]
+                   for row in (payload.get("reply_markup") or {}).get("inline_keyboard", [])
+                   for button in row if "callback_data" in button]
+        chat_id = str(payload["chat_id"])
+        for data in buttons:
+            action, _, order_id = data.partition(":")
+            if action == "accept_order" and chat_id == DRIVERS_CHAT_ID:
+                for feed in self.driver_feeds.values():
+                    feed.put_nowait(order_id)
+            elif action == "complete_order" and chat_id in self.assignments:
+                self.assignments[chat_id].put_nowait(order_id)
+        return {"ok": True, "result": {"message_id": self._message_id, "chat": {"id": chat_id}}}
+
+# ==================== MEASUREMENTS ====================
+
+class Recorder:
+    """Latency samples and error counts per endpoint label"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, http: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await http.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[label] += 1
+            return None
+        self.samples[label].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 500:
+            self.errors[label] += 1
+        return response
+
+    def report(self, duration: float) -> dict:
+        report = {}
+        for label in sorted(self.samples):
+            samples = sorted(self.samples[label])
+
+            def percentile(p):
+                return round(samples[min(len(samples) - 1, int(len(samples) * p))], 2)
+
+            report[label] = {
+                "requests": len(samples),
+                "errors": self.errors[label],
+                "rps": round(len(samples) / duration, 1),
+                "p50_ms": round(statistics.median(samples), 2),
+                "p95_ms": percentile(0.95),
+                "p99_ms": percentile(0.99)
+            }
+        return report
+
+# ==================== SCENARIOS ====================
+
+async def client_user(index: int, http: httpx.AsyncClient, recorder: Recorder, args, deadline: float):
+    telegram_id = str(200000 + index)
+    user = json.dumps({"id": int(telegram_id), "first_name": f"Клиент {index}"})
+    await recorder.request(http, "POST /client/auth", "POST", "/api/client/auth",
+                           json={"init_data": f"user={user}"})
+    await recorder.request(http, "POST /client/update-phone", "POST", "/api/client/update-phone",
+                           json={"telegram_id": telegram_id, "phone": f"+7900{index:07d}"})
+
+    while time.monotonic() < deadline:
+        response = await recorder.request(http, "POST /client/order", "POST", "/api/client/order",
+                                          params={"telegram_id": telegram_id},
+                                          json={"address_from": "ул. Ленина, 1", "address_to": "ул. Мира, 2",
+                                                "client_price": random.randint(200, 900)})
+        if response is None or response.status_code != 200:
+            await asyncio.sleep(args.poll_interval)
+            continue
+
+        order_id = response.json()["id"]
+        waited = 0.0
+        while time.monotonic() < deadline:
+            await asyncio.sleep(args.poll_interval)
+            waited += args.poll_interval
+            response = await recorder.request(http, "GET /client/order/active", "GET", "/api/client/order/active",
+                                              params={"telegram_id": telegram_id})
+            active = response.json() if response is not None and response.status_code == 200 else None
+            if not active:
+                break
+            if active["status"] in ("NEW", "BROADCAST") and waited >= args.client_patience:
+                await recorder.request(http, "POST /client/order/{id}/cancel", "POST",
+                                       f"/api/client/order/{order_id}/cancel", params={"telegram_id": telegram_id})
+                break
+
+        await recorder.request(http, "GET /client/orders/history", "GET", "/api/client/orders/history",
+                               params={"telegram_id": telegram_id})
+        await asyncio.sleep(random.uniform(0, args.poll_interval))
+
+class UpdateIds:
+    def __init__(self):
+        self.value = int(time.time())
+
+    def next(self) -> int:
+        self.value += 1
+        return self.value
+
+def callback_update(update_ids: UpdateIds, telegram_id: str, data: str) -> dict:
+    return {"update_id": update_ids.next(), "callback_query": {
+        "id": str(uuid.uuid4()),
+        "from": {"id": int(telegram_id), "first_name": "Водитель"},
+        "message": {"message_id": 1, "chat": {"id": int(DRIVERS_CHAT_ID)}},
+        "data": data
+    }}
+
+async def driver_user(telegram_id: str, http: httpx.AsyncClient, recorder: Recorder, stub: StubBotAPI,
+                      update_ids: UpdateIds, args, deadline: float):
+    feed = stub.driver_feeds[telegram_id]
+    assignments = stub.assignments[telegram_id]
+    headers = {"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET}
+
+    while time.monotonic() < deadline:
+        try:
+            order_id = await asyncio.wait_for(feed.get(), timeout=1)
+        except asyncio.TimeoutError:
+            continue
+        if random.random() > args.tap_probability:
+            continue
+
+        await asyncio.sleep(random.uniform(0.05, 0.5))  # reaction time
+        await recorder.request(http, "POST /telegram/webhook (accept)", "POST", "/api/telegram/webhook",
+                               headers=headers, json=callback_update(update_ids, telegram_id, f"accept_order:{order_id}"))
+        try:
+            won = await asyncio.wait_for(assignments.get(), timeout=5)
+        except asyncio.TimeoutError:
+            continue
+
+        # Drain broadcasts missed during the ride
+        await asyncio.sleep(args.ride_seconds)
+        while not feed.empty():
+            feed.get_nowait()
+        await recorder.request(http, "POST /telegram/webhook (complete)", "POST", "/api/telegram/webhook",
+                               headers=headers, json=callback_update(update_ids, telegram_id, f"complete_order:{won}"))
+
+async def admin_user(http: httpx.AsyncClient, recorder: Recorder, args, deadline: float):
+    high_water_mark = None
+    while time.monotonic() < deadline:
+        await recorder.request(http, "GET /admin/stats", "GET", "/api/admin/stats")
+        params = {"since": high_water_mark} if high_water_mark else {"limit": 100}
+        response = await recorder.request(http, "GET /admin/orders", "GET", "/api/admin/orders", params=params)
+        if response is not None and response.status_code == 200:
+            high_water_mark = response.json().get("high_water_mark") or high_water_mark
+        await recorder.request(http, "GET /admin/drivers", "GET", "/api/admin/drivers", params={"limit": 50})
+        await recorder.request(http, "GET /admin/logs", "GET", "/api/admin/logs", params={"limit": 50})
+        await asyncio.sleep(args.admin_interval)
+
+async def seed_drivers(count: int) -> list:
+    now = datetime.now(timezone.utc).isoformat()
+    drivers = [{
+        "id": str(uuid.uuid4()),
+        "telegram_id": str(700000 + i),
+        "first_name": f"Водитель {i}",
+        "phone": f"+7911{i:07d}",
+        "car_brand": "Kia",
+        "car_model": "Rio",
+        "car_color": "белый",
+        "car_plate": f"A{i % 1000:03d}AA",
+        "status": "ACTIVE",
+        "is_registered": True,
+        "registration_step": None,
+        "is_busy": False,
+        "current_order_id": None,
+        "created_at": now
+    } for i in range(count)]
+    if drivers:
+        await server.db.drivers.insert_many(drivers)
+    return [driver["telegram_id"] for driver in drivers]
+
+# ==================== RUNNER ====================
+
+async def serve(app, port: int) -> tuple:
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    uv_server = uvicorn.Server(config)
+    task = asyncio.create_task(uv_server.serve())
+    while not uv_server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return uv_server, task
+
+async def stop(uv_server, task):
+    uv_server.should_exit = True
+    await task
+
+def compare(report: dict, baseline_path: str):
+    baseline = json.loads(Path(baseline_path).read_text())["endpoints"]
+    print(f"\nCompared with {baseline_path}:")
+    for label, row in report.items():
+        old = baseline.get(label)
+        if not old:
+            continue
+        p95_delta = (row["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0.0
+        rps_delta = (row["rps"] - old["rps"]) / old["rps"] * 100 if old["rps"] else 0.0
+        print(f"{label:<36} p95 {old['p95_ms']:>8} -> {row['p95_ms']:>8} ms ({p95_delta:+.0f}%)"
+              f"  rps {old['rps']:>7} -> {row['rps']:>7} ({rps_delta:+.0f}%)")
+
+async def run(args):
+    stub = StubBotAPI(args.telegram_latency_ms, args.telegram_jitter_ms, args.telegram_429_rate)
+    stub_server = await serve(stub.app, args.stub_port)
+
+    await server.client.drop_database(os.environ["DB_NAME"])
+    driver_ids = await seed_drivers(args.drivers)
+    for telegram_id in driver_ids:
+        stub.driver_feeds[telegram_id] = asyncio.Queue()
+        stub.assignments[telegram_id] = asyncio.Queue()
+
+    app_port = free_port()
+    app_server = await serve(server.app, app_port)
+    recorder = Recorder()
+    update_ids = UpdateIds()
+    limits = httpx.Limits(max_connections=args.clients + args.drivers + args.admins + 10)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", limits=limits, timeout=30) as http:
+            started = time.monotonic()
+            deadline = started + args.duration
+            await asyncio.gather(
+                *(client_user(i, http, recorder, args, deadline) for i in range(args.clients)),
+                *(driver_user(telegram_id, http, recorder, stub, update_ids, args, deadline) for telegram_id in driver_ids),
+                *(admin_user(http, recorder, args, deadline) for _ in range(args.admins))
+            )
+            duration = time.monotonic() - started
+            system = (await http.get("/api/admin/system")).json()
+    finally:
+        await stop(*app_server)
+        await stop(*stub_server)
+        if not args.keep:
+            await server.client.drop_database(os.environ["DB_NAME"])
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "keep")},
+        "duration_s": round(duration, 1),
+        "endpoints": recorder.report(duration),
+        "telegram_stub": {"calls": dict(stub.calls), "injected_429": stub.injected_429},
+        "system": system
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100, help="Simulated Mini App clients")
+    parser.add_argument("--drivers", type=int, default=30, help="Simulated drivers")
+    parser.add_argument("--admins", type=int, default=2, help="Simulated admin dashboards")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run the scenarios")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Client polling interval, seconds")
+    parser.add_argument("--client-patience", type=float, default=10, help="Seconds before a client cancels")
+    parser.add_argument("--tap-probability", type=float, default=0.3, help="Chance a driver taps a broadcast")
+    parser.add_argument("--ride-seconds", type=float, default=3, help="Time between accept and complete")
+    parser.add_argument("--admin-interval", type=float, default=2, help="Dashboard polling interval, seconds")
+    parser.add_argument("--telegram-latency-ms", type=float, default=50, help="Mean stub Bot API latency")
+    parser.add_argument("--telegram-jitter-ms", type=float, default=20, help="Stub latency standard deviation")
+    parser.add_argument("--telegram-429-rate", type=float, default=0.0, help="Share of stub calls answered with 429")
+    parser.add_argument("--group-rate-per-minute", type=float, default=600,
+                        help="New messages per minute to the drivers chat (production: 20, below"
+                             " the order rate this scenario generates)")
+    parser.add_argument("--webhook-async", action="store_true", help="Enable fast-ack webhook mode")
+    parser.add_argument("--in-memory", action="store_true", help="Start a throwaway mongod via pymongo_inmemory")
+    parser.add_argument("--output", help="Write the report as a JSON baseline to this file")
+    parser.add_argument("--compare", help="Compare against a previously saved baseline")
+    parser.add_argument("--keep", action="store_true", help="Do not drop the load test database")
+    args = parser.parse_args()
+    args.stub_port = free_port()
+
+    mongod = None
+    if args.in_memory:
+        try:
+            from pymongo_inmemory import Mongod
+        except ImportError:
+            sys.exit("--in-memory needs the 'pymongo_inmemory' package")
+        mongod = Mongod()
+        mongod.start()
+        os.environ["MONGO_URL"] = mongod.connection_string
+
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = os.environ.get("LOADTEST_DB_NAME", "taxi_loadtest")
+    os.environ["TELEGRAM_BOT_TOKEN"] = BOT_TOKEN
+    os.environ["TELEGRAM_DRIVERS_CHAT_ID"] = DRIVERS_CHAT_ID
+    os.environ["TELEGRAM_API_BASE"] = f"http://127.0.0.1:{args.stub_port}"
+    os.environ["TELEGRAM_WEBHOOK_SECRET"] = WEBHOOK_SECRET
+    os.environ["TELEGRAM_WEBHOOK_ASYNC"] = "1" if args.webhook_async else ""
+    os.environ["TELEGRAM_GROUP_RATE_PER_MINUTE"] = str(args.group_rate_per_minute)
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    global server
+    import server as backend
+    server = backend
+    logging.getLogger("server").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        if mongod is not None:
+            mongod.stop()
+
+    print(f"\n{'endpoint':<36} {'requests':>9} {'errors':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, row in result["endpoints"].items():
+        print(f"{label:<36} {row['requests']:>9} {row['errors']:>7} {row['rps']:>8}"
+              f" {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+    print(f"\nStub Bot API calls: {result['telegram_stub']['calls']}, injected 429s: {result['telegram_stub']['injected_429']}")
+
+    if args.compare:
+        compare(result["endpoints"], args.compare)
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
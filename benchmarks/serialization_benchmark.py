@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Response serialization benchmark
+
+Measures the CPU spent turning a page of documents into the response body
+for the list endpoints, before and after the fast JSON path:
+
+  before    full documents, jsonable_encoder + the standard json encoder
+            (what FastAPI does with a plain dict returned by a handler)
+  lean      summary projection, same encoder
+  after     summary projection, rendered directly by FastJSONResponse
+            (orjson when installed) without jsonable_encoder
+
+No database is needed; documents are generated in the shape Mongo returns
+them with the `_id: 0` projection:
+
+    python benchmarks/serialization_benchmark.py --sizes 100,500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "taxi_benchmark")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import server  # noqa: E402
+from server import OrderStatus, DriverStatus  # noqa: E402
+
+def timestamp(i: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(minutes=i)).isoformat()
+
+def make_order(i: int) -> dict:
+    return server.OrderModel(
+        client_id=str(uuid.uuid4()),
+        client_telegram_id=str(100000 + i),
+        client_phone="+79990000000",
+        client_price=350,
+        address_from="ул. Ленина, 1, подъезд 2",
+        address_to="Железнодорожный вокзал",
+        comment="Детское кресло" if i % 3 == 0 else None,
+        status=OrderStatus.ASSIGNED if i % 2 else OrderStatus.COMPLETED,
+        driver_id=str(uuid.uuid4()),
+        driver_telegram_id=str(500000 + i),
+        driver_name="Иван Петров",
+        driver_phone="+79991111111",
+        driver_car="Kia Rio, белый, A000AA",
+        telegram_message_id=1000 + i,
+        created_at=timestamp(i),
+        assigned_at=timestamp(i),
+        completed_at=timestamp(i) if i % 2 == 0 else None
+    ).model_dump()
+
+def make_driver(i: int) -> dict:
+    return server.DriverModel(
+        telegram_id=str(500000 + i),
+        username=f"driver{i}",
+        first_name="Иван",
+        last_name="Петров",
+        phone="+79991111111",
+        car_brand="Kia",
+        car_model="Rio",
+        car_color="белый",
+        car_plate="A000AA",
+        is_registered=True,
+        status=DriverStatus.ACTIVE,
+        is_busy=i % 4 == 0,
+        current_order_id=str(uuid.uuid4()) if i % 4 == 0 else None,
+        created_at=timestamp(i)
+    ).model_dump()
+
+def make_client(i: int) -> dict:
+    return server.ClientModel(
+        telegram_id=str(100000 + i),
+        username=f"client{i}",
+        first_name="Анна",
+        phone="+79992222222",
+        created_at=timestamp(i)
+    ).model_dump()
+
+def project(doc: dict, projection: dict) -> dict:
+    return {key: value for key, value in doc.items() if projection.get(key)}
+
+ENDPOINTS = {
+    "/admin/orders": (make_order, server.ORDER_SUMMARY_PROJECTION),
+    "/admin/drivers": (make_driver, server.DRIVER_SUMMARY_PROJECTION),
+    "/admin/clients": (make_client, server.CLIENT_SUMMARY_PROJECTION),
+}
+
+def page_of(docs: list) -> dict:
+    return {"items": docs, "next_cursor": "c3RhcnQ", "high_water_mark": timestamp(0)}
+
+def before(page: dict) -> bytes:
+    return JSONResponse(jsonable_encoder(page)).body
+
+def after(page: dict) -> bytes:
+    return server.json_response(page).body
+
+def measure(func, page: dict, runs: int) -> dict:
+    func(page)  # warm-up
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        body = func(page)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "bytes": len(body)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,200,500", help="Comma-separated page sizes")
+    parser.add_argument("--runs", type=int, default=200, help="Measurements per endpoint, size and variant")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    print(f"orjson: {'yes' if server.orjson else 'no (standard json fallback)'}")
+    results = []
+    for endpoint, (make, projection) in ENDPOINTS.items():
+        for size in sorted(int(size) for size in args.sizes.split(",")):
+            docs = [make(i) for i in range(size)]
+            full = page_of(docs)
+            lean = page_of([project(doc, projection) for doc in docs])
+            assert json.loads(after(lean)) == json.loads(before(lean)), "encoders disagree"
+            row = {
+                "endpoint": endpoint,
+                "items": size,
+                "before": measure(before, full, args.runs),
+                "lean": measure(before, lean, args.runs),
+                "after": measure(after, lean, args.runs)
+            }
+            results.append(row)
+            speedup = row["before"]["p50_ms"] / max(row["after"]["p50_ms"], 0.001)
+            print(f"{endpoint:<15} {size:>4} items | before {row['before']['p50_ms']:>7} ms {row['before']['bytes']:>7} B"
+                  f" | lean {row['lean']['p50_ms']:>7} ms {row['lean']['bytes']:>7} B"
+                  f" | after {row['after']['p50_ms']:>7} ms | x{speedup:.1f}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
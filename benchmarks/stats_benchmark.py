@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Dashboard statistics benchmark
+
+Compares the legacy sequence of eight count_documents calls with the
+concurrent index-only counts used by /api/admin/stats, at growing order counts.
+
+Needs a MongoDB instance; data is written to a scratch database that is
+dropped at the end:
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/stats_benchmark.py
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "taxi_benchmark")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from server import OrderStatus, DriverStatus  # noqa: E402
+
+STATUS_WEIGHTS = [
+    (OrderStatus.COMPLETED, 70),
+    (OrderStatus.CANCELLED, 25),
+    (OrderStatus.ASSIGNED, 3),
+    (OrderStatus.BROADCAST, 1),
+    (OrderStatus.NEW, 1),
+]
+
+async def legacy_stats() -> dict:
+    """The original implementation: eight sequential count_documents calls"""
+    db = server.db
+    total_orders = await db.orders.count_documents({})
+    active_orders = await db.orders.count_documents({"status": {"$in": [OrderStatus.NEW, OrderStatus.BROADCAST, OrderStatus.ASSIGNED]}})
+    completed_orders = await db.orders.count_documents({"status": OrderStatus.COMPLETED})
+    cancelled_orders = await db.orders.count_documents({"status": OrderStatus.CANCELLED})
+    total_drivers = await db.drivers.count_documents({})
+    active_drivers = await db.drivers.count_documents({"status": DriverStatus.ACTIVE})
+    busy_drivers = await db.drivers.count_documents({"is_busy": True})
+    total_clients = await db.clients.count_documents({})
+    return {
+        "orders": {"total": total_orders, "active": active_orders, "completed": completed_orders, "cancelled": cancelled_orders},
+        "drivers": {"total": total_drivers, "active": active_drivers, "busy": busy_drivers},
+        "clients": {"total": total_clients}
+    }
+
+def make_order(index: int, started: datetime) -> dict:
+    status = random.choices([s for s, _ in STATUS_WEIGHTS], [w for _, w in STATUS_WEIGHTS])[0]
+    return {
+        "id": str(uuid.uuid4()),
+        "client_id": f"client-{index % 5000}",
+        "client_telegram_id": str(100000 + index % 5000),
+        "client_phone": "+70000000000",
+        "client_price": 300,
+        "address_from": "ул. Ленина, 1",
+        "address_to": "ул. Мира, 2",
+        "comment": None,
+        "status": status.value,
+        "created_at": (started + timedelta(seconds=index)).isoformat()
+    }
+
+async def seed_orders(current: int, target: int, batch_size: int = 10000):
+    started = datetime.now(timezone.utc) - timedelta(days=365)
+    while current < target:
+        size = min(batch_size, target - current)
+        await server.db.orders.insert_many([make_order(current + i, started) for i in range(size)], ordered=False)
+        current += size
+    return current
+
+async def seed_people(drivers: int, clients: int):
+    await server.db.drivers.insert_many([{
+        "id": str(uuid.uuid4()),
+        "telegram_id": str(500000 + i),
+        "status": DriverStatus.ACTIVE.value if i % 10 else DriverStatus.BLOCKED.value,
+        "is_busy": i % 4 == 0,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    } for i in range(drivers)])
+    await server.db.clients.insert_many([{
+        "id": str(uuid.uuid4()),
+        "telegram_id": str(100000 + i),
+        "created_at": datetime.now(timezone.utc).isoformat()
+    } for i in range(clients)])
+
+async def measure(func, runs: int) -> dict:
+    await func()  # warm-up
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+        "max_ms": round(samples[-1], 2)
+    }
+
+async def measure_cached(concurrency: int) -> dict:
+    """Latency seen by `concurrency` dashboards polling at the same moment"""
+    server.stats_snapshot.invalidate()
+    started = time.perf_counter()
+    await asyncio.gather(*(server.get_stats() for _ in range(concurrency)))
+    return {"dashboards": concurrency, "wall_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated order counts")
+    parser.add_argument("--runs", type=int, default=20, help="Measurements per size and implementation")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--keep", action="store_true", help="Do not drop the benchmark database")
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    await server.client.drop_database(os.environ["DB_NAME"])
+    await server.ensure_indexes()
+    await seed_people(drivers=500, clients=5000)
+
+    results = []
+    seeded = 0
+    try:
+        for size in sizes:
+            seeded = await seed_orders(seeded, size)
+            assert await legacy_stats() == await server.compute_stats(), "implementations disagree"
+            row = {
+                "orders": size,
+                "legacy": await measure(legacy_stats, args.runs),
+                "current": await measure(server.compute_stats, args.runs),
+                "cached": await measure_cached(50)
+            }
+            results.append(row)
+            print(f"{size:>9} orders | legacy p50 {row['legacy']['p50_ms']:>9} ms  p95 {row['legacy']['p95_ms']:>9} ms"
+                  f" | current p50 {row['current']['p50_ms']:>9} ms  p95 {row['current']['p95_ms']:>9} ms"
+                  f" | 50 dashboards {row['cached']['wall_ms']:>9} ms")
+    finally:
+        if not args.keep:
+            await server.client.drop_database(os.environ["DB_NAME"])
+        server.client.close()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Replay recorded Telegram webhook traffic
+
+Feeds a recording made with TELEGRAM_RECORD_PATH into the app through the
+ASGI transport, against the stub Bot API from load_test.py, and reports the
+latency distribution per update type (new_chat_members, /start, contact,
+plain text, callback queries by action).
+
+Timing follows the recording: --speed 1 replays in real time, --speed 10
+ten times faster, --speed 0 as fast as possible (bounded by --concurrency,
+like Telegram's max_connections). Orders referenced by accept_order
+buttons and the drivers who pressed them are seeded first, so callbacks
+exercise the real assignment path instead of "order not found".
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/webhook_replay.py updates.jsonl.gz --speed 10
+    python benchmarks/webhook_replay.py updates.jsonl.gz --speed 0 --in-memory --output replay.json
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from load_test import BACKEND_DIR, BOT_TOKEN, StubBotAPI, free_port, serve, stop
+
+server = None  # backend module, imported once the environment is configured
+
+def load_recording(path: str, limit: int = 0) -> list:
+    entries = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+                if limit and len(entries) >= limit:
+                    break
+    entries.sort(key=lambda entry: entry["t"])
+    return entries
+
+def update_type(update: dict) -> str:
+    if "callback_query" in update:
+        action = update["callback_query"].get("data", "").split(":")[0]
+        return f"callback {action or '-'}"
+    message = update.get("message")
+    if message is None:
+        kinds = [key for key in update if key != "update_id"]
+        return kinds[0] if kinds else "empty"
+    if "new_chat_members" in message:
+        return "new_chat_members"
+    if "contact" in message:
+        return "contact"
+    text = message.get("text", "")
+    if text.startswith("/"):
+        return f"command {text.split()[0]}"
+    return "text" if text else "message (other)"
+
+def guess_drivers_chat(entries: list) -> str:
+    """The busiest group chat in the recording is taken as the drivers chat"""
+    chats = Counter()
+    for entry in entries:
+        update = entry["update"]
+        message = update.get("message") or update.get("callback_query", {}).get("message") or {}
+        chat_id = message.get("chat", {}).get("id")
+        if isinstance(chat_id, int) and chat_id < 0:
+            chats[chat_id] += 1
+    return str(chats.most_common(1)[0][0]) if chats else ""
+
+async def seed(entries: list):
+    """Create the orders and drivers that recorded callbacks refer to"""
+    now = datetime.now(timezone.utc).isoformat()
+    order_ids, driver_ids = set(), set()
+    for entry in entries:
+        callback = entry["update"].get("callback_query")
+        if not callback:
+            continue
+        action, _, order_id = callback.get("data", "").partition(":")
+        if action == "accept_order" and order_id:
+            order_ids.add(order_id)
+            driver_ids.add(str(callback["from"]["id"]))
+
+    if order_ids:
+        await server.db.orders.insert_many([{
+            "id": order_id,
+            "client_id": f"replay-client-{i}",
+            "client_telegram_id": str(900000 + i),
+            "client_phone": "+70000000000",
+            "client_price": 300,
+            "address_from": "ул. Ленина, 1",
+            "address_to": "ул. Мира, 2",
+            "comment": None,
+            "status": "BROADCAST",
+            "driver_id": None,
+            "created_at": now,
+            "updated_at": now
+        } for i, order_id in enumerate(sorted(order_ids))])
+    if driver_ids:
+        await server.db.drivers.insert_many([{
+            "id": str(uuid.uuid4()),
+            "telegram_id": telegram_id,
+            "first_name": "Водитель",
+            "car_brand": "Kia",
+            "car_model": "Rio",
+            "car_color": "белый",
+            "car_plate": "A000AA",
+            "status": "ACTIVE",
+            "is_registered": True,
+            "registration_step": None,
+            "is_busy": False,
+            "current_order_id": None,
+            "created_at": now
+        } for telegram_id in sorted(driver_ids)])
+    return len(order_ids), len(driver_ids)
+
+async def replay(entries: list, http: httpx.AsyncClient, speed: float, concurrency: int) -> tuple:
+    samples = defaultdict(list)
+    errors = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    first = entries[0]["t"]
+    started = time.monotonic()
+
+    async def send(entry: dict):
+        if speed > 0:
+            delay = started + (entry["t"] - first) / speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        kind = update_type(entry["update"])
+        async with semaphore:
+            sent = time.perf_counter()
+            try:
+                response = await http.post("/api/telegram/webhook", json=entry["update"])
+                if response.status_code >= 400:
+                    errors[kind] += 1
+            except Exception:
+                errors[kind] += 1
+            samples[kind].append((time.perf_counter() - sent) * 1000)
+
+    await asyncio.gather(*(send(entry) for entry in entries))
+    return samples, errors, time.monotonic() - started
+
+def summarize(samples: dict, errors: Counter) -> dict:
+    report = {}
+    for kind in sorted(samples, key=lambda kind: -len(samples[kind])):
+        values = sorted(samples[kind])
+
+        def percentile(p):
+            return round(values[min(len(values) - 1, int(len(values) * p))], 2)
+
+        report[kind] = {
+            "updates": len(values),
+            "errors": errors[kind],
+            "p50_ms": round(statistics.median(values), 2),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(values[-1], 2)
+        }
+    return report
+
+async def run(args, entries: list) -> dict:
+    stub = StubBotAPI(args.telegram_latency_ms, args.telegram_jitter_ms, args.telegram_429_rate)
+    stub_server = await serve(stub.app, args.stub_port)
+    await server.client.drop_database(os.environ["DB_NAME"])
+    seeded_orders, seeded_drivers = (0, 0) if args.no_seed else await seed(entries)
+
+    await server.startup_event()
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=60) as http:
+            samples, errors, wall = await replay(entries, http, args.speed, args.concurrency)
+            # Fast-ack mode: wait for queued updates before reading the counters
+            while server.update_dispatcher.depth():
+                await asyncio.sleep(0.1)
+            system = (await http.get("/api/admin/system")).json()
+    finally:
+        await server.shutdown_db_client()
+        await stop(*stub_server)
+
+    return {
+        "recording": args.recording,
+        "speed": args.speed,
+        "updates": len(entries),
+        "recorded_span_s": round(entries[-1]["t"] - entries[0]["t"], 1),
+        "wall_s": round(wall, 1),
+        "seeded": {"orders": seeded_orders, "drivers": seeded_drivers},
+        "update_types": summarize(samples, errors),
+        "telegram_stub": {"calls": dict(stub.calls), "injected_429": stub.injected_429},
+        "system": system
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", help="gzip JSONL file written by the webhook recorder")
+    parser.add_argument("--speed", type=float, default=1, help="Time scale: 1 real time, 10 ten times faster, 0 max")
+    parser.add_argument("--concurrency", type=int, default=40, help="Updates in flight at once")
+    parser.add_argument("--limit", type=int, default=0, help="Replay only the first N updates")
+    parser.add_argument("--drivers-chat-id", help="Hashed drivers chat id (default: busiest group in the recording)")
+    parser.add_argument("--no-seed", action="store_true", help="Do not seed orders and drivers for callbacks")
+    parser.add_argument("--telegram-latency-ms", type=float, default=50, help="Mean stub Bot API latency")
+    parser.add_argument("--telegram-jitter-ms", type=float, default=20, help="Stub latency standard deviation")
+    parser.add_argument("--telegram-429-rate", type=float, default=0.0, help="Share of stub calls answered with 429")
+    parser.add_argument("--webhook-async", action="store_true", help="Enable fast-ack webhook mode")
+    parser.add_argument("--in-memory", action="store_true", help="Start a throwaway mongod via pymongo_inmemory")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+    args.stub_port = free_port()
+
+    entries = load_recording(args.recording, args.limit)
+    if not entries:
+        sys.exit("The recording is empty")
+
+    mongod = None
+    if args.in_memory:
+        try:
+            from pymongo_inmemory import Mongod
+        except ImportError:
+            sys.exit("--in-memory needs the 'pymongo_inmemory' package")
+        mongod = Mongod()
+        mongod.start()
+        os.environ["MONGO_URL"] = mongod.connection_string
+
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = os.environ.get("REPLAY_DB_NAME", "taxi_replay")
+    os.environ["TELEGRAM_BOT_TOKEN"] = BOT_TOKEN
+    os.environ["TELEGRAM_DRIVERS_CHAT_ID"] = args.drivers_chat_id or guess_drivers_chat(entries)
+    os.environ["TELEGRAM_API_BASE"] = f"http://127.0.0.1:{args.stub_port}"
+    os.environ["TELEGRAM_WEBHOOK_SECRET"] = ""
+    os.environ["TELEGRAM_WEBHOOK_ASYNC"] = "1" if args.webhook_async else ""
+    os.environ["TELEGRAM_RECORD_PATH"] = ""
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    global server
+    import server as backend
+    server = backend
+    logging.getLogger("server").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    try:
+        result = asyncio.run(run(args, entries))
+    finally:
+        if mongod is not None:
+            mongod.stop()
+
+    print(f"Replayed {result['updates']} updates spanning {result['recorded_span_s']} s in {result['wall_s']} s")
+    print(f"\n{'update type':<28} {'updates':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for kind, row in result["update_types"].items():
+        print(f"{kind:<28} {row['updates']:>8} {row['errors']:>7} {row['p50_ms']:>9}"
+              f" {row['p95_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
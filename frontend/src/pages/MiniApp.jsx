@@ -209,10 +209,21 @@ export default function MiniApp() {
     initialize();
   }, [initialize]);
 
-  // Poll for order updates
+  // Subscribe to order updates (server pushes every status change)
   useEffect(() => {
-    if (!user?.telegram_id || !activeOrder) return;
+    if (!user?.telegram_id || !activeOrder?.id) return;
     
+    if (typeof EventSource !== "undefined") {
+      const source = new EventSource(
+        `${API}/client/order/active/stream?telegram_id=${encodeURIComponent(user.telegram_id)}`
+      );
+      source.addEventListener("order", (event) => {
+        setActiveOrder(JSON.parse(event.data));
+      });
+      return () => source.close();
+    }
+    
+    // Fallback for webviews without EventSource
     const interval = setInterval(async () => {
       try {
         const res = await axios.get(`${API}/client/order/active`, {
@@ -225,7 +236,7 @@ export default function MiniApp() {
     }, 3000);
     
     return () => clearInterval(interval);
-  }, [user?.telegram_id, activeOrder]);
+  }, [user?.telegram_id, activeOrder?.id]);
 
   const handleSubmitOrder = async (e) => {
     e.preventDefault();
@@ -3,6 +3,7 @@ import axios from "axios";
 import { Search, Users, Loader2 } from "lucide-react";
 import { Input } from "@/components/ui/input";
 import { Card } from "@/components/ui/card";
+import { Button } from "@/components/ui/button";
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -10,12 +11,15 @@ export default function AdminClients() {
   const [clients, setClients] = useState([]);
   const [loading, setLoading] = useState(true);
   const [searchQuery, setSearchQuery] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchClients = async () => {
       try {
         const res = await axios.get(`${API}/admin/clients`);
-        setClients(res.data);
+        setClients(res.data.items);
+        setNextCursor(res.data.next_cursor);
       } catch (error) {
         console.error("Error fetching clients:", error);
       } finally {
@@ -25,6 +29,19 @@ export default function AdminClients() {
     fetchClients();
   }, []);
 
+  const loadMoreClients = async () => {
+    setLoadingMore(true);
+    try {
+      const res = await axios.get(`${API}/admin/clients`, { params: { cursor: nextCursor } });
+      setClients(prev => [...prev, ...res.data.items]);
+      setNextCursor(res.data.next_cursor);
+    } catch (error) {
+      console.error("Error fetching clients:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const filteredClients = clients.filter(client => {
     if (!searchQuery) return true;
     const query = searchQuery.toLowerCase();
@@ -113,6 +130,20 @@ export default function AdminClients() {
           </table>
         </div>
       </Card>
+      
+      {nextCursor && (
+        <div className="flex justify-center">
+          <Button
+            variant="outline"
+            onClick={loadMoreClients}
+            disabled={loadingMore}
+            data-testid="load-more-clients"
+          >
+            {loadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+            Показать ещё
+          </Button>
+        </div>
+      )}
     </div>
   );
 }
@@ -28,7 +28,7 @@ export default function AdminDashboard() {
         ]);
         
         setStats(statsRes.data);
-        setRecentOrders(ordersRes.data);
+        setRecentOrders(ordersRes.data.items);
       } catch (error) {
         console.error("Error fetching dashboard data:", error);
       } finally {
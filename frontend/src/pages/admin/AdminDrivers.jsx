@@ -28,6 +28,8 @@ export default function AdminDrivers() {
   const [drivers, setDrivers] = useState([]);
   const [loading, setLoading] = useState(true);
   const [searchQuery, setSearchQuery] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   
   // Edit dialog
   const [selectedDriver, setSelectedDriver] = useState(null);
@@ -43,7 +45,8 @@ export default function AdminDrivers() {
   const fetchDrivers = async () => {
     try {
       const res = await axios.get(`${API}/admin/drivers`);
-      setDrivers(res.data);
+      setDrivers(res.data.items);
+      setNextCursor(res.data.next_cursor);
     } catch (error) {
       console.error("Error fetching drivers:", error);
     } finally {
@@ -51,6 +54,19 @@ export default function AdminDrivers() {
     }
   };
 
+  const loadMoreDrivers = async () => {
+    setLoadingMore(true);
+    try {
+      const res = await axios.get(`${API}/admin/drivers`, { params: { cursor: nextCursor } });
+      setDrivers(prev => [...prev, ...res.data.items]);
+      setNextCursor(res.data.next_cursor);
+    } catch (error) {
+      console.error("Error fetching drivers:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchDrivers();
   }, []);
@@ -265,6 +281,20 @@ export default function AdminDrivers() {
         </div>
       )}
       
+      {nextCursor && (
+        <div className="flex justify-center">
+          <Button
+            variant="outline"
+            onClick={loadMoreDrivers}
+            disabled={loadingMore}
+            data-testid="load-more-drivers"
+          >
+            {loadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+            Показать ещё
+          </Button>
+        </div>
+      )}
+      
       {/* Edit Driver Dialog */}
       <Dialog open={showEditDialog} onOpenChange={setShowEditDialog}>
         <DialogContent className="bg-[#1c1c1e] border-white/10 max-w-md">
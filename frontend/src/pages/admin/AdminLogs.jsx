@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import axios from "axios";
 import { ScrollText, Loader2 } from "lucide-react";
 import { Card } from "@/components/ui/card";
@@ -19,12 +19,35 @@ const ACTION_LABELS = {
 export default function AdminLogs() {
   const [logs, setLogs] = useState([]);
   const [loading, setLoading] = useState(true);
+  const highWaterMark = useRef(null);
 
   useEffect(() => {
     const fetchLogs = async () => {
       try {
+        if (highWaterMark.current) {
+          // Only logs written since the last sync
+          const res = await axios.get(`${API}/admin/logs`, {
+            params: { since: highWaterMark.current }
+          });
+          if (!res.data.has_more) {
+            highWaterMark.current = res.data.high_water_mark;
+            if (res.data.items.length > 0) {
+              setLogs(prev => {
+                const known = new Set(prev.map(log => log.id));
+                const fresh = res.data.items.filter(log => !known.has(log.id));
+                // Arrive in write order; an entry delayed by retries belongs further down
+                return [...fresh, ...prev]
+                  .sort((a, b) => b.created_at.localeCompare(a.created_at))
+                  .slice(0, 100);
+              });
+            }
+            return;
+          }
+        }
+        
         const res = await axios.get(`${API}/admin/logs`);
-        setLogs(res.data);
+        setLogs(res.data.items);
+        highWaterMark.current = res.data.high_water_mark;
       } catch (error) {
         console.error("Error fetching logs:", error);
       } finally {
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import axios from "axios";
 import { 
   Search, 
@@ -52,12 +52,25 @@ const STATUS_OPTIONS = [
   { value: "CANCELLED", label: "Отменены" },
 ];
 
+const PAGE_SIZE = 100;
+
+// Apply changed orders to the current list, keeping it sorted and filtered
+const mergeOrders = (current, changes, statusFilter) => {
+  const byId = new Map(current.map(order => [order.id, order]));
+  changes.forEach(order => byId.set(order.id, order));
+  return Array.from(byId.values())
+    .filter(order => statusFilter === "all" || order.status === statusFilter)
+    .sort((a, b) => b.created_at.localeCompare(a.created_at))
+    .slice(0, PAGE_SIZE);
+};
+
 export default function AdminOrders() {
   const [orders, setOrders] = useState([]);
   const [drivers, setDrivers] = useState([]);
   const [loading, setLoading] = useState(true);
   const [statusFilter, setStatusFilter] = useState("all");
   const [searchQuery, setSearchQuery] = useState("");
+  const highWaterMark = useRef(null);
   
   // Dialogs
   const [selectedOrder, setSelectedOrder] = useState(null);
@@ -74,16 +87,48 @@ export default function AdminOrders() {
       }
       
       const res = await axios.get(`${API}/admin/orders`, { params });
-      setOrders(res.data);
+      setOrders(res.data.items);
+      highWaterMark.current = res.data.high_water_mark;
     } catch (error) {
       console.error("Error fetching orders:", error);
     }
   };
 
+  // Fetch only orders changed since the last sync
+  const fetchOrderChanges = async () => {
+    if (!highWaterMark.current) {
+      return fetchOrders();
+    }
+    
+    try {
+      const res = await axios.get(`${API}/admin/orders`, {
+        params: { since: highWaterMark.current }
+      });
+      if (res.data.has_more) {
+        return fetchOrders();
+      }
+      highWaterMark.current = res.data.high_water_mark;
+      if (res.data.items.length > 0) {
+        setOrders(prev => mergeOrders(prev, res.data.items, statusFilter));
+      }
+    } catch (error) {
+      console.error("Error fetching order changes:", error);
+    }
+  };
+
   const fetchDrivers = async () => {
     try {
-      const res = await axios.get(`${API}/admin/drivers`);
-      setDrivers(res.data.filter(d => d.status === "ACTIVE" && !d.is_busy));
+      // Free drivers are filtered on the server; follow the cursor so none are cut off
+      const free = [];
+      let cursor = null;
+      do {
+        const res = await axios.get(`${API}/admin/drivers`, {
+          params: { status: "ACTIVE", is_busy: false, limit: 200, cursor }
+        });
+        free.push(...res.data.items);
+        cursor = res.data.next_cursor;
+      } while (cursor);
+      setDrivers(free);
     } catch (error) {
       console.error("Error fetching drivers:", error);
     }
@@ -97,7 +142,7 @@ export default function AdminOrders() {
     };
     loadData();
     
-    const interval = setInterval(fetchOrders, 5000);
+    const interval = setInterval(fetchOrderChanges, 5000);
     return () => clearInterval(interval);
   }, [statusFilter]);
 
@@ -112,7 +157,7 @@ export default function AdminOrders() {
       toast.success("Водитель назначен");
       setShowAssignDialog(false);
       setSelectedDriver("");
-      fetchOrders();
+      fetchOrderChanges();
       fetchDrivers();
     } catch (error) {
       toast.error(error.response?.data?.detail || "Ошибка назначения");
@@ -127,7 +172,7 @@ export default function AdminOrders() {
       
       toast.success("Заказ отменён");
       setShowCancelDialog(false);
-      fetchOrders();
+      fetchOrderChanges();
     } catch (error) {
       toast.error(error.response?.data?.detail || "Ошибка отмены");
     }
@@ -137,7 +182,7 @@ export default function AdminOrders() {
     try {
       await axios.post(`${API}/admin/orders/${order.id}/complete`);
       toast.success("Заказ завершён");
-      fetchOrders();
+      fetchOrderChanges();
     } catch (error) {
       toast.error(error.response?.data?.detail || "Ошибка");
     }
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# server.py reads its configuration at import time
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "taxi_test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import mongomock  # noqa: E402
+import pytest  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+import server  # noqa: E402
+
+
+class FakeClock:
+    """Stands in for the `time` module inside server.py"""
+
+    def __init__(self, start: float = 1000.0):
+        self.now = start
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(server, "time", fake)
+    return fake
+
+
+def find_and_modify_keeping_id(original):
+    """mongomock re-reads an updated document by the original filter unless the
+    projection keeps _id, so an update that moves it out of the filter (a
+    claimed order leaving BROADCAST) gets None where Mongo returns the document"""
+    def find_and_modify(self, query, projection=None, *args, **kwargs):
+        if projection != {"_id": 0}:
+            return original(self, query, projection, *args, **kwargs)
+        doc = original(self, query, None, *args, **kwargs)
+        if doc is not None:
+            doc.pop("_id", None)
+        return doc
+    return find_and_modify
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh in-memory database with the declared indexes; profile caches start empty"""
+    monkeypatch.setattr(mongomock.collection.Collection, "_find_and_modify",
+                        find_and_modify_keeping_id(mongomock.collection.Collection._find_and_modify))
+    database = AsyncMongoMockClient()["taxi_test"]
+    monkeypatch.setattr(server, "db", database)
+    server.driver_cache.clear()
+    server.client_cache.clear()
+    asyncio.run(server.ensure_indexes())
+    return database
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from server import DELTA_SYNC_OVERLAP_SECONDS, fetch_changes, parse_since
+
+SINCE = "2026-01-01T00:00:00+00:00"
+
+
+def stamp(seconds: float) -> str:
+    return (datetime.fromisoformat(SINCE) + timedelta(seconds=seconds)).isoformat()
+
+
+def test_since_is_normalized_to_utc():
+    assert parse_since("2026-01-01T03:00:00+03:00") == SINCE
+    assert parse_since("2026-01-01T00:00:00Z") == SINCE
+    assert parse_since("2026-01-01T00:00:00") == SINCE
+
+
+def test_invalid_since_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        parse_since("yesterday")
+    assert error.value.status_code == 400
+
+
+def test_bulk_update_sharing_one_timestamp_is_paged_without_gaps(db):
+    asyncio.run(db.orders.insert_many([{"id": f"{i:03}", "updated_at": stamp(1)} for i in range(250)]))
+
+    async def scenario():
+        pages, cursor = [], None
+        while True:
+            page = await fetch_changes(db.orders, "updated_at", SINCE, 100, cursor=cursor)
+            pages.append(page)
+            if not page["has_more"]:
+                return pages
+            cursor = page["next_cursor"]
+
+    pages = asyncio.run(scenario())
+
+    assert [len(page["items"]) for page in pages] == [100, 100, 50]
+    ids = [doc["id"] for page in pages for doc in page["items"]]
+    assert ids == sorted(ids) and len(set(ids)) == 250
+    # The mark only moves once the last page is read
+    assert [page["high_water_mark"] for page in pages] == [SINCE, SINCE, stamp(1)]
+
+
+def test_changes_come_oldest_first_and_exclude_since(db):
+    asyncio.run(db.orders.insert_many([
+        {"id": "b", "updated_at": stamp(2)},
+        {"id": "a", "updated_at": stamp(1)},
+        {"id": "old", "updated_at": SINCE},
+    ]))
+
+    page = asyncio.run(fetch_changes(db.orders, "updated_at", SINCE, 100))
+
+    assert [doc["id"] for doc in page["items"]] == ["a", "b"]
+    assert page["high_water_mark"] == stamp(2)
+
+
+def test_recent_changes_are_returned_again(db):
+    now = datetime.now(timezone.utc)
+    asyncio.run(db.action_logs.insert_many([
+        {"id": "settled", "written_at": (now - timedelta(seconds=DELTA_SYNC_OVERLAP_SECONDS * 2)).isoformat()},
+        {"id": "recent", "written_at": now.isoformat()},
+    ]))
+    since = (now - timedelta(minutes=1)).isoformat()
+
+    async def scenario():
+        first = await fetch_changes(db.action_logs, "written_at", since, 100)
+        # A write stamped before `recent` but committed after the first call
+        await db.action_logs.insert_one({"id": "late", "written_at": (now - timedelta(seconds=1)).isoformat()})
+        second = await fetch_changes(db.action_logs, "written_at", first["high_water_mark"], 100)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert [doc["id"] for doc in first["items"]] == ["settled", "recent"]
+    assert first["high_water_mark"] < now.isoformat()
+    assert [doc["id"] for doc in second["items"]] == ["late", "recent"]
+
+
+def test_no_changes_keeps_the_mark(db):
+    page = asyncio.run(fetch_changes(db.orders, "updated_at", SINCE, 100))
+
+    assert page == {"items": [], "high_water_mark": SINCE, "has_more": False, "next_cursor": None}
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from server import LeaseManager
+
+
+def manager(instance_id: str, acquired: list) -> LeaseManager:
+    async def on_acquired():
+        acquired.append(instance_id)
+
+    leases = LeaseManager(instance_id, ttl_seconds=30, renew_seconds=10)
+    leases.register("order_expiry", on_acquired)
+    return leases
+
+
+def test_one_instance_leads(db, clock):
+    acquired = []
+    first, second = manager("a", acquired), manager("b", acquired)
+
+    async def scenario():
+        await first.tick()
+        await second.tick()
+        await first.tick()
+
+    asyncio.run(scenario())
+
+    assert first.is_leader("order_expiry")
+    assert not second.is_leader("order_expiry")
+    # Renewing does not count as a takeover
+    assert acquired == ["a"]
+
+
+def test_expired_lease_is_taken_over(db, clock):
+    acquired = []
+    crashed, follower = manager("a", acquired), manager("b", acquired)
+
+    async def scenario():
+        await crashed.tick()
+        await follower.tick()
+        # The leader stops renewing and its lease runs out
+        await db.leases.update_one({"_id": "order_expiry"},
+                                   {"$set": {"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+        clock.advance(30)
+        await follower.tick()
+        return await follower.holders()
+
+    holders = asyncio.run(scenario())
+
+    assert not crashed.is_leader("order_expiry")
+    assert follower.is_leader("order_expiry")
+    assert acquired == ["a", "b"]
+    assert holders[0]["name"] == "order_expiry" and holders[0]["holder"] == "b"
+
+
+def test_leader_that_cannot_renew_steps_down(db, clock):
+    leader = manager("a", [])
+    asyncio.run(leader.tick())
+
+    clock.advance(29)
+    assert leader.is_leader("order_expiry")
+    clock.advance(1)
+    assert not leader.is_leader("order_expiry")
+
+
+def test_lost_lease_is_counted(db, clock):
+    acquired = []
+    first, second = manager("a", acquired), manager("b", acquired)
+
+    async def scenario():
+        await first.tick()
+        await db.leases.update_one({"_id": "order_expiry"}, {"$set": {
+            "holder": "b", "expires_at": datetime.now(timezone.utc) + timedelta(seconds=30)}})
+        await first.tick()
+
+    asyncio.run(scenario())
+
+    assert not first.is_leader("order_expiry")
+    assert first.get_stats()["leases"]["order_expiry"] == {"leader": False, "acquired": 1, "lost": 1}
+
+
+def test_clean_shutdown_releases_at_once(db, clock):
+    acquired = []
+    leader, follower = manager("a", acquired), manager("b", acquired)
+
+    async def scenario():
+        await leader.start()
+        await follower.tick()
+        await leader.stop()
+        await follower.tick()
+
+    asyncio.run(scenario())
+
+    assert not leader.is_leader("order_expiry")
+    assert follower.is_leader("order_expiry")
+    assert acquired == ["a", "b"]
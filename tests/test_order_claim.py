@@ -0,0 +1,85 @@
+import asyncio
+
+import server
+from server import ClaimFailure, DriverStatus, OrderStatus, claim_order, release_driver_claim
+
+
+# Values as Mongo stores them: enums come back as plain strings
+def driver(number: int) -> dict:
+    return {"id": f"d{number}", "telegram_id": str(number), "status": DriverStatus.ACTIVE.value,
+            "is_busy": False, "current_order_id": None}
+
+
+def order(order_id: str) -> dict:
+    return {"id": order_id, "status": OrderStatus.BROADCAST.value, "driver_id": None}
+
+
+def seed(db, drivers: list, orders: list):
+    async def scenario():
+        await db.drivers.insert_many([dict(doc) for doc in drivers])
+        await db.orders.insert_many([dict(doc) for doc in orders])
+
+    asyncio.run(scenario())
+
+
+def test_claim_assigns_order_and_marks_driver_busy(db):
+    seed(db, [driver(1)], [order("o1")])
+
+    claimed, failure = asyncio.run(claim_order("o1", driver(1), {"driver_name": "Иван"}))
+
+    assert failure is None
+    assert claimed["status"] == OrderStatus.ASSIGNED
+    assert (claimed["driver_id"], claimed["driver_name"]) == ("d1", "Иван")
+    stored = asyncio.run(db.drivers.find_one({"id": "d1"}))
+    assert (stored["is_busy"], stored["current_order_id"]) == (True, "o1")
+
+
+def test_only_one_of_many_drivers_wins_an_order(db):
+    drivers = [driver(n) for n in range(1, 6)]
+    seed(db, drivers, [order("o1")])
+
+    async def scenario():
+        return await asyncio.gather(*(claim_order("o1", doc, {}) for doc in drivers))
+
+    results = asyncio.run(scenario())
+
+    winners = [claimed for claimed, _ in results if claimed]
+    assert len(winners) == 1
+    assert sorted(failure for _, failure in results if failure) == [ClaimFailure.ORDER_TAKEN] * 4
+    # Losers are released again
+    busy = asyncio.run(db.drivers.find({"is_busy": True}, {"_id": 0}).to_list(None))
+    assert [doc["id"] for doc in busy] == [winners[0]["driver_id"]]
+
+
+def test_busy_driver_cannot_take_a_second_order(db):
+    seed(db, [driver(1)], [order("o1"), order("o2")])
+
+    async def scenario():
+        await claim_order("o1", driver(1), {})
+        return await claim_order("o2", driver(1), {})
+
+    assert asyncio.run(scenario()) == (None, ClaimFailure.DRIVER_UNAVAILABLE)
+    assert asyncio.run(db.orders.find_one({"id": "o2"}))["driver_id"] is None
+
+
+def test_release_only_frees_the_order_the_driver_holds(db):
+    seed(db, [driver(1)], [order("o1")])
+    asyncio.run(claim_order("o1", driver(1), {}))
+
+    asyncio.run(release_driver_claim(driver(1), "o-other"))
+    assert asyncio.run(db.drivers.find_one({"id": "d1"}))["is_busy"] is True
+
+    asyncio.run(release_driver_claim(driver(1), "o1"))
+    stored = asyncio.run(db.drivers.find_one({"id": "d1"}))
+    assert (stored["is_busy"], stored["current_order_id"]) == (False, None)
+
+
+def test_claim_invalidates_the_cached_driver(db, clock):
+    seed(db, [driver(1)], [order("o1")])
+
+    async def scenario():
+        await server.get_driver_by_telegram_id("1")
+        await claim_order("o1", driver(1), {})
+        return await server.get_driver_by_telegram_id("1")
+
+    assert asyncio.run(scenario())["is_busy"] is True
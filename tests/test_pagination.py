@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import decode_cursor, encode_cursor, paginate
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor({"created_at": "2026-01-01T00:00:00+00:00", "id": "abc"})
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2026-01-01T00:00:00+00:00", "abc")
+
+
+def test_cursor_on_another_field():
+    doc = {"created_at": "a", "updated_at": "b", "id": "abc"}
+
+    assert decode_cursor(encode_cursor(doc, "updated_at")) == ("b", "abc")
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bnVsbA", "WzEsMl0"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def collect_pages(collection, query: dict, limit: int) -> list:
+    async def scenario():
+        pages, cursor = [], None
+        while True:
+            page = await paginate(collection, query, limit, cursor)
+            pages.append([doc["id"] for doc in page["items"]])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages
+
+    return asyncio.run(scenario())
+
+
+def test_pages_split_documents_sharing_a_timestamp(db):
+    docs = [{"id": f"{i:03}", "created_at": "2026-01-01T00:00:00+00:00"} for i in range(5)]
+    docs.append({"id": "999", "created_at": "2025-12-31T00:00:00+00:00"})
+    asyncio.run(db.orders.insert_many(docs))
+
+    pages = collect_pages(db.orders, {}, 2)
+
+    assert pages == [["004", "003"], ["002", "001"], ["000", "999"]]
+
+
+def test_cursor_is_combined_with_the_filter(db):
+    asyncio.run(db.drivers.insert_many([
+        {"id": f"{i:03}", "created_at": f"2026-01-01T00:00:{i:02}+00:00", "is_busy": i % 2 == 0}
+        for i in range(6)
+    ]))
+
+    pages = collect_pages(db.drivers, {"is_busy": False}, 2)
+
+    assert pages == [["005", "003"], ["001"]]
+
+
+def test_limit_is_capped(db, monkeypatch):
+    monkeypatch.setattr(server, "MAX_PAGE_SIZE", 3)
+    asyncio.run(db.orders.insert_many([{"id": str(i), "created_at": str(i)} for i in range(5)]))
+
+    page = asyncio.run(paginate(db.orders, {}, 1000))
+
+    assert len(page["items"]) == 3
+    assert page["next_cursor"] is not None
@@ -0,0 +1,75 @@
+import asyncio
+
+import server
+from server import _MISSING, TTLCache
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = TTLCache(max_size=10, ttl_seconds=30)
+    cache.set("42", {"id": "a"}, cache.epoch)
+
+    clock.advance(29)
+    assert cache.get("42") == {"id": "a"}
+    clock.advance(2)
+    assert cache.get("42") is _MISSING
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(max_size=2, ttl_seconds=30)
+    cache.set("1", "one", cache.epoch)
+    cache.set("2", "two", cache.epoch)
+    cache.get("1")
+    cache.set("3", "three", cache.epoch)
+
+    assert cache.get("2") is _MISSING
+    assert cache.get("1") == "one"
+    assert cache.get("3") == "three"
+
+
+def test_read_that_raced_an_invalidation_is_not_cached(clock):
+    cache = TTLCache(max_size=10, ttl_seconds=30)
+    epoch = cache.epoch
+    cache.invalidate("42")
+    cache.set("42", {"phone": "old"}, epoch)
+
+    assert cache.get("42") is _MISSING
+
+
+def test_miss_is_not_cached(db, clock):
+    async def scenario():
+        assert await server.get_client_by_telegram_id("42") is None
+        # Created by another worker, which cannot invalidate this process's cache
+        await db.clients.insert_one(server.ClientModel(telegram_id="42").model_dump())
+        return await server.get_client_by_telegram_id("42")
+
+    assert asyncio.run(scenario())["telegram_id"] == "42"
+
+
+def test_fresh_read_skips_the_cached_copy(db, clock):
+    async def scenario():
+        await db.drivers.insert_one({"id": "d1", "telegram_id": "7", "is_busy": False})
+        await server.get_driver_by_telegram_id("7")
+        await db.drivers.update_one({"id": "d1"}, {"$set": {"is_busy": True}})
+        cached = await server.get_driver_by_telegram_id("7")
+        fresh = await server.get_driver_by_telegram_id("7", fresh=True)
+        return cached, fresh
+
+    cached, fresh = asyncio.run(scenario())
+    assert cached["is_busy"] is False
+    assert fresh["is_busy"] is True
+
+
+def test_concurrent_first_requests_create_one_client(db, clock):
+    async def scenario():
+        docs = await asyncio.gather(*(
+            server.upsert_client("42", {"first_name": "Иван"}) for _ in range(5)
+        ))
+        await server.upsert_client("42", {}, {"phone": "+79990000000"})
+        return docs, await db.clients.find({"telegram_id": "42"}, {"_id": 0}).to_list(None)
+
+    docs, stored = asyncio.run(scenario())
+    assert len(stored) == 1
+    assert {doc["id"] for doc in docs} == {stored[0]["id"]}
+    assert stored[0]["first_name"] == "Иван"
+    assert stored[0]["phone"] == "+79990000000"
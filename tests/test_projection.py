@@ -0,0 +1,32 @@
+import pytest
+from fastapi import HTTPException
+
+from server import ALWAYS_PROJECTED, PROJECTABLE_FIELDS, parse_fields
+
+DEFAULT = {"_id": 0, "id": 1}
+
+
+def test_default_projection_without_fields():
+    assert parse_fields("orders", None, DEFAULT) is DEFAULT
+    assert parse_fields("orders", "", DEFAULT) is DEFAULT
+
+
+def test_requested_fields_include_the_cursor_fields():
+    projection = parse_fields("orders", " status, client_price ", DEFAULT)
+
+    assert projection == {"_id": 0, "client_price": 1, "created_at": 1, "id": 1, "status": 1, "updated_at": 1}
+
+
+def test_all_selects_every_field():
+    projection = parse_fields("action_logs", "all", DEFAULT)
+
+    assert set(projection) - {"_id"} == PROJECTABLE_FIELDS["action_logs"]
+    assert set(ALWAYS_PROJECTED["action_logs"]) <= set(projection)
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        parse_fields("drivers", "first_name,password,_id", DEFAULT)
+
+    assert error.value.status_code == 400
+    assert "_id, password" in error.value.detail
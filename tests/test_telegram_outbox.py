@@ -0,0 +1,211 @@
+import asyncio
+
+import server
+from server import CHAT_RATE_LIMITED_METHODS, MessagePriority, OutboundMessage, TelegramOutbox
+
+PRIVATE_CHAT = "1001"
+OTHER_CHAT = "1002"
+GROUP_CHAT = "-100500"
+
+
+class FakeBotClient:
+    """Records Bot API calls and answers with queued responses, then ok"""
+
+    def __init__(self, responses=None):
+        self.calls = []
+        self.responses = list(responses or [])
+
+    async def call(self, method: str, payload: dict):
+        self.calls.append((method, payload))
+        if self.responses:
+            return self.responses.pop(0)
+        return {"ok": True, "result": True}
+
+
+def enqueue(outbox: TelegramOutbox, method: str, chat_id: str,
+            priority: MessagePriority = MessagePriority.INTERACTIVE, future=None) -> OutboundMessage:
+    message = OutboundMessage(int(priority), next(outbox._seq), method, {"chat_id": chat_id}, chat_id, future)
+    outbox._enqueue(message)
+    return message
+
+
+def drain(outbox: TelegramOutbox, now: float) -> list:
+    """Everything the dispatcher may send at `now`, in dispatch order"""
+    sent = []
+    while True:
+        message, _ = outbox._pop_ready(now)
+        if message is None:
+            return sent
+        sent.append(message)
+
+
+def test_only_send_message_spends_chat_tokens():
+    assert CHAT_RATE_LIMITED_METHODS == {"sendMessage"}
+
+
+def test_higher_priority_goes_first_across_chats(clock):
+    outbox = TelegramOutbox(FakeBotClient())
+    background = enqueue(outbox, "sendMessage", PRIVATE_CHAT, MessagePriority.BACKGROUND)
+    assignment = enqueue(outbox, "sendMessage", OTHER_CHAT, MessagePriority.ASSIGNMENT)
+
+    assert drain(outbox, clock.now) == [assignment, background]
+
+
+def test_same_priority_keeps_submission_order_within_a_chat(clock):
+    outbox = TelegramOutbox(FakeBotClient())
+    first = enqueue(outbox, "sendMessage", PRIVATE_CHAT)
+    second = enqueue(outbox, "sendMessage", PRIVATE_CHAT)
+
+    assert drain(outbox, clock.now) == [first, second]
+
+
+def test_throttled_chat_does_not_hold_back_other_chats(clock):
+    outbox = TelegramOutbox(FakeBotClient())
+    burst = [enqueue(outbox, "sendMessage", PRIVATE_CHAT) for _ in range(5)]
+    other = enqueue(outbox, "sendMessage", OTHER_CHAT)
+
+    # A private chat allows a burst of three, then one message per second
+    assert drain(outbox, clock.now) == burst[:3] + [other]
+    message, wait = outbox._pop_ready(clock.now)
+    assert message is None
+    assert wait == 1.0
+
+    clock.advance(1.0)
+    assert drain(outbox, clock.now) == [burst[3]]
+    clock.advance(1.0)
+    assert drain(outbox, clock.now) == [burst[4]]
+    assert outbox.depth() == 0
+
+
+def test_throttled_queue_is_parked_once_however_long_it_is(clock):
+    outbox = TelegramOutbox(FakeBotClient())
+    for _ in range(1000):
+        enqueue(outbox, "sendMessage", PRIVATE_CHAT)
+    drain(outbox, clock.now)
+
+    for _ in range(3):
+        message, wait = outbox._pop_ready(clock.now)
+        assert message is None
+    # One waiting entry for the chat, not one per held-back message
+    assert len(outbox._waiting) == 1
+    assert outbox._ready == []
+    assert outbox.depth() == 997
+
+
+def test_deletes_and_edits_bypass_an_exhausted_group_budget(clock):
+    outbox = TelegramOutbox(FakeBotClient())
+    for _ in range(3):
+        enqueue(outbox, "sendMessage", GROUP_CHAT, MessagePriority.BROADCAST)
+    drain(outbox, clock.now)
+    bucket = outbox._chat_bucket(GROUP_CHAT)
+    tokens = bucket.tokens
+
+    held = enqueue(outbox, "sendMessage", GROUP_CHAT, MessagePriority.BROADCAST)
+    delete = enqueue(outbox, "deleteMessage", GROUP_CHAT, MessagePriority.BROADCAST)
+    edit = enqueue(outbox, "editMessageText", GROUP_CHAT, MessagePriority.BROADCAST)
+
+    assert drain(outbox, clock.now) == [delete, edit]
+    assert bucket.tokens == tokens
+    assert outbox.depth() == 1
+
+    # 20 messages a minute: the next send is allowed three seconds later
+    clock.advance(3.0)
+    assert drain(outbox, clock.now) == [held]
+
+
+def test_retry_after_penalty_holds_back_every_method(clock):
+    outbox = TelegramOutbox(FakeBotClient())
+    outbox._chat_bucket(GROUP_CHAT).block(clock.now, 10)
+    delete = enqueue(outbox, "deleteMessage", GROUP_CHAT)
+
+    message, wait = outbox._pop_ready(clock.now)
+    assert message is None
+    assert wait == 10
+
+    clock.advance(10)
+    assert drain(outbox, clock.now) == [delete]
+
+
+def test_global_budget_limits_all_chats(clock):
+    outbox = TelegramOutbox(FakeBotClient())
+    outbox._global.tokens = 1
+    first = enqueue(outbox, "sendMessage", PRIVATE_CHAT)
+    second = enqueue(outbox, "deleteMessage", OTHER_CHAT)
+
+    assert drain(outbox, clock.now) == [first]
+    message, wait = outbox._pop_ready(clock.now)
+    assert message is None
+    assert 0 < wait <= 1 / server.TELEGRAM_GLOBAL_RATE
+
+    clock.advance(1.0)
+    assert drain(outbox, clock.now) == [second]
+
+
+def test_rate_limited_message_is_retried_ahead_of_newer_ones(clock):
+    async def scenario():
+        api = FakeBotClient([{"ok": False, "error_code": 429, "parameters": {"retry_after": 5}}])
+        outbox = TelegramOutbox(api)
+        loop = asyncio.get_running_loop()
+        first = enqueue(outbox, "sendMessage", PRIVATE_CHAT, future=loop.create_future())
+        second = enqueue(outbox, "sendMessage", PRIVATE_CHAT, future=loop.create_future())
+
+        message, _ = outbox._pop_ready(clock.now)
+        assert message is first
+        await outbox._inflight.acquire()
+        await outbox._deliver(message)
+
+        assert outbox.rate_limited == 1
+        assert not first.future.done()
+        assert outbox._queues[(PRIVATE_CHAT, True)][0] is first
+        message, wait = outbox._pop_ready(clock.now)
+        assert message is None
+        assert wait == 5
+
+        # The bucket refills from empty once the penalty expires
+        clock.advance(5)
+        assert drain(outbox, clock.now) == []
+        clock.advance(1)
+        assert drain(outbox, clock.now) == [first]
+        await outbox._inflight.acquire()
+        await outbox._deliver(first)
+        assert first.future.result() == {"ok": True, "result": True}
+
+        clock.advance(1)
+        assert drain(outbox, clock.now) == [second]
+
+    asyncio.run(scenario())
+
+
+def test_rate_limit_result_is_returned_after_the_last_retry(clock, monkeypatch):
+    monkeypatch.setattr(server, "TELEGRAM_MAX_RETRIES", 1)
+    too_many = {"ok": False, "error_code": 429, "parameters": {"retry_after": 1}}
+
+    async def scenario():
+        outbox = TelegramOutbox(FakeBotClient([too_many, too_many]))
+        message = enqueue(outbox, "sendMessage", PRIVATE_CHAT, future=asyncio.get_running_loop().create_future())
+        for _ in range(2):
+            clock.advance(2)
+            assert drain(outbox, clock.now) == [message]
+            await outbox._inflight.acquire()
+            await outbox._deliver(message)
+
+        assert message.future.result() == too_many
+        assert outbox.failed == 1
+        assert outbox.depth() == 0
+
+    asyncio.run(scenario())
+
+
+def test_submit_goes_through_the_running_dispatcher(clock):
+    async def scenario():
+        api = FakeBotClient()
+        outbox = TelegramOutbox(api)
+        outbox.start()
+        result = await outbox.submit("sendMessage", {"chat_id": PRIVATE_CHAT, "text": "Привет"})
+        await outbox.stop()
+        return api, outbox, result
+
+    api, outbox, result = asyncio.run(scenario())
+    assert result == {"ok": True, "result": True}
+    assert api.calls == [("sendMessage", {"chat_id": PRIVATE_CHAT, "text": "Привет"})]
+    assert outbox.sent == 1
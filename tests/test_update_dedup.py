@@ -0,0 +1,56 @@
+import asyncio
+
+from server import UpdateDeduplicator
+
+
+def test_retry_within_window_is_duplicate(clock):
+    dedup = UpdateDeduplicator(window=100, ttl_seconds=60, use_mongo=False)
+
+    async def scenario():
+        return [await dedup.is_duplicate(1), await dedup.is_duplicate(1), await dedup.is_duplicate(2)]
+
+    assert asyncio.run(scenario()) == [False, True, False]
+    assert (dedup.accepted, dedup.duplicates) == (2, 1)
+
+
+def test_update_is_accepted_again_after_ttl(clock):
+    dedup = UpdateDeduplicator(window=100, ttl_seconds=60, use_mongo=False)
+
+    async def scenario():
+        await dedup.is_duplicate(1)
+        clock.advance(61)
+        return await dedup.is_duplicate(1)
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_window_keeps_only_the_latest_updates(clock):
+    dedup = UpdateDeduplicator(window=2, ttl_seconds=60, use_mongo=False)
+
+    async def scenario():
+        for update_id in (1, 2, 3):
+            await dedup.is_duplicate(update_id)
+        return await dedup.is_duplicate(1), await dedup.is_duplicate(3)
+
+    assert asyncio.run(scenario()) == (False, True)
+
+
+def test_mongo_record_is_shared_between_workers(db, clock):
+    first = UpdateDeduplicator(window=100, ttl_seconds=60, use_mongo=True)
+    second = UpdateDeduplicator(window=100, ttl_seconds=60, use_mongo=True)
+
+    async def scenario():
+        return await first.is_duplicate(7), await second.is_duplicate(7)
+
+    assert asyncio.run(scenario()) == (False, True)
+
+
+def test_forgotten_update_is_processed_again(db, clock):
+    dedup = UpdateDeduplicator(window=100, ttl_seconds=60, use_mongo=True)
+
+    async def scenario():
+        await dedup.is_duplicate(7)
+        await dedup.forget(7)
+        return await dedup.is_duplicate(7), await db.telegram_updates.count_documents({"_id": 7})
+
+    assert asyncio.run(scenario()) == (False, 1)